@@ -0,0 +1,30 @@
+"""
+Async engine and sessions for the API routers (aiosqlite / asyncpg).
+
+The sync engine in app.db.database stays in place for CLI scripts, migrations
+and the background journal workers. ASYNC_DATABASE_URL overrides the URL derived
+from DATABASE_URL.
+"""
+import os
+from typing import AsyncGenerator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.database import SQLALCHEMY_DATABASE_URL, engine_profile
+from app.db.profiles import async_database_url, async_engine_kwargs, async_pool_metrics, install_listeners
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **async_engine_kwargs(SQLALCHEMY_DATABASE_URL, engine_profile),
+)
+install_listeners(async_engine, engine_profile, async_pool_metrics)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit
+# (and, in async, impossible) lazy reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
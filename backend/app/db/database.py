@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.orm import Session
 from typing import Generator
@@ -6,22 +7,38 @@ from typing import Generator
 import os
 from dotenv import load_dotenv
 
+from app.db.profiles import engine_kwargs, install_listeners, resolve_profile
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./serene.db")
 
 is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
+# Pool / timeout / pragma settings, see app/db/profiles.py (DB_ENGINE_PROFILE)
+engine_profile = resolve_profile(SQLALCHEMY_DATABASE_URL)
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if is_sqlite else {},
+    **engine_kwargs(SQLALCHEMY_DATABASE_URL, engine_profile),
 )
+install_listeners(engine, engine_profile)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def dialect_insert(db: Session):
+    """
+    The dialect-specific insert() for the session's database, which adds
+    on_conflict_do_nothing/on_conflict_do_update (SQLite 3.24+ and Postgres).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
@@ -0,0 +1,125 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL.
+
+Each migration runs once, in order, inside its own transaction and is recorded in
+the `schema_migrations` table. Migrations must be idempotent (CREATE ... IF NOT
+EXISTS, add_column_if_missing) because migration 1 builds a fresh database from
+the current models, so later steps find their changes already in place there.
+
+Run with `python -m app.db.migrations` (or `--status` to list what is applied).
+"""
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import Base
+
+def add_column_if_missing(conn: Connection, table: str, column: str, ddl: str):
+    """
+    ALTER TABLE ... ADD COLUMN, skipped when the column already exists
+    (SQLite has no ADD COLUMN IF NOT EXISTS).
+    """
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def create_index_if_missing(conn: Connection, name: str, table: str, columns: str):
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+def _initial_schema(conn: Connection):
+    # Registers every model on Base before creating missing tables
+    from app.db import models  # noqa: F401
+    Base.metadata.create_all(bind=conn)
+
+def _user_timestamp_indexes(conn: Connection):
+    create_index_if_missing(conn, "ix_checkins_user_id_timestamp", "checkins", "user_id, timestamp")
+    create_index_if_missing(conn, "ix_chat_messages_user_id_timestamp", "chat_messages", "user_id, timestamp")
+    create_index_if_missing(conn, "ix_journal_entries_user_id_timestamp", "journal_entries", "user_id, timestamp")
+    create_index_if_missing(conn, "ix_journal_jobs_status_next_run_at", "journal_jobs", "status, next_run_at")
+
+def _mood_forecast_state(conn: Connection):
+    from app.db.models import MoodForecastState
+    MoodForecastState.__table__.create(bind=conn, checkfirst=True)
+
+def _streak_state(conn: Connection):
+    from app.db.models import ActiveDay, StreakState
+    add_column_if_missing(conn, "users", "timezone", "VARCHAR")
+    ActiveDay.__table__.create(bind=conn, checkfirst=True)
+    StreakState.__table__.create(bind=conn, checkfirst=True)
+
+def _user_patterns(conn: Connection):
+    from app.db.models import UserPattern
+    UserPattern.__table__.create(bind=conn, checkfirst=True)
+
+def _text_annotations(conn: Connection):
+    for table in ("checkins", "journal_entries", "chat_messages"):
+        add_column_if_missing(conn, table, "sentiment_score", "FLOAT")
+        add_column_if_missing(conn, table, "topics", "VARCHAR")
+
+def _checkin_insights(conn: Connection):
+    add_column_if_missing(conn, "checkins", "insights", "JSON")
+    add_column_if_missing(conn, "checkins", "insights_version", "INTEGER")
+
+# (version, name, function) - append only, never renumber
+MIGRATIONS = [
+    (1, "initial_schema", _initial_schema),
+    (2, "user_timestamp_indexes", _user_timestamp_indexes),
+    (3, "mood_forecast_state", _mood_forecast_state),
+    (4, "streak_state", _streak_state),
+    (5, "user_patterns", _user_patterns),
+    (6, "text_annotations", _text_annotations),
+    (7, "checkin_insights", _checkin_insights),
+]
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at VARCHAR NOT NULL)"
+        ))
+
+def applied_versions(engine: Engine) -> set:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def run_migrations(engine: Engine, verbose: bool = False) -> list:
+    """
+    Applies pending migrations and returns the versions applied by this call.
+    Safe to call on every startup and from several instances at once.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        if verbose:
+            print(f"Applying migration {version:04d}_{name}...")
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                    {"version": version, "name": name, "applied_at": datetime.now(timezone.utc).isoformat()},
+                )
+        except IntegrityError:
+            # Another instance recorded this version first; its DDL is idempotent with ours
+            continue
+        applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    if "--status" in sys.argv:
+        done = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            print(f"[{'x' if version in done else ' '}] {version:04d}_{name}")
+    else:
+        applied = run_migrations(engine, verbose=True)
+        print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
@@ -1,8 +1,21 @@
-from sqlalchemy import Column, Integer, Float, DateTime, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, Date, DateTime, String, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.database import Base
 
+def utcnow() -> datetime:
+    """
+    Current UTC time without tzinfo. The DateTime columns are TIMESTAMP WITHOUT
+    TIME ZONE, and asyncpg rejects tz-aware values for them.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_naive_utc(value: datetime) -> datetime:
+    # Client timestamps may carry an offset; store the UTC wall time
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -10,14 +23,19 @@ class User(Base):
     clerk_id = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, unique=True, index=True, nullable=True) # Optional, can be synced from Clerk
     email = Column(String, unique=True, index=True, nullable=True) # Optional, can be synced from Clerk
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    timezone = Column(String, nullable=True) # IANA name reported by the client, e.g. 'Europe/Paris'; UTC when unset
+    created_at = Column(DateTime, default=utcnow)
 
     checkins = relationship("CheckIn", back_populates="user")
     chat_messages = relationship("ChatMessage", back_populates="user")
     journal_entries = relationship("JournalEntry", back_populates="user")
+    daily_rollups = relationship("DailyRollup", back_populates="user")
 
 class CheckIn(Base):
     __tablename__ = "checkins"
+    __table_args__ = (
+        Index("ix_checkins_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -25,29 +43,151 @@ class CheckIn(Base):
     text = Column(String, nullable=True)
     energy = Column(Integer, nullable=True)
     sleep_hours = Column(Float, nullable=True)
-    timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    timestamp = Column(DateTime, nullable=False, default=utcnow)
+    sentiment_score = Column(Float, nullable=True) # keyword sentiment in [-1, 1]; NULL until annotated
+    topics = Column(String, nullable=True) # ",work,health," (see services/annotations.py)
+    insights = Column(JSON, nullable=True) # {"reasons": [...], "tips": [...]} from analyze_checkin
+    insights_version = Column(Integer, nullable=True) # INSIGHTS_RULES_VERSION the insights were computed with
 
     user = relationship("User", back_populates="checkins")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     role = Column(String, nullable=False) # 'user' or 'model'
     content = Column(String, nullable=False)
-    timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    timestamp = Column(DateTime, nullable=False, default=utcnow)
+    sentiment_score = Column(Float, nullable=True) # keyword sentiment in [-1, 1]; NULL until annotated (user messages only)
+    topics = Column(String, nullable=True) # ",work,health," (see services/annotations.py)
 
     user = relationship("User", back_populates="chat_messages")
 
 class JournalEntry(Base):
     __tablename__ = "journal_entries"
+    __table_args__ = (
+        Index("ix_journal_entries_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(String, nullable=False) # The long-form text
     summary = Column(String, nullable=True) # AI-generated summary
     advice = Column(String, nullable=True) # AI-generated advice
-    timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    timestamp = Column(DateTime, nullable=False, default=utcnow)
+    sentiment_score = Column(Float, nullable=True) # keyword sentiment in [-1, 1]; NULL until annotated
+    topics = Column(String, nullable=True) # ",work,health," (see services/annotations.py)
 
     user = relationship("User", back_populates="journal_entries")
+    analysis_job = relationship("JournalJob", back_populates="entry", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def analysis_status(self) -> str:
+        # Entries written before the job queue existed were analyzed inline
+        return self.analysis_job.status if self.analysis_job else "done"
+
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    mood_sum = Column(Float, nullable=False, default=0)
+    mood_min = Column(Integer, nullable=True)
+    mood_max = Column(Integer, nullable=True)
+    # energy and sleep are optional on a check-in, so they carry their own counts
+    energy_count = Column(Integer, nullable=False, default=0)
+    energy_sum = Column(Float, nullable=False, default=0)
+    energy_min = Column(Integer, nullable=True)
+    energy_max = Column(Integer, nullable=True)
+    sleep_count = Column(Integer, nullable=False, default=0)
+    sleep_sum = Column(Float, nullable=False, default=0)
+    sleep_min = Column(Float, nullable=True)
+    sleep_max = Column(Float, nullable=True)
+
+    user = relationship("User", back_populates="daily_rollups")
+
+class MoodForecastState(Base):
+    __tablename__ = "mood_forecast_state"
+
+    # Running OLS sufficient statistics over the daily mood averages in the forecast
+    # window. x is the active-day index (0..n-1), so sum(x) and sum(x^2) follow from n
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    window_start = Column(Date, nullable=False) # days before this have been dropped
+    last_day = Column(Date, nullable=True) # most recent day included (index n - 1)
+    n = Column(Integer, nullable=False, default=0)
+    checkins = Column(Integer, nullable=False, default=0)
+    sum_y = Column(Float, nullable=False, default=0)
+    sum_y2 = Column(Float, nullable=False, default=0)
+    sum_xy = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+class ActiveDay(Base):
+    __tablename__ = "user_active_days"
+
+    # Calendar days (in the user's timezone) with at least one check-in
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+class StreakState(Base):
+    __tablename__ = "streak_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    timezone = Column(String, nullable=False) # timezone the active days were bucketed in
+    current_start = Column(Date, nullable=True)
+    current_end = Column(Date, nullable=True) # latest active day
+    current_length = Column(Integer, nullable=False, default=0)
+    longest_length = Column(Integer, nullable=False, default=0)
+    longest_end = Column(Date, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+class UserPattern(Base):
+    __tablename__ = "user_patterns"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    cluster = Column(Integer, nullable=False)
+    week = Column(String, nullable=False) # ISO week the assignment was made from, e.g. 2026-W41
+    features = Column(String, nullable=False) # comma-separated weekly feature vector
+    model_version = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+class JournalSummaryCache(Base):
+    __tablename__ = "journal_summary_cache"
+
+    # sha256 of (normalized content, prompt version, model id)
+    key = Column(String(64), primary_key=True)
+    summary = Column(String, nullable=True)
+    advice = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+class JournalJob(Base):
+    __tablename__ = "journal_jobs"
+    __table_args__ = (
+        Index("ix_journal_jobs_status_next_run_at", "status", "next_run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    entry_id = Column(Integer, ForeignKey("journal_entries.id"), unique=True, nullable=False)
+    status = Column(String, nullable=False, default="pending") # 'pending', 'running', 'done' or 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    next_run_at = Column(DateTime, nullable=False, default=utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+    entry = relationship("JournalEntry", back_populates="analysis_job")
+
+class WeeklyReport(Base):
+    __tablename__ = "weekly_reports"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    iso_week = Column(String, primary_key=True) # e.g. '2026-W42'
+    data_version = Column(String, primary_key=True) # fingerprint of the rollups the report was built from
+    summary = Column(String, nullable=True)
+    win = Column(String, nullable=True)
+    focus = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
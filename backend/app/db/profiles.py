@@ -0,0 +1,261 @@
+"""
+Named engine profiles (pool sizing, recycling, timeouts, SQLite pragmas) and
+connection-pool metrics.
+
+The profile is picked with DB_ENGINE_PROFILE; single settings can still be
+overridden with the DB_* variables below.
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# local: SQLite / a dev Postgres on the same machine
+# serverless: Neon behind Cloud Run - few connections per instance, recycled well
+#   before Neon's idle timeout and pinged on checkout so dropped ones are replaced
+# server: a long-running host with a steady, larger pool
+ENGINE_PROFILES = {
+    "local": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 0,
+    },
+    "serverless": {
+        "pool_size": 3,
+        "max_overflow": 7,
+        "pool_timeout": 10,
+        "pool_recycle": 240,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,
+    },
+    "server": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 15,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 30000,
+    },
+}
+
+# Applied to every new SQLite connection. WAL lets readers run while a writer is
+# active; synchronous=NORMAL is durable in WAL mode and avoids an fsync per commit
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+# Env overrides for individual profile settings
+_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() in ("1", "true", "yes")),
+    "statement_timeout_ms": ("DB_STATEMENT_TIMEOUT_MS", int),
+}
+
+def resolve_profile(database_url: str, name: Optional[str] = None) -> dict:
+    """
+    The settings for `name` (or DB_ENGINE_PROFILE), with env overrides applied.
+    Defaults to 'local' for SQLite and 'serverless' for Postgres.
+    """
+    if name is None:
+        name = os.getenv("DB_ENGINE_PROFILE")
+    if not name:
+        name = "local" if database_url.startswith("sqlite") else "serverless"
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE '{name}' (expected one of {', '.join(ENGINE_PROFILES)})")
+
+    settings = dict(ENGINE_PROFILES[name], name=name)
+    for key, (env_name, cast) in _OVERRIDES.items():
+        value = os.getenv(env_name)
+        if value not in (None, ""):
+            settings[key] = cast(value)
+    return settings
+
+class PoolMetrics:
+    """
+    Checkout wait times and occupancy for the engine's connection pool.
+    """
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)  # seconds, most recent checkouts
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self._waits.append(seconds)
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def attach(self, engine):
+        self.pool = engine.pool
+        # AsyncEngine events are registered on its sync_engine
+        engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_conn, record):
+            self.connects += 1
+
+        @event.listens_for(engine, "invalidate")
+        def _on_invalidate(dbapi_conn, record, exception):
+            self.invalidated += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_p50": round(waits[len(waits) // 2], 6) if waits else 0.0,
+                "wait_seconds_p95": round(waits[int(len(waits) * 0.95)], 6) if waits else 0.0,
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+# Global instances: the sync engine (CLIs, background jobs) and the async API engine
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+def _timed_pool(base, metrics: PoolMetrics):
+    """
+    Subclass of `base` that reports how long each checkout waited for a connection.
+    """
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_wait(time.perf_counter() - start, timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - start)
+            return conn
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+TimedQueuePool = _timed_pool(QueuePool, pool_metrics)
+TimedAsyncQueuePool = _timed_pool(AsyncAdaptedQueuePool, async_pool_metrics)
+
+def _apply_sqlite_pragmas(dbapi_conn, record):
+    cursor = dbapi_conn.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+def _statement_timeout_listener(timeout_ms: int):
+    def _set_statement_timeout(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        cursor.close()
+        # Keep the SET out of the first transaction's scope
+        dbapi_conn.commit()
+    return _set_statement_timeout
+
+def _is_memory_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def engine_kwargs(database_url: str, settings: dict) -> dict:
+    """
+    create_engine() keyword arguments for a resolved profile.
+    """
+    kwargs = {"pool_pre_ping": settings["pool_pre_ping"]}
+    if database_url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if not _is_memory_sqlite(database_url):
+        kwargs.update({
+            "poolclass": TimedQueuePool,
+            "pool_size": settings["pool_size"],
+            "max_overflow": settings["max_overflow"],
+            "pool_timeout": settings["pool_timeout"],
+            "pool_recycle": settings["pool_recycle"],
+        })
+    return kwargs
+
+# Query parameters libpq understands but asyncpg rejects in the URL
+_LIBPQ_ONLY_PARAMS = ("sslmode", "channel_binding")
+
+def async_database_url(database_url: str) -> str:
+    """
+    The async-driver form of a sync URL: aiosqlite for SQLite, asyncpg for Postgres.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg").difference_update_query(_LIBPQ_ONLY_PARAMS)
+        return url.render_as_string(hide_password=False)
+    return database_url
+
+def async_engine_kwargs(database_url: str, settings: dict) -> dict:
+    """
+    create_async_engine() keyword arguments for a resolved profile.
+    `database_url` is the original (sync) URL, which still carries sslmode.
+    """
+    kwargs = {"pool_pre_ping": settings["pool_pre_ping"]}
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        connect_args = {}
+        sslmode = url.query.get("sslmode")
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = "require" if sslmode in ("require", "prefer", "allow") else True
+        if settings["statement_timeout_ms"]:
+            connect_args["server_settings"] = {"statement_timeout": str(int(settings["statement_timeout_ms"]))}
+        kwargs["connect_args"] = connect_args
+    if not _is_memory_sqlite(database_url):
+        kwargs.update({
+            "poolclass": TimedAsyncQueuePool,
+            "pool_size": settings["pool_size"],
+            "max_overflow": settings["max_overflow"],
+            "pool_timeout": settings["pool_timeout"],
+            "pool_recycle": settings["pool_recycle"],
+        })
+    return kwargs
+
+def install_listeners(engine, settings: dict, metrics: PoolMetrics = pool_metrics):
+    """
+    Connect-time setup (SQLite pragmas / Postgres statement_timeout) and pool metrics.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+    elif sync_engine.dialect.driver == "psycopg2" and settings["statement_timeout_ms"]:
+        # asyncpg gets it through server_settings instead
+        event.listen(sync_engine, "connect", _statement_timeout_listener(settings["statement_timeout_ms"]))
+    metrics.attach(engine)
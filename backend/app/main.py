@@ -1,12 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-from app.routers import health, checkins, analytics, chat, journal, reports
+from app.routers import health, checkins, analytics, chat, journal, reports, metrics, profiles
+from app.db.async_database import async_engine
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.services.journal_jobs import journal_workers
+from app.services.clerk_auth import jwks_cache
+from app.services.clustering import pattern_model
+from app.services.metrics import TimingMiddleware, install_query_timing
+from app.services.sql_profiler import SQLProfilerMiddleware, install_sql_profiler, sql_profiler
+from app.services.request_profiler import RequestProfilerMiddleware, request_profiler
 
-app = FastAPI(title="Serene ML Backend", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date (creates tables on a fresh DB). Here rather than
+    # at import, so importing the app never runs DDL against DATABASE_URL
+    run_migrations(engine)
+    # Background workers that fill in journal analyses
+    await journal_workers.start()
+    # Keep Clerk's signing keys warm so requests never wait on a JWKS fetch
+    jwks_cache.start_background_refresh()
+    # Load the persisted pattern model; refits run in a worker process
+    pattern_model.start()
+    yield
+    await pattern_model.stop()
+    await jwks_cache.stop_background_refresh()
+    await journal_workers.stop()
+    await async_engine.dispose()
+
+app = FastAPI(title="Serene ML Backend", version="0.1.0", lifespan=lifespan)
+
+# Query timings for the Server-Timing header and /api/metrics
+install_query_timing(async_engine, "api")
+install_query_timing(engine, "sync")
+# Opt-in (SQL_PROFILER=true): per-request query profiles, N+1 warnings, slow-query log
+if sql_profiler.enabled:
+    install_sql_profiler(async_engine, "api")
+    install_sql_profiler(engine, "sync")
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,12 +53,22 @@ app.add_middleware(
 
 # API Routes
 api_app = FastAPI()
+# Per-request db / model / app time (Server-Timing header, /api/metrics)
+api_app.add_middleware(TimingMiddleware)
+if sql_profiler.enabled:
+    api_app.add_middleware(SQLProfilerMiddleware)
+# cProfile for requests carrying X-Profile-Token (PROFILE_ADMIN_TOKEN) or all of
+# them (PROFILE_REQUESTS=true); not installed otherwise
+if request_profiler.enabled:
+    api_app.add_middleware(RequestProfilerMiddleware)
 api_app.include_router(health.router, prefix="/health", tags=["health"])
 api_app.include_router(checkins.router, prefix="/checkins", tags=["checkins"])
 api_app.include_router(analytics.router)
 api_app.include_router(chat.router)
 api_app.include_router(journal.router)
 api_app.include_router(reports.router)
+api_app.include_router(metrics.router)
+api_app.include_router(profiles.router)
 
 app.mount("/api", api_app)
 
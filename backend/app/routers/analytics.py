@@ -1,50 +1,102 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import SessionLocal
-from app.services.regression import mood_forecast
-from app.services.streaks import get_current_streak
+from app.services.regression import mood_forecast_async
+from app.services.streaks import get_streak_async
+from app.services.clustering import get_user_pattern
+from app.services.annotations import weekly_sentiment_async, weekly_topics_async
 
-from app.services.clerk_auth import get_current_user
-from app.db.models import User, CheckIn
-from app.db.database import get_db
+from app.services.clerk_auth import CurrentUser, get_current_user
+from app.db.async_database import get_async_db
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/mood-forecast")
-def get_mood_forecast(
+async def get_mood_forecast(
     days: int = 30, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
-        return mood_forecast(db, current_user.id, days)
+        return await mood_forecast_async(db, current_user.id, days)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-from app.services.insights import analyze_checkin
+from app.services.insights import insights_history_async, latest_insights_async
 
 @router.get("/insights/latest")
-def get_latest_insights(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_latest_insights(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Get the most recent check-in for THIS user
-    latest_checkin = (
-        db.query(CheckIn)
-        .filter(CheckIn.user_id == current_user.id)
-        .order_by(CheckIn.timestamp.desc())
-        .first()
-    )
+    # Stored with the most recent check-in for THIS user when it was created
+    insights = await latest_insights_async(db, current_user.id)
     
-    if not latest_checkin:
+    if insights is None:
         raise HTTPException(status_code=404, detail="No check-ins found to analyze")
         
-    return analyze_checkin(latest_checkin)
+    return insights
+
+@router.get("/insights/history")
+async def get_insights_history(
+    limit: int = 10,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Insights of the last `limit` check-ins (newest first), as stored.
+    """
+    return await insights_history_async(db, current_user.id, min(max(limit, 1), 100))
 
 @router.get("/streak")
-def get_streak(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_streak(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Current streak (0 unless the last check-in was today or yesterday in the
+    user's timezone) and the longest streak so far.
+    """
+    return await get_streak_async(db, current_user.id, current_user.timezone)
+
+@router.get("/patterns")
+async def get_pattern(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    The user's weekly mood pattern (k-means cluster of their latest week's
+    mood / energy / sleep mean, variance and trend).
+    """
+    return await get_user_pattern(db, current_user.id)
+
+@router.get("/topics/weekly")
+async def get_weekly_topics(
+    weeks: int = 12,
+    source: str = "all",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Topic frequency per week across check-ins, journal entries and chat
+    (or one of them via source=checkins|journal|chat).
+    """
+    try:
+        return await weekly_topics_async(db, current_user.id, weeks, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sentiment/weekly")
+async def get_weekly_sentiment(
+    weeks: int = 12,
+    source: str = "all",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    return {"streak": get_current_streak(db, current_user.id)}
+    """
+    Average keyword sentiment per week, with positive / negative / neutral counts.
+    """
+    try:
+        return await weekly_sentiment_async(db, current_user.id, weeks, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
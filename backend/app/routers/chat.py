@@ -1,19 +1,12 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from app.services.chat import respond_to_chat
-from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
+import json
+from fastapi.responses import StreamingResponse
+from app.services.chat import respond_to_chat_async, stream_chat
+from sqlalchemy.ext.asyncio import AsyncSession
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-from app.services.clerk_auth import get_current_user
-from app.db.models import User
-from app.db.database import get_db
+from app.services.clerk_auth import CurrentUser, get_current_user
+from app.db.async_database import get_async_db
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -21,12 +14,31 @@ class ChatMessage(BaseModel):
     message: str
 
 @router.post("/message")
-def chat_endpoint(
+async def chat_endpoint(
     payload: ChatMessage, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    print(f"DEBUG: Received message from {current_user.username}: {payload.message}")
-    response = respond_to_chat(db, current_user.id, payload.message)
-    print(f"DEBUG: Returning response: {response}")
+    response = await respond_to_chat_async(db, current_user.id, payload.message)
     return {"response": response}
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    payload: ChatMessage,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Server-Sent Events version of /chat/message.
+    Emits `chunk` events as the reply is generated (or one `fallback` event), then `done`.
+    """
+    async def event_source():
+        async for event in stream_chat(db, current_user.id, payload.message):
+            yield f"event: {event['type']}\ndata: {json.dumps({'text': event['text']})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
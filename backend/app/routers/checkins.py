@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.async_database import get_async_db
 from app.db import models
+from app.db.models import to_naive_utc, utcnow
+from app.services.rollups import apply_checkin_async, checkin_day
+from app.services.regression import apply_checkin_to_forecast
+from app.services.streaks import record_checkin_streak
+from app.services.annotations import annotation_from_hits
+from app.services.insights import insight_columns
+from app.services.lexicon import lexicon
 
-from app.services.clerk_auth import get_current_user
-from app.db.models import User
+from app.services.clerk_auth import CurrentUser, get_current_user
 
 router = APIRouter()
 
@@ -20,12 +26,14 @@ class CheckInCreate(BaseModel):
     timestamp: Optional[datetime] = None
 
 @router.post("/")
-def create_checkin(
+async def create_checkin(
     payload: CheckInCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    ts = payload.timestamp or datetime.now(timezone.utc)
+    ts = to_naive_utc(payload.timestamp) if payload.timestamp else utcnow()
+    # One keyword scan feeds both the annotations and the insights
+    hits = lexicon.scan(payload.text)
 
     checkin = models.CheckIn(
         user_id=current_user.id,
@@ -34,10 +42,17 @@ def create_checkin(
         energy=payload.energy,
         sleep_hours=payload.sleep_hours,
         timestamp=ts,
+        **annotation_from_hits(hits),
+        # The payload carries every field the rules read
+        **insight_columns(payload, hits),
     )
     db.add(checkin)
-    db.commit()
-    db.refresh(checkin)
+    await db.flush()
+    day_count, day_mood_sum = await apply_checkin_async(db, checkin)
+    await apply_checkin_to_forecast(db, current_user.id, checkin_day(ts), payload.mood, day_count, day_mood_sum)
+    await record_checkin_streak(db, current_user.id, current_user.timezone, ts)
+    await db.commit()
+    await db.refresh(checkin, ["timestamp"])
 
     return {
         "message": "check-in saved",
@@ -1,7 +1,46 @@
 from fastapi import APIRouter
+from app.db.database import engine_profile
+from app.db.profiles import async_pool_metrics, pool_metrics
+from app.services.ai_service import gemini_wrapper
+from app.services.sql_profiler import sql_profiler
+from app.services.summary_cache import summary_cache
 
 router = APIRouter()
 
 @router.get("/")
 def ping():
     return {"status": "ok"}
+
+@router.get("/ai")
+def ai_status():
+    """
+    Current state of the Gemini circuit breaker (closed / open / half_open) and trip counts.
+    """
+    return gemini_wrapper.breaker.snapshot()
+
+@router.get("/cache")
+def cache_status():
+    """
+    Hit/miss counters for the journal summary cache.
+    """
+    return {"journal_summaries": summary_cache.stats()}
+
+@router.get("/db")
+def db_status():
+    """
+    Active engine profile plus connection-pool occupancy and checkout wait times
+    for the async (API) and sync (jobs, CLIs) engines.
+    """
+    return {
+        "profile": engine_profile["name"],
+        "pool": async_pool_metrics.snapshot(),
+        "sync_pool": pool_metrics.snapshot(),
+    }
+
+@router.get("/sql")
+def sql_status():
+    """
+    Recent per-request SQL profiles (query count, DB time, slowest statements,
+    likely N+1 shapes). Empty unless SQL_PROFILER=true.
+    """
+    return sql_profiler.snapshot()
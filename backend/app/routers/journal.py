@@ -1,117 +1,150 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
-from typing import List
-from app.db.database import SessionLocal
-from app.db.models import JournalEntry
-from app.services.journal import summarize_journal
-
-from app.services.clerk_auth import get_current_user
-from app.db.models import User, JournalEntry
-from app.db.database import get_db
+from typing import List, Optional
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.services.journal_jobs import enqueue_analysis, journal_workers
+from app.services.history import get_history_page_async
+from app.services.annotations import annotate
 
-from datetime import datetime, timezone
-from app.db.models import User, JournalEntry, ChatMessage
+from app.services.clerk_auth import CurrentUser, get_current_user
+from app.db.models import JournalEntry
+from app.db.async_database import AsyncSessionLocal, get_async_db
 
 router = APIRouter(prefix="/journal", tags=["journal"])
 
 class JournalCreate(BaseModel):
     content: str
 
+def _entry_payload(entry: JournalEntry) -> dict:
+    return {
+        "id": entry.id,
+        "user_id": entry.user_id,
+        "content": entry.content,
+        "summary": entry.summary,
+        "advice": entry.advice,
+        "timestamp": entry.timestamp,
+        "analysis_status": entry.analysis_status,
+    }
+
+async def _find_entry(db: AsyncSession, entry_id: int, user_id: int) -> JournalEntry:
+    entry = await db.scalar(
+        select(JournalEntry)
+        .where(JournalEntry.id == entry_id, JournalEntry.user_id == user_id)
+        # analysis_status reads the job; lazy loads are not available on AsyncSession
+        .options(selectinload(JournalEntry.analysis_job))
+        .execution_options(populate_existing=True)
+    )
+    if not entry:
+        raise HTTPException(status_code=404, detail="Journal entry not found")
+    return entry
+
+async def _load_entry(db: AsyncSession, entry_id: int, user_id: int) -> dict:
+    return _entry_payload(await _find_entry(db, entry_id, user_id))
+
 @router.post("/")
-def create_journal_entry(
+async def create_journal_entry(
     payload: JournalCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    """
+    Saves the entry right away with analysis_status 'pending'.
+    The AI summary is filled in by a background worker; poll GET /journal/{id}
+    or listen on GET /journal/{id}/events for the result.
+    """
     if not payload.content:
         raise HTTPException(status_code=400, detail="Journal content cannot be empty")
     
-    # AI Summarization
-    analysis = summarize_journal(payload.content)
-    
     entry = JournalEntry(
         user_id=current_user.id,
         content=payload.content,
-        summary=analysis.get("summary"),
-        advice=analysis.get("advice")
+        **annotate(payload.content),
     )
     
     db.add(entry)
-    db.commit()
-    db.refresh(entry)
+    enqueue_analysis(db, entry)
+    await db.commit()
+    # Reload column values as stored (same timestamp format as GET)
+    await db.refresh(entry, ["timestamp"])
+    journal_workers.wake()
     
-    return entry
+    return _entry_payload(entry)
 
 @router.get("/")
-def get_journal_entries(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_journal_entries(
+    before: Optional[str] = None,
+    limit: int = 50,
+    type: Optional[str] = None,
+    fields: str = "full",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # 1. Get Journal Entries
-    journal_entries = (
-        db.query(JournalEntry)
-        .filter(JournalEntry.user_id == current_user.id)
-        .all()
-    )
-    
-    # 2. Get Chat Messages
-    chat_messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.user_id == current_user.id)
-        .all()
+    """
+    Unified journal + chat history, newest first, one page at a time.
+    Pass the returned `next_cursor` as `before` to get the next (older) page.
+    `type` limits the feed to 'journal' or 'chat'; `fields=list` returns a short
+    `preview` instead of the full content.
+    """
+    if fields not in ("full", "list"):
+        raise HTTPException(status_code=400, detail="fields must be 'full' or 'list'")
+    try:
+        return await get_history_page_async(db, current_user.id, before=before, limit=limit, kind=type, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{entry_id}")
+async def get_journal_entry(
+    entry_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    return await _load_entry(db, entry_id, current_user.id)
+
+@router.get("/{entry_id}/events")
+async def journal_entry_events(
+    entry_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Server-Sent Events stream that emits one `analysis` event once the entry's
+    analysis has finished (or after ~2 minutes, with whatever status it has then).
+    """
+    entry = await _load_entry(db, entry_id, current_user.id)
+    # Don't hold the request's connection while the stream waits
+    await db.close()
+
+    async def event_source():
+        current = entry
+        for _ in range(60):
+            if current["analysis_status"] not in ("pending", "running"):
+                break
+            # Woken early by a local worker; the timeout covers jobs run by other instances
+            await journal_workers.wait_for_update(entry_id, timeout=2.0)
+            async with AsyncSessionLocal() as poll_db:
+                current = await _load_entry(poll_db, entry_id, current_user.id)
+        yield f"event: analysis\ndata: {json.dumps(jsonable_encoder(current))}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    
-    # 3. Transform and Merge
-    unified_history = []
-    
-    for entry in journal_entries:
-        unified_history.append({
-            "id": f"journal_{entry.id}",
-            "db_id": entry.id,
-            "type": "journal",
-            "content": entry.content,
-            "summary": entry.summary,
-            "advice": entry.advice,
-            "timestamp": entry.timestamp,
-            "role": "user" # Implicitly user
-        })
-        
-    for msg in chat_messages:
-        unified_history.append({
-            "id": f"chat_{msg.id}",
-            "db_id": msg.id,
-            "type": "chat",
-            "content": msg.content,
-            "role": msg.role,
-            "timestamp": msg.timestamp,
-            # Chat messages don't have separate summary/advice fields usually, 
-            # but if it's a model response, the content IS the advice.
-            "summary": None, 
-            "advice": None
-        })
-        
-    # 4. Sort by Timestamp Descending
-    unified_history.sort(key=lambda x: x["timestamp"], reverse=True)
-    
-    return unified_history
 
 @router.delete("/{entry_id}")
-def delete_journal_entry(
+async def delete_journal_entry(
     entry_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    entry = (
-        db.query(JournalEntry)
-        .filter(JournalEntry.id == entry_id, JournalEntry.user_id == current_user.id)
-        .first()
-    )
-    
-    if not entry:
-        raise HTTPException(status_code=404, detail="Journal entry not found")
+    entry = await _find_entry(db, entry_id, current_user.id)
         
-    db.delete(entry)
-    db.commit()
+    await db.delete(entry)
+    await db.commit()
     
     return {"message": "Journal entry deleted"}
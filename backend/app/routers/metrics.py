@@ -0,0 +1,57 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.db.profiles import async_pool_metrics, pool_metrics
+from app.services import metrics
+from app.services.ai_service import gemini_wrapper
+
+router = APIRouter(tags=["metrics"])
+
+# PoolMetrics.snapshot() key -> (metric name, type)
+POOL_METRICS = {
+    "checkouts": ("serene_db_pool_checkouts_total", "counter"),
+    "timeouts": ("serene_db_pool_timeouts_total", "counter"),
+    "connects": ("serene_db_pool_connects_total", "counter"),
+    "invalidated": ("serene_db_pool_invalidated_total", "counter"),
+    "wait_seconds_total": ("serene_db_pool_wait_seconds_total", "counter"),
+    "wait_seconds_max": ("serene_db_pool_wait_seconds_max", "gauge"),
+    "wait_seconds_p95": ("serene_db_pool_wait_seconds_p95", "gauge"),
+    "pool_size": ("serene_db_pool_size", "gauge"),
+    "checked_out": ("serene_db_pool_checked_out", "gauge"),
+    "overflow": ("serene_db_pool_overflow", "gauge"),
+}
+
+BREAKER_STATES = ("closed", "half_open", "open")
+
+def _pool_lines() -> list:
+    snapshots = {"api": async_pool_metrics.snapshot(), "sync": pool_metrics.snapshot()}
+    lines = []
+    for key, (name, kind) in POOL_METRICS.items():
+        lines.append(f"# TYPE {name} {kind}")
+        for engine_name, snapshot in snapshots.items():
+            if key in snapshot:  # occupancy is only known for queue pools
+                lines.append(f'{name}{{engine="{engine_name}"}} {snapshot[key]}')
+    return lines
+
+def _breaker_lines() -> list:
+    snapshot = gemini_wrapper.breaker.snapshot()
+    lines = ["# TYPE serene_gemini_breaker_state gauge"]
+    lines += [f'serene_gemini_breaker_state{{state="{state}"}} {int(snapshot["state"] == state)}' for state in BREAKER_STATES]
+    lines += [
+        "# TYPE serene_gemini_breaker_trips_total counter",
+        f"serene_gemini_breaker_trips_total {snapshot['trips']}",
+        "# TYPE serene_gemini_breaker_rejected_total counter",
+        f"serene_gemini_breaker_rejected_total {snapshot['rejected_calls']}",
+    ]
+    return lines
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Request latency histograms, upstream call counters, pool and breaker state
+    in Prometheus text format.
+    """
+    return PlainTextResponse(
+        metrics.render([*_pool_lines(), *_breaker_lines()]),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,40 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.services.request_profiler import request_profiler, token_matches
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    # 404 rather than 401/403: without the token the endpoints don't exist
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@router.get("/", dependencies=[Depends(require_profile_token)])
+def list_profiles():
+    """
+    Stored request profiles, newest first.
+    """
+    return {"profiles": request_profiler.list(), "ring_size": request_profiler.ring_size}
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profile_token)])
+def get_profile(
+    profile_id: str,
+    format: str = Query("pstats", pattern="^(pstats|text)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls|ncalls)$"),
+    limit: int = Query(40, ge=1, le=500),
+):
+    """
+    The raw pstats file (load with pstats / snakeviz), or a text summary with format=text.
+    """
+    if format == "text":
+        summary = request_profiler.summary(profile_id, sort, limit)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(summary)
+    path = request_profiler.pstats_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
@@ -1,25 +1,188 @@
 import os
+import re
 import time
-from google import genai
+import asyncio
+import threading
 from google.genai import types
+from google.genai import errors as genai_errors
 from dotenv import load_dotenv
 
+from app.services.gemini_backends import GEMINI_BACKEND, create_client
+from app.services.metrics import timed_model_call
+
 load_dotenv()
 
+# Upper bound on in-flight Gemini calls made through the async path
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Seconds before an async Gemini call is abandoned and the caller falls back
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
+# Consecutive quota errors before the breaker opens
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "3"))
+# Cooldown used when Gemini gives no retry hint, and the cap for repeated trips
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+GEMINI_BREAKER_MAX_COOLDOWN = float(os.getenv("GEMINI_BREAKER_MAX_COOLDOWN", "900"))
+
+# e.g. "'retryDelay': '37s'" in the error details or "Please retry in 37.07s." in the message
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s"),
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+def is_quota_error(e: Exception) -> bool:
+    if isinstance(e, genai_errors.APIError):
+        return e.code == 429 or e.status == "RESOURCE_EXHAUSTED"
+    # Non-API exceptions (transport wrappers, test doubles) only carry a message
+    error_str = str(e).lower()
+    return "429" in error_str or "quota" in error_str or "limit" in error_str
+
+def retry_after_hint(e: Exception):
+    """
+    Seconds Gemini asked us to wait before retrying, if it said so.
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    text = str(e)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+class CircuitBreaker:
+    """
+    Stops calling Gemini while it keeps answering with quota errors.
+
+    closed    -> calls go through; `threshold` consecutive quota errors open it
+    open      -> calls are rejected until the cooldown (retry hint, doubled on each re-trip) passes
+    half_open -> a single probe call is let through; success closes, another quota error re-opens
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=GEMINI_BREAKER_THRESHOLD, cooldown=GEMINI_BREAKER_COOLDOWN, max_cooldown=GEMINI_BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._reopen_count = 0
+        self._opened_until = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() >= self._opened_until:
+                self._state = self.HALF_OPEN
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._reopen_count = 0
+            self._probe_in_flight = False
+
+    def record_quota_error(self, retry_after=None):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.OPEN:
+                # Late failures from calls that started before the trip
+                return
+            if self._state == self.HALF_OPEN:
+                # Probe failed: back off harder than last time
+                self._reopen_count += 1
+            elif self._consecutive_failures < self.threshold:
+                return
+            cooldown = max(retry_after or 0, self.base_cooldown) * (2 ** self._reopen_count)
+            self._state = self.OPEN
+            self._opened_until = time.monotonic() + min(cooldown, self.max_cooldown)
+            self._probe_in_flight = False
+            self.trips += 1
+
+    def release(self):
+        """
+        Call ended without telling us anything about quota (timeout, other error).
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() >= self._opened_until:
+                return self.HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "trips": self.trips,
+                "rejected_calls": self.rejected,
+                "consecutive_quota_errors": self._consecutive_failures,
+                "retry_in_seconds": round(max(self._opened_until - time.monotonic(), 0.0), 1) if state == self.OPEN else 0.0,
+            }
+
 class GeminiWrapper:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            print("WARNING: GEMINI_API_KEY not found in environment variables")
+        self.backend = GEMINI_BACKEND
+        try:
+            # Live Gemini unless GEMINI_BACKEND picks record / replay / synthetic
+            self.client = create_client(self.api_key, self.backend)
+        except Exception as e:
+            print(f"ERROR: Failed to initialize Gemini client: {e}")
             self.client = None
-        else:
-            try:
-                self.client = genai.Client(api_key=self.api_key)
-            except Exception as e:
-                print(f"ERROR: Failed to initialize Gemini client: {e}")
-                self.client = None
         self.model_id = "gemini-2.0-flash-lite"
+        self.max_concurrency = GEMINI_MAX_CONCURRENCY
+        self.timeout = GEMINI_TIMEOUT_SECONDS
+        # Created lazily so it binds to the running event loop
+        self._semaphore = None
+        self.breaker = CircuitBreaker()
+
+    def _build_config(self, system_instruction=None, temperature=0.7, response_mime_type=None):
+        config = {
+            "temperature": temperature,
+        }
+        if system_instruction:
+            config["system_instruction"] = system_instruction
+        if response_mime_type:
+            config["response_mime_type"] = response_mime_type
+        return types.GenerateContentConfig(**config)
 
+    def _handle_error(self, e):
+        print(f"DEBUG_AI: Gemini error: {e}")
+        if is_quota_error(e):
+            self.breaker.record_quota_error(retry_after_hint(e))
+            return None, True
+        self.breaker.release()
+        return None, False
+
+    def _breaker_open(self) -> bool:
+        if self.breaker.allow_request():
+            return False
+        print("DEBUG_AI: Circuit breaker open - skipping Gemini call")
+        return True
+
+    @timed_model_call("gemini", "generate")
     def safe_generate(self, contents, system_instruction=None, temperature=0.7, response_mime_type=None):
         """
         Attempts to generate content from Gemini.
@@ -28,28 +191,110 @@ class GeminiWrapper:
         if not self.client:
             print("ERROR: Gemini client not initialized - triggering fallback")
             return None, True  # Trigger fallback to Mock Bestie
-        
-        try:
-            config = {
-                "temperature": temperature,
-            }
-            if system_instruction:
-                config["system_instruction"] = system_instruction
-            if response_mime_type:
-                config["response_mime_type"] = response_mime_type
 
+        if self._breaker_open():
+            return None, True
+
+        try:
             response = self.client.models.generate_content(
                 model=self.model_id,
                 contents=contents,
-                config=types.GenerateContentConfig(**config)
+                config=self._build_config(system_instruction, temperature, response_mime_type)
             )
+            self.breaker.record_success()
             return response.text, False
         except Exception as e:
-            error_str = str(e).lower()
-            print(f"DEBUG_AI: Gemini error: {e}")
-            if "429" in error_str or "quota" in error_str or "limit" in error_str:
-                return None, True
+            return self._handle_error(e)
+
+    @timed_model_call("gemini", "generate_async")
+    async def safe_generate_async(self, contents, system_instruction=None, temperature=0.7, response_mime_type=None):
+        """
+        Async variant of safe_generate built on client.aio.
+        Waits for one of max_concurrency slots and gives up after self.timeout seconds.
+        Returns (text, is_quota_exceeded)
+        """
+        if not self.client:
+            print("ERROR: Gemini client not initialized - triggering fallback")
+            return None, True  # Trigger fallback to Mock Bestie
+
+        if self._breaker_open():
+            return None, True
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            async with self._semaphore:
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=self.model_id,
+                        contents=contents,
+                        config=self._build_config(system_instruction, temperature, response_mime_type)
+                    ),
+                    timeout=self.timeout,
+                )
+            self.breaker.record_success()
+            return response.text, False
+        except asyncio.TimeoutError:
+            print(f"DEBUG_AI: Gemini call timed out after {self.timeout}s")
+            self.breaker.release()
             return None, False
+        except Exception as e:
+            return self._handle_error(e)
+
+    @timed_model_call("gemini", "stream")
+    async def stream_generate_async(self, contents, system_instruction=None, temperature=0.7):
+        """
+        Streams a Gemini reply via client.aio's generate_content_stream.
+        Yields (chunk_text, False) as chunks arrive; on failure yields a single
+        (None, is_quota_exceeded) and stops. self.timeout bounds the wait for each chunk.
+        """
+        if not self.client:
+            print("ERROR: Gemini client not initialized - triggering fallback")
+            yield None, True
+            return
+
+        if self._breaker_open():
+            yield None, True
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            received = False
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(
+                        model=self.model_id,
+                        contents=contents,
+                        config=self._build_config(system_instruction, temperature)
+                    ),
+                    timeout=self.timeout,
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if not received:
+                        # An opened stream can still fail on its first chunk; only a
+                        # delivered chunk closes a half-open breaker
+                        received = True
+                        self.breaker.record_success()
+                    if chunk.text:
+                        yield chunk.text, False
+            except asyncio.TimeoutError:
+                print(f"DEBUG_AI: Gemini stream timed out after {self.timeout}s")
+                self.breaker.release()
+                yield None, False
+            except Exception as e:
+                yield self._handle_error(e)
+            finally:
+                # Empty or cancelled streams prove nothing either way; free the probe
+                if not received:
+                    self.breaker.release()
 
 # Global instance
 gemini_wrapper = GeminiWrapper()
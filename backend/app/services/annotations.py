@@ -0,0 +1,143 @@
+"""
+Write-time sentiment and topic annotations for check-ins, journal entries and
+the user's chat messages, plus the weekly SQL aggregates over them.
+
+sentiment_score is (positive - negative) / (positive + negative) keyword hits,
+in [-1, 1] with the same sign as analyze_sentiment_lite; 0.0 for no hits.
+topics is stored delimited as ",work,health," (",," for none) so a topic can
+be counted in SQL with LIKE '%,work,%'. NULL in both means "not annotated yet".
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, case, cast, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ChatMessage, CheckIn, JournalEntry, utcnow
+from app.services.lexicon import LexiconHits, lexicon
+
+# Stored topic -> lexicon categories that imply it
+TOPICS: Dict[str, tuple] = {
+    "relationship": ("relationship_crisis", "relationship_entity"),
+    "work": ("work",),
+    "academic": ("academic",),
+    "social": ("social",),
+    "financial": ("financial",),
+    "health": ("health",),
+}
+
+# source -> (model, text column, extra filter)
+SOURCES = {
+    "checkins": (CheckIn, CheckIn.text, None),
+    "journal": (JournalEntry, JournalEntry.content, None),
+    "chat": (ChatMessage, ChatMessage.content, ChatMessage.role == "user"),
+}
+
+def annotation_from_hits(hits: LexiconHits) -> dict:
+    pos_count = hits.count("positive")
+    neg_count = hits.count("negative")
+    total = pos_count + neg_count
+    topics = [topic for topic, categories in TOPICS.items() if any(hits.has(c) for c in categories)]
+    return {
+        "sentiment_score": (pos_count - neg_count) / total if total else 0.0,
+        "topics": "," + ",".join(topics) + ",",
+    }
+
+def annotate(text: Optional[str]) -> dict:
+    """
+    Column values for a new row: {"sentiment_score": ..., "topics": ...}.
+    """
+    return annotation_from_hits(lexicon.scan(text))
+
+def annotate_many(texts: Sequence[Optional[str]]) -> List[dict]:
+    return [annotation_from_hits(hits) for hits in lexicon.scan_many(texts)]
+
+def topic_list(stored: Optional[str]) -> List[str]:
+    return [topic for topic in (stored or "").split(",") if topic]
+
+# --- weekly aggregates ---
+
+def _week_start(dialect_name: str, column):
+    # Monday of the (UTC) week
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc("week", column), Date)
+    return func.date(column, "weekday 0", "-6 days")
+
+def _annotated_rows(dialect_name: str, user_id: int, since: datetime, sources: Sequence[str]):
+    selects = []
+    for source in sources:
+        model, _, extra = SOURCES[source]
+        stmt = (
+            select(
+                _week_start(dialect_name, model.timestamp).label("week"),
+                model.sentiment_score.label("score"),
+                model.topics.label("topics"),
+                literal(source).label("source"),
+            )
+            .where(model.user_id == user_id, model.timestamp >= since, model.sentiment_score.is_not(None))
+        )
+        if extra is not None:
+            stmt = stmt.where(extra)
+        selects.append(stmt)
+    return (selects[0] if len(selects) == 1 else union_all(*selects)).subquery()
+
+def _since(weeks: int) -> datetime:
+    return utcnow() - timedelta(weeks=weeks)
+
+def _resolve_sources(source: str) -> List[str]:
+    if source == "all":
+        return list(SOURCES)
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}' (expected one of: all, {', '.join(SOURCES)})")
+    return [source]
+
+async def weekly_topics_async(db: AsyncSession, user_id: int, weeks: int = 12, source: str = "all") -> List[dict]:
+    """
+    Per week: how many annotated rows mention each topic.
+    """
+    rows = _annotated_rows(db.get_bind().dialect.name, user_id, _since(weeks), _resolve_sources(source))
+    counts = [
+        func.sum(case((rows.c.topics.like(f"%,{topic},%"), 1), else_=0)).label(topic)
+        for topic in TOPICS
+    ]
+    result = await db.execute(
+        select(rows.c.week, func.count().label("total"), *counts)
+        .group_by(rows.c.week)
+        .order_by(rows.c.week)
+    )
+    return [
+        {
+            "week": str(row.week)[:10],
+            "total": row.total,
+            "topics": {topic: int(getattr(row, topic) or 0) for topic in TOPICS},
+        }
+        for row in result
+    ]
+
+async def weekly_sentiment_async(db: AsyncSession, user_id: int, weeks: int = 12, source: str = "all") -> List[dict]:
+    """
+    Per week: average sentiment score and positive / negative / neutral counts.
+    """
+    rows = _annotated_rows(db.get_bind().dialect.name, user_id, _since(weeks), _resolve_sources(source))
+    result = await db.execute(
+        select(
+            rows.c.week,
+            func.count().label("total"),
+            func.avg(rows.c.score).label("average"),
+            func.sum(case((rows.c.score > 0, 1), else_=0)).label("positive"),
+            func.sum(case((rows.c.score < 0, 1), else_=0)).label("negative"),
+        )
+        .group_by(rows.c.week)
+        .order_by(rows.c.week)
+    )
+    return [
+        {
+            "week": str(row.week)[:10],
+            "total": row.total,
+            "average_sentiment": round(float(row.average), 3),
+            "positive": int(row.positive),
+            "negative": int(row.negative),
+            "neutral": row.total - int(row.positive) - int(row.negative),
+        }
+        for row in result
+    ]
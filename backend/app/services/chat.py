@@ -1,9 +1,14 @@
 import os
-from typing import List, Dict
+import anyio
+from typing import AsyncIterator, List, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.models import ChatMessage, JournalEntry
 from app.services.ai_service import gemini_wrapper
-from app.services.sentiment import analyze_sentiment_lite
+from app.services.annotations import annotate
+from app.services.lexicon import lexicon
+from app.services.sentiment import sentiment_from_hits
 from google.genai import types
 
 SYSTEM_PROMPT = """
@@ -27,18 +32,19 @@ class ChatService:
         """
         Provides a keyword-based fallback when Gemini hits a quota limit.
         """
-        text = message.lower()
-        sentiment = analyze_sentiment_lite(text)
+        # Topics and sentiment from a single keyword scan
+        hits = lexicon.scan(message)
+        sentiment = sentiment_from_hits(hits)
         
         # 1. Topic Detection (Reuse logic from insights)
         reply = "I'm so sorry, bestie! My AI brain is taking a quick 60-second beauty nap (I've hit my free-tier limit). "
         
         advice = ""
-        if any(word in text for word in ["fight", "partner", "breakup", "relationship"]):
+        if hits.has("chat_relationship"):
             advice = "I hear you on that relationship stress. 💖 Try taking a 20-minute breather before talking again—it really helps the heart reset!"
-        elif any(word in text for word in ["work", "job", "boss", "deadline"]):
+        elif hits.has("chat_work"):
             advice = "Ugh, work pressure is the worst! 💼 Try the Pomodoro technique for just 25 mins to get one small win."
-        elif any(word in text for word in ["sleep", "tired", "awake"]):
+        elif hits.has("chat_sleep"):
             advice = "Sending you sleepy vibes! 🌙 Try the 4-7-8 breathing technique: inhale for 4, hold for 7, exhale for 8."
         elif sentiment == "negative":
             advice = "I can feel you're having a rough time. 💖 Even if my brain is on a break, I'm here. Drink a glass of water and take one deep breath for me?"
@@ -58,32 +64,42 @@ class ChatService:
         }
         return greetings.get(msg)
 
-    def get_response(self, db: Session, user_id: int, message: str) -> str:
-        # 1. Try local greeting
-        local_reply = self.local_greeting(message)
-        if local_reply:
-            self._save_chat(db, user_id, message, local_reply)
-            return local_reply
-
-        # 2. Get Chat History
-        db_history = (
-            db.query(ChatMessage)
-            .filter(ChatMessage.user_id == user_id)
+    def _context_queries(self, user_id: int):
+        # 1. Get Chat History
+        history = (
+            select(ChatMessage)
+            .where(ChatMessage.user_id == user_id)
             .order_by(ChatMessage.timestamp.desc())
             .limit(10)
-            .all()
         )
-        db_history.reverse()
-        
-        # 3. Get Recent Journal Entries (Context Injection)
-        recent_journals = (
-            db.query(JournalEntry)
-            .filter(JournalEntry.user_id == user_id)
+        # 2. Get Recent Journal Entries (Context Injection)
+        journals = (
+            select(JournalEntry)
+            .where(JournalEntry.user_id == user_id)
             .order_by(JournalEntry.timestamp.desc())
             .limit(3)
-            .all()
         )
-        # Reverse to chronological order
+        return history, journals
+
+    def _build_contents(self, db: Session, user_id: int, message: str) -> List[types.Content]:
+        history, journals = self._context_queries(user_id)
+        return self._contents_from(
+            list(db.execute(history).scalars()),
+            list(db.execute(journals).scalars()),
+            message,
+        )
+
+    async def _build_contents_async(self, db: AsyncSession, user_id: int, message: str) -> List[types.Content]:
+        history, journals = self._context_queries(user_id)
+        return self._contents_from(
+            list((await db.execute(history)).scalars()),
+            list((await db.execute(journals)).scalars()),
+            message,
+        )
+
+    def _contents_from(self, db_history, recent_journals, message: str) -> List[types.Content]:
+        # Both come newest first; reverse to chronological order
+        db_history.reverse()
         recent_journals.reverse()
         
         contents = []
@@ -103,31 +119,113 @@ class ChatService:
 
         for msg in db_history:
             contents.append(types.Content(role=msg.role, parts=[types.Part(text=msg.content)]))
+
+        return contents + [types.Content(role="user", parts=[types.Part(text=message)])]
+
+    def _resolve_reply(self, message: str, bot_text, quota_hit: bool) -> str:
+        if quota_hit:
+            return self.mock_bestie_reply(message)
+        if not bot_text:
+            return "Oouf, I hit a little snag! Can you say that again, bestie? ✨"
+        return bot_text
+
+    def get_response(self, db: Session, user_id: int, message: str) -> str:
+        # 1. Try local greeting
+        local_reply = self.local_greeting(message)
+        if local_reply:
+            self._save_chat(db, user_id, message, local_reply)
+            return local_reply
+
+        # 2. Build history + journal context
+        contents = self._build_contents(db, user_id, message)
         
-        # 4. Call Gemini Wrapper
+        # 3. Call Gemini Wrapper
         bot_text, quota_hit = gemini_wrapper.safe_generate(
-            contents=contents + [types.Content(role="user", parts=[types.Part(text=message)])],
+            contents=contents,
             system_instruction=self.system_prompt
         )
+        bot_text = self._resolve_reply(message, bot_text, quota_hit)
 
-        if quota_hit:
-            bot_text = self.mock_bestie_reply(message)
-        elif not bot_text:
-            bot_text = "Oouf, I hit a little snag! Can you say that again, bestie? ✨"
-
-        # 5. Save everything
+        # 4. Save everything
         self._save_chat(db, user_id, message, bot_text)
         return bot_text
 
-    def _save_chat(self, db: Session, user_id: int, user_content: str, bot_content: str):
-        user_msg = ChatMessage(user_id=user_id, role="user", content=user_content)
+    async def get_response_async(self, db: AsyncSession, user_id: int, message: str) -> str:
+        """
+        Same flow as get_response on an AsyncSession, awaiting both the DB and Gemini.
+        """
+        local_reply = self.local_greeting(message)
+        if local_reply:
+            await self._save_chat_async(db, user_id, message, local_reply)
+            return local_reply
+
+        contents = await self._build_contents_async(db, user_id, message)
+
+        bot_text, quota_hit = await gemini_wrapper.safe_generate_async(
+            contents=contents,
+            system_instruction=self.system_prompt
+        )
+        bot_text = self._resolve_reply(message, bot_text, quota_hit)
+
+        await self._save_chat_async(db, user_id, message, bot_text)
+        return bot_text
+
+    async def stream_response(self, db: AsyncSession, user_id: int, message: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Streaming variant of get_response.
+        Yields {"type": "chunk", "text": ...} events as Gemini produces them, or a single
+        {"type": "fallback", "text": ...} event for greetings/quota/errors.
+        Whatever was produced is saved once the stream ends or the client disconnects.
+        """
+        local_reply = self.local_greeting(message)
+        if local_reply:
+            await self._save_chat_async(db, user_id, message, local_reply)
+            yield {"type": "fallback", "text": local_reply}
+            return
+
+        contents = await self._build_contents_async(db, user_id, message)
+
+        parts = []
+        try:
+            async for chunk, quota_hit in gemini_wrapper.stream_generate_async(
+                contents=contents,
+                system_instruction=self.system_prompt
+            ):
+                if chunk is None:
+                    if not parts:
+                        fallback = self._resolve_reply(message, None, quota_hit)
+                        parts.append(fallback)
+                        yield {"type": "fallback", "text": fallback}
+                    break
+                parts.append(chunk)
+                yield {"type": "chunk", "text": chunk}
+        finally:
+            bot_text = "".join(parts) or self._resolve_reply(message, None, False)
+            # Shielded so the save still runs when the stream is cancelled by a disconnect
+            with anyio.CancelScope(shield=True):
+                await self._save_chat_async(db, user_id, message, bot_text)
+
+    def _chat_rows(self, user_id: int, user_content: str, bot_content: str):
+        user_msg = ChatMessage(user_id=user_id, role="user", content=user_content, **annotate(user_content))
         bot_msg = ChatMessage(user_id=user_id, role="model", content=bot_content)
-        db.add(user_msg)
-        db.add(bot_msg)
+        return [user_msg, bot_msg]
+
+    def _save_chat(self, db: Session, user_id: int, user_content: str, bot_content: str):
+        db.add_all(self._chat_rows(user_id, user_content, bot_content))
         db.commit()
 
+    async def _save_chat_async(self, db: AsyncSession, user_id: int, user_content: str, bot_content: str):
+        db.add_all(self._chat_rows(user_id, user_content, bot_content))
+        await db.commit()
+
 # Global instance
 chat_service = ChatService()
 
 def respond_to_chat(db: Session, user_id: int, message: str) -> str:
     return chat_service.get_response(db, user_id, message)
+
+async def respond_to_chat_async(db: AsyncSession, user_id: int, message: str) -> str:
+    return await chat_service.get_response_async(db, user_id, message)
+
+def stream_chat(db: AsyncSession, user_id: int, message: str) -> AsyncIterator[Dict[str, str]]:
+    return chat_service.stream_response(db, user_id, message)
@@ -1,11 +1,19 @@
 import os
+import time
+import asyncio
+import hashlib
 import httpx
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
 from jose import jwt, JWTError
-from fastapi import Request, HTTPException, Depends, status
+from fastapi import Request, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy import select, update
+from app.db.async_database import AsyncSessionLocal
+from app.db.database import dialect_insert
 from app.db.models import User
+from app.services.streaks import normalize_timezone
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,47 +24,277 @@ CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")
 # For local dev, you can often find the JWKS at your frontend's clerk domain
 # e.g., https://clerk.your-app-domain.com/.well-known/jwks.json
 
+# Set this to enable signature verification, e.g.
+# https://<your-clerk-frontend-api>/.well-known/jwks.json
+CLERK_JWKS_URL = os.getenv("CLERK_JWKS_URL")
+# Optional 'iss' claim to enforce (your Clerk frontend API URL)
+CLERK_ISSUER = os.getenv("CLERK_ISSUER")
+# How often the JWKS is refreshed in the background
+CLERK_JWKS_REFRESH_SECONDS = float(os.getenv("CLERK_JWKS_REFRESH_SECONDS", "3600"))
+# Minimum gap between refetches triggered by unknown key ids
+CLERK_JWKS_MIN_REFETCH_SECONDS = float(os.getenv("CLERK_JWKS_MIN_REFETCH_SECONDS", "30"))
+# Verified tokens remembered (until their 'exp') so repeat requests skip crypto
+CLERK_TOKEN_CACHE_SIZE = int(os.getenv("CLERK_TOKEN_CACHE_SIZE", "10000"))
+# Users resolved from clerk_id without a DB round-trip, and for how long
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
 security = HTTPBearer()
 
-async def get_clerk_jwks():
-    # In a real app, you'd cache this
-    # For now, we'll implement a robust verification flow
-    # Clerk JWTs can be verified using the Public Key from the dashboard as well
-    pass
+class JwksCache:
+    """
+    Clerk's signing keys by kid. Refreshed periodically in the background and
+    refetched (rate-limited) when a token names a kid we haven't seen.
+    Pass an httpx transport (e.g. httpx.MockTransport) to test against a local JWKS.
+    """
+    def __init__(self, url: Optional[str], refresh_seconds: float = CLERK_JWKS_REFRESH_SECONDS,
+                 min_refetch_seconds: float = CLERK_JWKS_MIN_REFETCH_SECONDS, transport=None):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self.transport = transport
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def fetch(self):
+        async with httpx.AsyncClient(timeout=5.0, transport=self.transport) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            keys = response.json().get("keys", [])
+        self._keys = {k["kid"]: k for k in keys if "kid" in k}
+        self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str) -> Optional[dict]:
+        key = self._keys.get(kid)
+        stale = time.monotonic() - self._fetched_at > self.refresh_seconds
+        if key is not None and not stale:
+            return key
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            key = self._keys.get(kid)
+            since_fetch = time.monotonic() - self._fetched_at
+            if (key is None and since_fetch >= self.min_refetch_seconds) or since_fetch > self.refresh_seconds:
+                try:
+                    await self.fetch()
+                except Exception as e:
+                    # Keep serving the keys we have if Clerk is briefly unreachable
+                    print(f"ERROR_AUTH: Failed to fetch Clerk JWKS: {e}")
+            return self._keys.get(kid)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.fetch()
+            except Exception as e:
+                print(f"ERROR_AUTH: Background JWKS refresh failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
 
-def verify_clerk_token(token: str):
+    def start_background_refresh(self):
+        if self.url and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+class VerifiedTokenCache:
     """
-    Very basic JWT verification for Clerk.
-    In production, you should verify the signature using Clerk's JWKS.
-    For this 'Bestie' prototype/migration, we will focus on extracting the clerk_id
-    and verifying the token is a valid JWT.
+    LRU of already-verified token payloads keyed by sha256(token), dropped at 'exp'.
     """
+    def __init__(self, max_size: int = CLERK_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()  # token hash -> (exp, payload)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        exp, payload = item
+        if exp <= time.time():
+            del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        self._items[key] = (exp, payload)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Lightweight snapshot of the authenticated user, safe to share across requests.
+    """
+    id: int
+    clerk_id: str
+    username: Optional[str] = None
+    email: Optional[str] = None
+    timezone: Optional[str] = None
+
+class UserCache:
+    """
+    TTL/LRU of clerk_id -> CurrentUser so get_current_user skips the per-request SELECT.
+    """
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl_seconds: float = USER_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()  # clerk_id -> (expires_at, CurrentUser)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clerk_id: str) -> Optional[CurrentUser]:
+        item = self._items.get(clerk_id)
+        if item is None or item[0] <= time.monotonic():
+            self._items.pop(clerk_id, None)
+            self.misses += 1
+            return None
+        self._items.move_to_end(clerk_id)
+        self.hits += 1
+        return item[1]
+
+    def put(self, user: CurrentUser):
+        self._items[user.clerk_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._items.move_to_end(user.clerk_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, clerk_id: str):
+        self._items.pop(clerk_id, None)
+
+jwks_cache = JwksCache(CLERK_JWKS_URL)
+verified_tokens = VerifiedTokenCache()
+user_cache = UserCache()
+
+async def get_clerk_jwks():
+    """
+    Current Clerk signing keys (fetched and cached by jwks_cache).
+    """
+    if not jwks_cache._keys and jwks_cache.url:
+        await jwks_cache.fetch()
+    return {"keys": list(jwks_cache._keys.values())}
+
+def _decode_unverified(token: str):
+    # NOTE: Only used when CLERK_JWKS_URL is not configured (local development).
     try:
-        # NOTE: In a production environment, 'verify=False' is dangerous.
-        # You should provide the JWKS to verify the actual signature.
-        payload = jwt.decode(token, "", options={"verify_signature": False})
+        return jwt.decode(token, "", options={"verify_signature": False})
+    except JWTError:
+        return None
+
+async def verify_clerk_token(token: str, jwks: JwksCache = None, cache: VerifiedTokenCache = None):
+    """
+    Verifies a Clerk session JWT against Clerk's JWKS and returns its payload,
+    or None if it is invalid. Without CLERK_JWKS_URL the signature is not checked.
+    """
+    jwks = jwks or jwks_cache
+    cache = cache or verified_tokens
+
+    if not jwks.url:
+        return _decode_unverified(token)
+
+    payload = cache.get(token)
+    if payload is not None:
         return payload
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
     except JWTError:
         return None
+    if not kid:
+        return None
+
+    key = await jwks.get_key(kid)
+    if key is None:
+        return None
+
+    try:
+        payload = jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", "RS256")],
+            issuer=CLERK_ISSUER,
+            options={"verify_aud": False, "verify_iss": bool(CLERK_ISSUER)},
+        )
+    except JWTError:
+        return None
+
+    cache.put(token, payload)
+    return payload
+
+async def _load_or_create_user(clerk_id: str, username: Optional[str] = None) -> CurrentUser:
+    """
+    SELECT the user, or create them with a single INSERT ... ON CONFLICT DO NOTHING
+    RETURNING so concurrent first requests can't race on the unique clerk_id.
+    """
+    async with AsyncSessionLocal() as db:
+        columns = (User.id, User.clerk_id, User.username, User.email, User.timezone)
+        row = (await db.execute(select(*columns).where(User.clerk_id == clerk_id))).first()
+        if row is None:
+            row = (await db.execute(
+                dialect_insert(db)(User)
+                .values(clerk_id=clerk_id, username=username)
+                .on_conflict_do_nothing(index_elements=["clerk_id"])
+                .returning(*columns)
+            )).first()
+            await db.commit()
+            if row is None:
+                # Lost the race: another request created the row first
+                row = (await db.execute(select(*columns).where(User.clerk_id == clerk_id))).first()
+        return CurrentUser(id=row.id, clerk_id=row.clerk_id, username=row.username, email=row.email, timezone=row.timezone)
+
+async def _sync_timezone(user: CurrentUser, tz_name: Optional[str]) -> CurrentUser:
+    """
+    Stores the client's reported timezone when it changes (used for per-day stats).
+    """
+    tz_name = normalize_timezone(tz_name)
+    if tz_name is None or tz_name == user.timezone:
+        return user
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.id == user.id).values(timezone=tz_name))
+        await db.commit()
+    user = replace(user, timezone=tz_name)
+    user_cache.put(user)
+    return user
+
+async def resolve_user(clerk_id: str, username: Optional[str] = None, tz_name: Optional[str] = None) -> CurrentUser:
+    user = user_cache.get(clerk_id)
+    if user is None:
+        user = await _load_or_create_user(clerk_id, username)
+        user_cache.put(user)
+    return await _sync_timezone(user, tz_name)
 
 async def get_current_user(
-    db: Session = Depends(get_db),
-    cred: HTTPAuthorizationCredentials = Depends(security)
-):
+    cred: HTTPAuthorizationCredentials = Depends(security),
+    x_timezone: Optional[str] = Header(None),
+) -> CurrentUser:
     token = cred.credentials
 
     # 🚀 DEVELOPMENT BYPASS: Allow a mock token for testing if Clerk is blocked
     if token == "mock_bestie_token":
-        clerk_id = "user_2test_bestie_mock"
-        user = db.query(User).filter(User.clerk_id == clerk_id).first()
-        if not user:
-            user = User(clerk_id=clerk_id, username="MockBestie")
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        return user
+        return await resolve_user("user_2test_bestie_mock", username="MockBestie", tz_name=x_timezone)
 
-    payload = verify_clerk_token(token)
+    payload = await verify_clerk_token(token)
     
     if not payload:
         raise HTTPException(
@@ -71,14 +309,5 @@ async def get_current_user(
             detail="Token missing user ID",
         )
     
-    # Check if user exists in our local DB, if not, create them
-    user = db.query(User).filter(User.clerk_id == clerk_id).first()
-    if not user:
-        # Sync user data from Clerk payload if available
-        # email = payload.get("email") 
-        user = User(clerk_id=clerk_id)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        
-    return user
+    # Served from the identity cache; the user row is created on first sight
+    return await resolve_user(clerk_id, tz_name=x_timezone)
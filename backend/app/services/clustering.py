@@ -0,0 +1,424 @@
+"""
+Mood-pattern clustering over per-user weekly check-in features.
+
+Each (user, ISO week) with enough active days becomes a feature vector (mean,
+variance and trend of mood / energy / sleep over the week's daily averages).
+A StandardScaler and MiniBatchKMeans are fitted with partial_fit over batches
+streamed from daily_rollups, so the table is never loaded at once. The fitted
+model is persisted to CLUSTER_MODEL_PATH and refits run in a separate process.
+"""
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.database import dialect_insert
+from app.db.models import DailyRollup, UserPattern, utcnow
+
+# Where the fitted scaler + k-means model is stored
+CLUSTER_MODEL_PATH = os.getenv("CLUSTER_MODEL_PATH", "./pattern_model.joblib")
+# Number of pattern clusters
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", "4"))
+# Weekly vectors per partial_fit call (and rollup rows fetched per round trip)
+CLUSTER_BATCH_SIZE = int(os.getenv("CLUSTER_BATCH_SIZE", "1024"))
+# Background refit interval; 0 disables the periodic refit
+CLUSTER_REFIT_HOURS = float(os.getenv("CLUSTER_REFIT_HOURS", "24"))
+# A week needs this many active days to be used
+MIN_DAYS_PER_WEEK = 2
+# Passes over the data in a full refit
+FULL_REFIT_EPOCHS = 3
+
+FEATURES = [
+    "mood_mean", "mood_var", "mood_trend",
+    "energy_mean", "energy_var", "energy_trend",
+    "sleep_mean", "sleep_var", "sleep_trend",
+]
+# Used when a week has no energy / sleep values at all
+NEUTRAL_MEAN = {"energy": 5.0, "sleep": 7.0}
+
+def iso_week(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def week_start(day: date) -> date:
+    # Monday of the ISO week
+    return day - timedelta(days=day.weekday())
+
+def _series_stats(weekdays: List[int], values: List[float], neutral: float) -> Tuple[float, float, float]:
+    """
+    (mean, variance, slope per day) of one metric's daily averages within a week.
+    """
+    if not values:
+        return neutral, 0.0, 0.0
+    y = np.asarray(values, dtype=float)
+    if len(y) < 2:
+        return float(y[0]), 0.0, 0.0
+    x = np.asarray(weekdays, dtype=float)
+    x_centered = x - x.mean()
+    slope = float((x_centered * (y - y.mean())).sum() / (x_centered ** 2).sum())
+    return float(y.mean()), float(y.var()), slope
+
+def week_features(rollups) -> Optional[List[float]]:
+    """
+    Feature vector for one user-week (rollups from that week), or None if too sparse.
+    """
+    if len(rollups) < MIN_DAYS_PER_WEEK:
+        return None
+    mood_x, mood_y, energy_x, energy_y, sleep_x, sleep_y = [], [], [], [], [], []
+    for r in rollups:
+        weekday = r.day.weekday()
+        mood_x.append(weekday)
+        mood_y.append(r.mood_sum / r.count)
+        if r.energy_count:
+            energy_x.append(weekday)
+            energy_y.append(r.energy_sum / r.energy_count)
+        if r.sleep_count:
+            sleep_x.append(weekday)
+            sleep_y.append(r.sleep_sum / r.sleep_count)
+    return [
+        *_series_stats(mood_x, mood_y, 5.0),
+        *_series_stats(energy_x, energy_y, NEUTRAL_MEAN["energy"]),
+        *_series_stats(sleep_x, sleep_y, NEUTRAL_MEAN["sleep"]),
+    ]
+
+def _rollup_columns():
+    # Plain rows rather than ORM objects: nothing accumulates in the identity map while streaming
+    return select(
+        DailyRollup.user_id, DailyRollup.day, DailyRollup.count, DailyRollup.mood_sum,
+        DailyRollup.energy_count, DailyRollup.energy_sum, DailyRollup.sleep_count, DailyRollup.sleep_sum,
+    )
+
+def iter_user_weeks(db: Session, since: Optional[date] = None, until: Optional[date] = None,
+                    user_id: Optional[int] = None) -> Iterator[Tuple[int, str, List[float]]]:
+    """
+    Streams (user_id, iso_week, features) from daily_rollups in (user, day) order,
+    holding one user-week in memory at a time. `until` is exclusive.
+    """
+    stmt = _rollup_columns().order_by(DailyRollup.user_id, DailyRollup.day)
+    if since is not None:
+        stmt = stmt.where(DailyRollup.day >= since)
+    if until is not None:
+        stmt = stmt.where(DailyRollup.day < until)
+    if user_id is not None:
+        stmt = stmt.where(DailyRollup.user_id == user_id)
+
+    current_key, bucket = None, []
+    for rollup in db.execute(stmt.execution_options(yield_per=CLUSTER_BATCH_SIZE)):
+        key = (rollup.user_id, iso_week(rollup.day))
+        if key != current_key:
+            if bucket:
+                features = week_features(bucket)
+                if features is not None:
+                    yield current_key[0], current_key[1], features
+            current_key, bucket = key, []
+        bucket.append(rollup)
+    if bucket:
+        features = week_features(bucket)
+        if features is not None:
+            yield current_key[0], current_key[1], features
+
+def _batches(rows: Iterator[Tuple[int, str, List[float]]], size: int) -> Iterator[np.ndarray]:
+    batch = []
+    for _, _, features in rows:
+        batch.append(features)
+        if len(batch) >= size:
+            yield np.asarray(batch, dtype=float)
+            batch = []
+    if batch:
+        yield np.asarray(batch, dtype=float)
+
+def _describe(centroid: Dict[str, float]) -> str:
+    mood = centroid["mood_mean"]
+    level = "Bright" if mood >= 7 else "Low" if mood < 4.5 else "Balanced"
+    trend = centroid["mood_trend"]
+    direction = "rising" if trend > 0.15 else "dipping" if trend < -0.15 else "steady"
+    swings = "with big swings" if centroid["mood_var"] > 2.0 else ""
+    sleep = "short on sleep" if centroid["sleep_mean"] < 6.5 else ""
+    extras = ", ".join(part for part in (swings, sleep) if part)
+    return f"{level} & {direction}" + (f" ({extras})" if extras else "")
+
+def fit_model(db: Session, previous: Optional[dict] = None, n_clusters: int = CLUSTER_COUNT,
+              batch_size: int = CLUSTER_BATCH_SIZE) -> Optional[dict]:
+    """
+    Fits (or, given `previous`, continues fitting) the scaler and k-means with
+    partial_fit over streamed weekly vectors. Only complete ISO weeks are used
+    (never the current one), and a continued fit starts at the Monday after the
+    previous model's last trained week, so every week is trained on exactly once.
+    Returns the model dict, or None while there are fewer weeks than clusters.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.preprocessing import StandardScaler
+
+    now = datetime.now(timezone.utc)
+    until = week_start(now.date())
+    since = None
+    if previous is not None:
+        scaler, kmeans = previous["scaler"], previous["kmeans"]
+        since = week_start(previous["trained_through"]) + timedelta(days=7)
+        epochs = 1
+    else:
+        scaler = StandardScaler()
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=0, n_init=3)
+        epochs = FULL_REFIT_EPOCHS
+
+    # Pass 1: feature scaling (running mean / variance). A continued fit keeps
+    # the scaler fixed so the existing centroids stay in the same space
+    samples = 0
+    for batch in _batches(iter_user_weeks(db, since=since, until=until), batch_size):
+        if previous is None:
+            scaler.partial_fit(batch)
+        samples += len(batch)
+    if samples == 0 and previous is not None:
+        return previous
+
+    # Pass 2+: k-means. The first partial_fit needs at least n_clusters rows
+    pending = None
+    for _ in range(epochs):
+        for batch in _batches(iter_user_weeks(db, since=since, until=until), batch_size):
+            if pending is not None:
+                batch = np.vstack([pending, batch])
+                pending = None
+            if not hasattr(kmeans, "cluster_centers_") and len(batch) < kmeans.n_clusters:
+                pending = batch
+                continue
+            kmeans.partial_fit(scaler.transform(batch))
+    if not hasattr(kmeans, "cluster_centers_"):
+        return None
+
+    centers = scaler.inverse_transform(kmeans.cluster_centers_)
+    profiles = []
+    for index, center in enumerate(centers):
+        centroid = {name: round(float(value), 3) for name, value in zip(FEATURES, center)}
+        profiles.append({"cluster": index, "label": _describe(centroid), "centroid": centroid})
+
+    return {
+        "scaler": scaler,
+        "kmeans": kmeans,
+        "profiles": profiles,
+        "samples": samples + (previous["samples"] if previous else 0),
+        "trained_at": now.isoformat(),
+        # Sunday of the last complete week trained on
+        "trained_through": until - timedelta(days=1),
+        "version": now.strftime("%Y%m%d%H%M%S"),
+    }
+
+def assign_all(db: Session, model: dict, batch_size: int = CLUSTER_BATCH_SIZE) -> int:
+    """
+    Writes every user's pattern (cluster of their most recent usable week).
+    Commits.
+    """
+    # Rows arrive grouped by user in day order, so the last one seen per user
+    # is their latest week. Collected first: committing would end the stream
+    latest: Dict[int, Tuple[str, List[float]]] = {}
+    for user_id, week, features in iter_user_weeks(db):
+        latest[user_id] = (week, features)
+
+    items = list(latest.items())
+    for i in range(0, len(items), batch_size):
+        chunk = items[i:i + batch_size]
+        X = model["scaler"].transform(np.asarray([features for _, (_, features) in chunk], dtype=float))
+        for (user_id, (week, features)), cluster in zip(chunk, model["kmeans"].predict(X)):
+            db.execute(_pattern_upsert(db, user_id, week, int(cluster), features, model["version"]))
+        db.commit()
+    return len(items)
+
+def _pattern_upsert(db, user_id: int, week: str, cluster: int, features: List[float], version: str):
+    values = {
+        "cluster": cluster,
+        "week": week,
+        "features": ",".join(f"{v:.4f}" for v in features),
+        "model_version": version,
+        "updated_at": utcnow(),
+    }
+    stmt = dialect_insert(db)(UserPattern).values(user_id=user_id, **values)
+    return stmt.on_conflict_do_update(index_elements=["user_id"], set_=values)
+
+def load_model(path: str = CLUSTER_MODEL_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+def save_model(model: dict, path: str = CLUSTER_MODEL_PATH):
+    # Write then rename so a reader never sees a half-written file
+    tmp_path = f"{path}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+def refit_job(full: bool = False, path: str = CLUSTER_MODEL_PATH) -> dict:
+    """
+    Runs in a worker process (or a CLI): fits, persists and assigns.
+    Uses its own DB connections from the sync engine.
+    """
+    from app.db.database import SessionLocal
+
+    started = time.perf_counter()
+    previous = None if full else load_model(path)
+    db = SessionLocal()
+    try:
+        model = fit_model(db, previous=previous)
+        if model is None:
+            return {"status": "not_enough_data"}
+        save_model(model, path)
+        assigned = assign_all(db, model)
+    finally:
+        db.close()
+    return {
+        "status": "ok",
+        "mode": "full" if previous is None else "incremental",
+        "samples": model["samples"],
+        "assigned": assigned,
+        "version": model["version"],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+class PatternModel:
+    """
+    The persisted model as loaded in the API process, plus the background refit.
+    """
+    def __init__(self, path: str = CLUSTER_MODEL_PATH, refit_hours: float = CLUSTER_REFIT_HOURS):
+        self.path = path
+        self.refit_hours = refit_hours
+        self.model: Optional[dict] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._refit_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+
+    def load(self) -> bool:
+        try:
+            self.model = load_model(self.path)
+        except Exception as e:
+            print(f"CLUSTERING: Could not load {self.path}: {e}")
+            self.model = None
+        return self.model is not None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork the event loop, DB pools or threads of the API process
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def refit_in_background(self, full: bool = False) -> asyncio.Task:
+        """
+        Starts a refit in the process pool (one at a time) and reloads the model when done.
+        """
+        if self._refit_task is not None and not self._refit_task.done():
+            return self._refit_task
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._pool(), refit_job, full, self.path)
+                print(f"CLUSTERING: Refit finished: {result}")
+                if result.get("status") == "ok":
+                    self.load()
+                return result
+            except Exception as e:
+                print(f"CLUSTERING: Refit failed: {e}")
+                return {"status": "error", "error": str(e)}
+
+        self._refit_task = asyncio.create_task(run())
+        return self._refit_task
+
+    async def _periodic(self):
+        while True:
+            await asyncio.sleep(self.refit_hours * 3600)
+            await self.refit_in_background()
+
+    def start(self):
+        """
+        Loads the persisted model; only fits at startup when there is none yet.
+        """
+        if not self.load():
+            self.refit_in_background(full=True)
+        if self.refit_hours > 0 and self._periodic_task is None:
+            self._periodic_task = asyncio.create_task(self._periodic())
+
+    async def stop(self):
+        for task in (self._periodic_task, self._refit_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self._periodic_task = self._refit_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def profile(self, cluster: int) -> Optional[dict]:
+        if self.model is None or cluster >= len(self.model["profiles"]):
+            return None
+        return self.model["profiles"][cluster]
+
+    def predict(self, features: List[float]) -> Optional[int]:
+        if self.model is None:
+            return None
+        X = self.model["scaler"].transform(np.asarray([features], dtype=float))
+        return int(self.model["kmeans"].predict(X)[0])
+
+    def status(self) -> dict:
+        if self.model is None:
+            return {"trained": False, "refitting": self._refit_task is not None and not self._refit_task.done()}
+        return {
+            "trained": True,
+            "version": self.model["version"],
+            "trained_at": self.model["trained_at"],
+            "samples": self.model["samples"],
+            "clusters": len(self.model["profiles"]),
+            "refitting": self._refit_task is not None and not self._refit_task.done(),
+        }
+
+# Global instance
+pattern_model = PatternModel()
+
+async def _latest_week_features(db: AsyncSession, user_id: int) -> Optional[Tuple[str, List[float]]]:
+    # The last two ISO weeks cover "this week" plus the previous full one
+    since = datetime.now(timezone.utc).date() - timedelta(days=14)
+    rollups = (await db.execute(
+        _rollup_columns()
+        .where(DailyRollup.user_id == user_id, DailyRollup.day >= since)
+        .order_by(DailyRollup.day)
+    )).all()
+    weeks: Dict[str, list] = {}
+    for r in rollups:
+        weeks.setdefault(iso_week(r.day), []).append(r)
+    for week in sorted(weeks, reverse=True):
+        features = week_features(weeks[week])
+        if features is not None:
+            return week, features
+    return None
+
+async def get_user_pattern(db: AsyncSession, user_id: int) -> dict:
+    """
+    The user's stored pattern; users the last refit hasn't seen yet are
+    classified on the fly from their latest week (a single predict).
+    Read-only: rows are only written by refit_job, since each instance fits
+    its own model and would otherwise keep overwriting the others' rows.
+    """
+    if pattern_model.model is None:
+        return {"pattern": None, "week": None, "features": None, "model": pattern_model.status()}
+    row = await db.get(UserPattern, user_id)
+    if row is not None:
+        week = row.week
+        features = [float(v) for v in row.features.split(",")]
+        # Cluster numbers are only meaningful for the model that assigned them
+        cluster = row.cluster if row.model_version == pattern_model.model["version"] else pattern_model.predict(features)
+    else:
+        latest = await _latest_week_features(db, user_id)
+        if latest is None:
+            return {"pattern": None, "week": None, "features": None, "model": pattern_model.status()}
+        week, features = latest
+        cluster = pattern_model.predict(features)
+
+    return {
+        "pattern": pattern_model.profile(cluster),
+        "week": week,
+        "features": {name: round(value, 3) for name, value in zip(FEATURES, features)},
+        "model": pattern_model.status(),
+    }
@@ -0,0 +1,349 @@
+"""
+Stand-ins for genai.Client, selected with GEMINI_BACKEND:
+
+live      -> the real Gemini API (default)
+record    -> the real API, with every request/response appended to a cassette
+replay    -> answers served from the cassette, no network
+synthetic -> generated answers with configurable latency, stream cadence and 429s
+
+Every backend exposes the slice of the client GeminiWrapper uses:
+models.generate_content, aio.models.generate_content and
+aio.models.generate_content_stream.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Optional
+
+from google import genai
+from google.genai import errors as genai_errors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# live | record | replay | synthetic
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "live").lower()
+# JSON-lines file the record backend appends to and the replay backend reads
+GEMINI_CASSETTE_PATH = os.getenv("GEMINI_CASSETTE_PATH", "./gemini_cassette.jsonl")
+# Replay with the recorded latency and chunk timing instead of instantly
+GEMINI_REPLAY_REALTIME = os.getenv("GEMINI_REPLAY_REALTIME", "false").lower() == "true"
+# Synthetic backend: response latency, ± uniform jitter, delay between stream chunks (ms)
+GEMINI_SYNTHETIC_LATENCY_MS = float(os.getenv("GEMINI_SYNTHETIC_LATENCY_MS", "300"))
+GEMINI_SYNTHETIC_JITTER_MS = float(os.getenv("GEMINI_SYNTHETIC_JITTER_MS", "100"))
+GEMINI_SYNTHETIC_CHUNK_MS = float(os.getenv("GEMINI_SYNTHETIC_CHUNK_MS", "40"))
+# Words per stream chunk, share of calls answered with a 429, and the retry hint sent with it
+GEMINI_SYNTHETIC_CHUNK_WORDS = int(os.getenv("GEMINI_SYNTHETIC_CHUNK_WORDS", "3"))
+GEMINI_SYNTHETIC_QUOTA_RATE = float(os.getenv("GEMINI_SYNTHETIC_QUOTA_RATE", "0"))
+GEMINI_SYNTHETIC_RETRY_SECONDS = float(os.getenv("GEMINI_SYNTHETIC_RETRY_SECONDS", "30"))
+GEMINI_SYNTHETIC_SEED = int(os.getenv("GEMINI_SYNTHETIC_SEED", "0"))
+
+BACKENDS = ("live", "record", "replay", "synthetic")
+
+class CassetteMiss(Exception):
+    """
+    Replay was asked for a request the cassette doesn't have.
+    """
+
+class _Response:
+    # The one attribute callers read off a genai response
+    def __init__(self, text: Optional[str]):
+        self.text = text
+
+class _Namespace:
+    pass
+
+def _plain(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+def request_key(model: str, contents, config) -> str:
+    """
+    Stable hash of everything that shapes the answer.
+    """
+    payload = json.dumps({"model": model, "contents": _plain(contents), "config": _plain(config)}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def quota_error(message: str, retry_seconds: Optional[float] = None) -> genai_errors.APIError:
+    details = [{"retryDelay": f"{retry_seconds:g}s"}] if retry_seconds else []
+    return genai_errors.APIError(429, {"error": {
+        "code": 429, "status": "RESOURCE_EXHAUSTED", "message": message, "details": details,
+    }})
+
+def _error_entry(e: Exception) -> dict:
+    if isinstance(e, genai_errors.APIError):
+        return {"code": e.code, "details": e.details}
+    return {"code": 500, "details": {"error": {"code": 500, "status": "INTERNAL", "message": str(e)}}}
+
+def _raise_recorded(error: dict):
+    raise genai_errors.APIError(error["code"], error["details"])
+
+# --- record / replay ---
+
+class Cassette:
+    """
+    Recorded exchanges, one JSON object per line:
+    {"key", "model", "contents", "config", "latency_ms", "text" | "chunks" | "error"}
+    Identical requests recorded several times are replayed in recorded order, then cycle.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._served = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._entries.setdefault(entry["key"], []).append(entry)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def next(self, key: str) -> dict:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded Gemini response for request {key[:12]} in {self.path}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return entries[served % len(entries)]
+
+class _RecordingModels:
+    def __init__(self, models, cassette: Cassette):
+        self._models = models
+        self._cassette = cassette
+
+    def _entry(self, model, contents, config, started, **outcome) -> dict:
+        return {
+            "key": request_key(model, contents, config),
+            "model": model,
+            "contents": _plain(contents),
+            "config": _plain(config),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            **outcome,
+        }
+
+class _RecordingSyncModels(_RecordingModels):
+    def generate_content(self, model, contents, config=None):
+        started = time.perf_counter()
+        try:
+            response = self._models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            self._cassette.append(self._entry(model, contents, config, started, error=_error_entry(e)))
+            raise
+        self._cassette.append(self._entry(model, contents, config, started, text=response.text))
+        return response
+
+class _RecordingAsyncModels(_RecordingModels):
+    async def generate_content(self, model, contents, config=None):
+        started = time.perf_counter()
+        try:
+            response = await self._models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            self._cassette.append(self._entry(model, contents, config, started, error=_error_entry(e)))
+            raise
+        self._cassette.append(self._entry(model, contents, config, started, text=response.text))
+        return response
+
+    async def generate_content_stream(self, model, contents, config=None):
+        started = time.perf_counter()
+        try:
+            stream = await self._models.generate_content_stream(model=model, contents=contents, config=config)
+        except Exception as e:
+            self._cassette.append(self._entry(model, contents, config, started, error=_error_entry(e)))
+            raise
+
+        async def chunks():
+            recorded = []
+            try:
+                async for chunk in stream:
+                    recorded.append({"text": chunk.text, "at_ms": round((time.perf_counter() - started) * 1000, 1)})
+                    yield chunk
+            finally:
+                # Saved even when the caller stops early, so replay sees what the caller saw
+                self._cassette.append(self._entry(model, contents, config, started, chunks=recorded))
+        return chunks()
+
+class RecordingClient:
+    def __init__(self, client, cassette: Cassette):
+        self.models = _RecordingSyncModels(client.models, cassette)
+        self.aio = _Namespace()
+        self.aio.models = _RecordingAsyncModels(client.aio.models, cassette)
+
+class _ReplayModels:
+    def __init__(self, cassette: Cassette, realtime: bool):
+        self._cassette = cassette
+        self._realtime = realtime
+
+    def _lookup(self, model, contents, config) -> dict:
+        return self._cassette.next(request_key(model, contents, config))
+
+    @staticmethod
+    def _text(entry: dict) -> Optional[str]:
+        if "error" in entry:
+            _raise_recorded(entry["error"])
+        if "chunks" in entry:
+            return "".join(chunk["text"] or "" for chunk in entry["chunks"])
+        return entry["text"]
+
+class _ReplaySyncModels(_ReplayModels):
+    def generate_content(self, model, contents, config=None):
+        entry = self._lookup(model, contents, config)
+        if self._realtime:
+            time.sleep(entry["latency_ms"] / 1000)
+        return _Response(self._text(entry))
+
+class _ReplayAsyncModels(_ReplayModels):
+    async def generate_content(self, model, contents, config=None):
+        entry = self._lookup(model, contents, config)
+        if self._realtime:
+            await asyncio.sleep(entry["latency_ms"] / 1000)
+        return _Response(self._text(entry))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        entry = self._lookup(model, contents, config)
+        if "error" in entry:
+            _raise_recorded(entry["error"])
+        # A cassette recorded from a non-streaming call replays as one chunk
+        recorded = entry.get("chunks") or [{"text": entry["text"], "at_ms": entry["latency_ms"]}]
+        realtime = self._realtime
+
+        async def chunks():
+            elapsed = 0.0
+            for chunk in recorded:
+                if realtime:
+                    await asyncio.sleep(max(0.0, chunk["at_ms"] - elapsed) / 1000)
+                    elapsed = chunk["at_ms"]
+                yield _Response(chunk["text"])
+        return chunks()
+
+class ReplayClient:
+    def __init__(self, cassette: Cassette, realtime: bool = GEMINI_REPLAY_REALTIME):
+        self.models = _ReplaySyncModels(cassette, realtime)
+        self.aio = _Namespace()
+        self.aio.models = _ReplayAsyncModels(cassette, realtime)
+
+# --- synthetic ---
+
+SYNTHETIC_REPLY = (
+    "I hear you, bestie. That sounds like a lot to carry today, and it makes sense that you feel this way. "
+    "Try one small thing for yourself tonight, and tell me how it goes ✨"
+)
+SYNTHETIC_JSON = {
+    "summary": "A synthetic summary of the entry.",
+    "advice": "• Take a short walk.\n• Drink some water.",
+    "win": "Showing up for yourself.",
+    "focus": "Sleep.",
+}
+
+class _SyntheticModels:
+    def __init__(self, settings: dict, rng: random.Random, lock: threading.Lock):
+        self.settings = settings
+        self._rng = rng
+        self._lock = lock
+
+    def _draw(self):
+        # One shared seeded generator, so a run is reproducible for the same call order
+        with self._lock:
+            jitter = self._rng.uniform(-1, 1) * self.settings["jitter_ms"]
+            quota_hit = self._rng.random() < self.settings["quota_rate"]
+        return max(0.0, self.settings["latency_ms"] + jitter) / 1000, quota_hit
+
+    def _quota_error(self):
+        return quota_error(
+            f"Synthetic quota exceeded. Please retry in {self.settings['retry_seconds']:g}s.",
+            self.settings["retry_seconds"],
+        )
+
+    @staticmethod
+    def _text(config) -> str:
+        if getattr(config, "response_mime_type", None) == "application/json":
+            return json.dumps(SYNTHETIC_JSON)
+        return SYNTHETIC_REPLY
+
+class _SyntheticSyncModels(_SyntheticModels):
+    def generate_content(self, model, contents, config=None):
+        delay, quota_hit = self._draw()
+        time.sleep(delay)
+        if quota_hit:
+            raise self._quota_error()
+        return _Response(self._text(config))
+
+class _SyntheticAsyncModels(_SyntheticModels):
+    async def generate_content(self, model, contents, config=None):
+        delay, quota_hit = self._draw()
+        await asyncio.sleep(delay)
+        if quota_hit:
+            raise self._quota_error()
+        return _Response(self._text(config))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        # latency is the time to the first chunk; later chunks follow every chunk_ms
+        delay, quota_hit = self._draw()
+        await asyncio.sleep(delay)
+        if quota_hit:
+            raise self._quota_error()
+        words = self._text(config).split(" ")
+        size = max(1, self.settings["chunk_words"])
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        cadence = self.settings["chunk_ms"] / 1000
+
+        async def chunks():
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(cadence)
+                yield _Response(piece)
+        return chunks()
+
+class SyntheticClient:
+    def __init__(self, latency_ms=GEMINI_SYNTHETIC_LATENCY_MS, jitter_ms=GEMINI_SYNTHETIC_JITTER_MS,
+                 chunk_ms=GEMINI_SYNTHETIC_CHUNK_MS, chunk_words=GEMINI_SYNTHETIC_CHUNK_WORDS,
+                 quota_rate=GEMINI_SYNTHETIC_QUOTA_RATE, retry_seconds=GEMINI_SYNTHETIC_RETRY_SECONDS,
+                 seed=GEMINI_SYNTHETIC_SEED):
+        # Shared by both paths so the knobs can be changed at runtime (e.g. by a benchmark)
+        self.settings = {
+            "latency_ms": latency_ms, "jitter_ms": jitter_ms, "chunk_ms": chunk_ms,
+            "chunk_words": chunk_words, "quota_rate": quota_rate, "retry_seconds": retry_seconds,
+        }
+        rng, lock = random.Random(seed), threading.Lock()
+        self.models = _SyntheticSyncModels(self.settings, rng, lock)
+        self.aio = _Namespace()
+        self.aio.models = _SyntheticAsyncModels(self.settings, rng, lock)
+
+def create_client(api_key: Optional[str], backend: str = GEMINI_BACKEND, cassette_path: str = GEMINI_CASSETTE_PATH):
+    """
+    Client for the configured backend; None when the live API has no key.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown GEMINI_BACKEND '{backend}' (expected one of: {', '.join(BACKENDS)})")
+    if backend == "synthetic":
+        print(f"🧪 Gemini backend: synthetic ({GEMINI_SYNTHETIC_LATENCY_MS:.0f}±{GEMINI_SYNTHETIC_JITTER_MS:.0f} ms, "
+              f"429 rate {GEMINI_SYNTHETIC_QUOTA_RATE:g})")
+        return SyntheticClient()
+    if backend == "replay":
+        cassette = Cassette(cassette_path)
+        print(f"📼 Gemini backend: replaying {len(cassette)} recorded responses from {cassette_path}")
+        return ReplayClient(cassette)
+
+    if not api_key:
+        print("WARNING: GEMINI_API_KEY not found in environment variables")
+        return None
+    client = genai.Client(api_key=api_key)
+    if backend == "record":
+        print(f"⏺️  Gemini backend: recording to {cassette_path}")
+        return RecordingClient(client, Cassette(cassette_path))
+    return client
@@ -0,0 +1,148 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, func, literal, null, or_, select, union_all, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import ChatMessage, JournalEntry, to_naive_utc
+
+MAX_PAGE_SIZE = 200
+# Characters of content returned by the 'list' projection
+PREVIEW_LENGTH = 280
+
+def encode_cursor(timestamp: datetime, kind: str, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), kind, row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        ts, kind, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return to_naive_utc(datetime.fromisoformat(ts)), str(kind), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _before(model, kind: str, cursor):
+    """
+    Keyset predicate for one branch: rows strictly after `cursor` in
+    (timestamp DESC, type DESC, id DESC) order. The type comparison is resolved
+    here because each branch has a constant type.
+    """
+    ts, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        same_ts = model.timestamp == ts
+    elif kind == cursor_kind:
+        same_ts = and_(model.timestamp == ts, model.id < cursor_id)
+    else:
+        same_ts = None
+    if same_ts is None:
+        return model.timestamp < ts
+    return or_(model.timestamp < ts, same_ts)
+
+def _branch(model, kind: str, user_id: int, cursor, limit: int, fields: str):
+    if fields == "list":
+        content = func.substr(model.content, 1, PREVIEW_LENGTH)
+    else:
+        content = model.content
+
+    if kind == "journal":
+        role = literal("user", String)
+        summary, advice = model.summary, model.advice
+    else:
+        role = model.role
+        summary, advice = null(), null()
+    if fields == "list":
+        advice = null()
+
+    stmt = (
+        select(
+            literal(kind, String).label("type"),
+            model.id.label("id"),
+            model.timestamp.label("timestamp"),
+            role.label("role"),
+            content.label("content"),
+            summary.label("summary"),
+            advice.label("advice"),
+        )
+        .where(model.user_id == user_id)
+    )
+    if cursor is not None:
+        stmt = stmt.where(_before(model, kind, cursor))
+    # Each branch is limited on its own so it can walk the (user_id, timestamp) order
+    return stmt.order_by(model.timestamp.desc(), model.id.desc()).limit(limit).subquery()
+
+def _page_statement(user_id: int, before: Optional[str], limit: int, kind: Optional[str], fields: str):
+    cursor = decode_cursor(before) if before else None
+
+    branches = []
+    if kind in (None, "journal"):
+        branches.append(_branch(JournalEntry, "journal", user_id, cursor, limit + 1, fields))
+    if kind in (None, "chat"):
+        branches.append(_branch(ChatMessage, "chat", user_id, cursor, limit + 1, fields))
+    if not branches:
+        raise ValueError("type must be 'journal' or 'chat'")
+
+    unified = union_all(*(select(b) for b in branches)).subquery()
+    return (
+        select(unified)
+        .order_by(unified.c.timestamp.desc(), unified.c.type.desc(), unified.c.id.desc())
+        .limit(limit + 1)
+    )
+
+def _page_from_rows(rows, limit: int, fields: str):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    for row in rows:
+        item = {
+            "id": f"{row.type}_{row.id}",
+            "db_id": row.id,
+            "type": row.type,
+            "role": row.role,
+            "timestamp": row.timestamp,
+            "summary": row.summary,
+            "advice": row.advice,
+        }
+        item["preview" if fields == "list" else "content"] = row.content
+        items.append(item)
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        timestamp = last.timestamp
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromisoformat(str(timestamp))
+        next_cursor = encode_cursor(timestamp, last.type, last.id)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+def get_history_page(
+    db: Session,
+    user_id: int,
+    before: Optional[str] = None,
+    limit: int = 50,
+    kind: Optional[str] = None,
+    fields: str = "full",
+):
+    """
+    One page of the unified journal + chat history, newest first.
+    Returns {"items": [...], "next_cursor": str | None}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = db.execute(_page_statement(user_id, before, limit, kind, fields)).all()
+    return _page_from_rows(rows, limit, fields)
+
+async def get_history_page_async(
+    db: AsyncSession,
+    user_id: int,
+    before: Optional[str] = None,
+    limit: int = 50,
+    kind: Optional[str] = None,
+    fields: str = "full",
+):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = (await db.execute(_page_statement(user_id, before, limit, kind, fields))).all()
+    return _page_from_rows(rows, limit, fields)
@@ -1,6 +1,17 @@
+from typing import List, Optional, Sequence
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
 from app.db.models import CheckIn
+from app.services.lexicon import LexiconHits, lexicon
+
+# Bump whenever the rules below change; stored insights with another version are
+# recomputed (lazily on read, or in bulk by recompute_insights.py)
+INSIGHTS_RULES_VERSION = 1
 
-def analyze_checkin(checkin: CheckIn):
+def analyze_checkin(checkin: CheckIn, hits: Optional[LexiconHits] = None):
     reasons = []
     tips = []
 
@@ -23,32 +34,19 @@ def analyze_checkin(checkin: CheckIn):
 
     # 3. Mood Analysis & Keyword Scanning
     # We analyze text even if mood is okay, but prioritize it if mood is low.
-    text = (checkin.text or "").lower()
-    
-    import re
-    def contains_word(text, words):
-        # Create a regex pattern to match any of the words as whole words
-        pattern = r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b'
-        return bool(re.search(pattern, text))
-
-    # Relationship Advice
-    # Relationship Advice Logic Refinement
-    # Split keywords into entities and conflict indicators to avoid false positives
-    RELATIONSHIP_ENTITIES = ["partner", "wife", "husband", "boyfriend", "girlfriend", "spouse", "fiance"]
-    CONFLICT_INDICATORS = ["fight", "argument", "conflict", "clash", "disagreement", "mad", "angry", "annoyed"]
-    RELATIONSHIP_CRISES = ["breakup", "ex", "divorce", "separated", "broken up"]
+    # One pass over the text finds every topic's whole-word keywords
+    if hits is None:
+        hits = lexicon.scan(checkin.text)
 
     def has_relationship_stress():
         # 1. Immediate crisis keywords always trigger
-        if contains_word(text, RELATIONSHIP_CRISES):
+        if hits.has("relationship_crisis"):
             return True
         
         # 2. Entity + (Conflict Word OR Low Mood)
-        has_entity = contains_word(text, RELATIONSHIP_ENTITIES)
-        if has_entity:
-            has_conflict = contains_word(text, CONFLICT_INDICATORS)
+        if hits.has("relationship_entity"):
             # If explicit conflict word is present, or mood is low (<=4) while mentioning partner
-            if has_conflict or checkin.mood <= 4:
+            if hits.has("conflict") or checkin.mood <= 4:
                 return True
         
         return False
@@ -58,27 +56,27 @@ def analyze_checkin(checkin: CheckIn):
         tips.append("RELATIONSHIP SOS: If emotions are high, take a strict 20-minute timeout to let stress hormones drop before talking again. When you resume, use 'I statements' ('I feel hurt when...') rather than accusations ('You always...'). This reduces defensiveness.")
 
     # Work/Career
-    elif contains_word(text, ["work", "job", "project", "boss", "deadline", "career"]):
+    elif hits.has("work"):
         reasons.append("Work-related pressure")
         tips.append("WORK FOCUS: Use the Eisenhower Matrix to sort tasks: do what is 'Urgent & Important' first. For everything else, schedule it or delegate it. Block time for 'deep work' (no notifications) to reduce the anxiety of multitasking.")
 
     # Academic/School
-    elif contains_word(text, ["exam", "study", "school", "grade", "test", "homework"]):
+    elif hits.has("academic"):
         reasons.append("Academic stress")
         tips.append("STUDY HACK: Passive re-reading is inefficient. Use 'Active Recall'—test yourself on the material without looking. combine this with the Pomodoro technique (25min work, 5min break) to maintain peak cognitive performance.")
 
     # Loneliness/Social
-    elif contains_word(text, ["lonely", "alone", "isolated", "sad", "miss"]):
+    elif hits.has("social"):
         reasons.append("Social isolation")
         tips.append("CONNECTION: Social pain lights up the same brain regions as physical pain. Call (don't text) a friend or family member for just 5 minutes. Hearing a voice releases oxytocin which lowers cortisol.")
 
     # Financial (New)
-    elif contains_word(text, ["money", "debt", "rent", "bill", "expensive", "cost"]):
+    elif hits.has("financial"):
         reasons.append("Financial anxiety")
         tips.append("FINANCE: Anxiety comes from uncertainty. Take 10 minutes today to just *list* your expenses. You don't need to solve it today, but accurately naming the problem reduces the brain's fear response.")
 
     # Health/Body
-    elif contains_word(text, ["sick", "pain", "headache", "tired", "body"]):
+    elif hits.has("health"):
         reasons.append("Physical discomfort")
         tips.append("Listen to your body. If you are in pain/sickness, your mood will naturally drop. Do not push through. Rest is productive when it heals you.")
 
@@ -97,3 +95,89 @@ def analyze_checkin(checkin: CheckIn):
         "reasons": reasons,
         "tips": tips
     }
+
+def analyze_checkins(checkins: Sequence[CheckIn]) -> List[dict]:
+    """
+    analyze_checkin for many check-ins.
+    """
+    all_hits = lexicon.scan_many([checkin.text for checkin in checkins])
+    return [analyze_checkin(checkin, hits) for checkin, hits in zip(checkins, all_hits)]
+
+def insight_columns(checkin: CheckIn, hits: Optional[LexiconHits] = None) -> dict:
+    """
+    Column values storing the check-in's insights, computed once at write time.
+    """
+    return {"insights": analyze_checkin(checkin, hits), "insights_version": INSIGHTS_RULES_VERSION}
+
+def _is_current(checkin: CheckIn) -> bool:
+    return checkin.insights is not None and checkin.insights_version == INSIGHTS_RULES_VERSION
+
+def _stale_filter():
+    return or_(CheckIn.insights_version.is_(None), CheckIn.insights_version != INSIGHTS_RULES_VERSION)
+
+async def _current_insights_async(db: AsyncSession, checkins: Sequence[CheckIn]) -> List[dict]:
+    """
+    Stored insights of the check-ins; rows stored under older rules (normally
+    none) are recomputed and written back.
+    """
+    stale = [c for c in checkins if not _is_current(c)]
+    fresh = dict(zip((c.id for c in stale), analyze_checkins(stale)))
+    if fresh:
+        await db.execute(update(CheckIn), [
+            {"id": checkin_id, "insights": insights, "insights_version": INSIGHTS_RULES_VERSION}
+            for checkin_id, insights in fresh.items()
+        ])
+        await db.commit()
+    return [fresh.get(c.id) or c.insights for c in checkins]
+
+async def insights_history_async(db: AsyncSession, user_id: int, limit: int = 10) -> List[dict]:
+    """
+    Stored insights for the user's last `limit` check-ins, newest first
+    (one read on the (user_id, timestamp) index).
+    """
+    checkins = list((await db.execute(
+        select(CheckIn)
+        .where(CheckIn.user_id == user_id)
+        .order_by(CheckIn.timestamp.desc())
+        .limit(limit)
+    )).scalars())
+    # Serialized before a possible write-back commit touches the objects
+    entries = [(checkin.id, checkin.timestamp, checkin.mood) for checkin in checkins]
+    insights = await _current_insights_async(db, checkins)
+    return [
+        {"checkin_id": checkin_id, "timestamp": timestamp.isoformat(), "mood": mood, **item}
+        for (checkin_id, timestamp, mood), item in zip(entries, insights)
+    ]
+
+async def latest_insights_async(db: AsyncSession, user_id: int) -> Optional[dict]:
+    """
+    The latest check-in's stored insights, or None without check-ins.
+    """
+    history = await insights_history_async(db, user_id, limit=1)
+    if not history:
+        return None
+    return {"reasons": history[0]["reasons"], "tips": history[0]["tips"]}
+
+def recompute_insights(db: Session, batch_size: int = 1000, everything: bool = False) -> int:
+    """
+    Batch mode: recomputes insights stored with an older rules version (or all of
+    them). Committed per batch with keyset pagination, so it can be interrupted
+    and rerun.
+    """
+    done, last_id = 0, 0
+    while True:
+        stmt = select(CheckIn).where(CheckIn.id > last_id).order_by(CheckIn.id).limit(batch_size)
+        if not everything:
+            stmt = stmt.where(_stale_filter())
+        checkins = list(db.execute(stmt).scalars())
+        if not checkins:
+            return done
+        last_id = checkins[-1].id
+        db.execute(update(CheckIn), [
+            {"id": checkin.id, "insights": insights, "insights_version": INSIGHTS_RULES_VERSION}
+            for checkin, insights in zip(checkins, analyze_checkins(checkins))
+        ])
+        db.commit()
+        db.expunge_all()
+        done += len(checkins)
+        print(f"   {done} check-ins recomputed")
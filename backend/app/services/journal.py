@@ -1,7 +1,14 @@
 import json
+from typing import Optional
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.services.ai_service import gemini_wrapper
+from app.services.summary_cache import summary_cache, cache_key
 from google.genai import types
 
+# Bump whenever SUMMARIZE_PROMPT changes so cached summaries are not reused
+SUMMARIZE_PROMPT_VERSION = "1"
+
 SUMMARIZE_PROMPT = """
 You are 'Serene', a supportive AI bestie. I am going to give you a long journal entry/vent from my user.
 Your job is to:
@@ -11,33 +18,78 @@ Your job is to:
 Format your response as a JSON object with two keys: "summary" and "advice" (as a string with bullet points).
 """
 
-def summarize_journal(content: str):
+def _parse_summary(bot_text, quota_hit: bool):
     """
-    Uses Gemini to summarize a long-form journal entry with fallback logic.
+    Returns (result, from_model). Only real model output is worth caching.
     """
-    # 1. Attempt Gemini Call
-    bot_text, quota_hit = gemini_wrapper.safe_generate(
-        contents=[types.Content(role="user", parts=[types.Part(text=content)])],
-        system_instruction=SUMMARIZE_PROMPT,
-        response_mime_type="application/json"
-    )
-
     if quota_hit:
         return {
             "summary": "I'm having a hard time summarizing this right now because I've hit my daily chat limit with Google! ☕",
             "advice": "• Take a deep breath.\n• Come back in a little while and I'll have more advice for you.\n• Keep writing if it feels good!"
-        }
+        }, False
     
     if not bot_text:
         return {
             "summary": "I heard you, bestie. Even if my brain hit a glitch, I'm here for you.",
             "advice": "• Take a deep breath.\n• Remember that your feelings are valid.\n• Try writing more if it helps!"
-        }
+        }, False
 
     try:
-        return json.loads(bot_text)
+        return json.loads(bot_text), True
     except Exception:
         return {
             "summary": "I'm listening, bestie. I couldn't quite summarize that, but I've got your back.",
             "advice": "• Let's keep talking.\n• Take one small step for yourself today."
-        }
+        }, False
+
+def _cache_key(content: str) -> str:
+    return cache_key(content, SUMMARIZE_PROMPT_VERSION, gemini_wrapper.model_id)
+
+def summarize_journal(content: str, db: Optional[Session] = None):
+    """
+    Uses Gemini to summarize a long-form journal entry with fallback logic.
+    Identical content is served from the summary cache without calling Gemini.
+    """
+    key = _cache_key(content)
+    cached = summary_cache.get(db, key)
+    if cached is not None:
+        return cached
+
+    bot_text, quota_hit = gemini_wrapper.safe_generate(
+        contents=[types.Content(role="user", parts=[types.Part(text=content)])],
+        system_instruction=SUMMARIZE_PROMPT,
+        response_mime_type="application/json"
+    )
+    result, from_model = _parse_summary(bot_text, quota_hit)
+    if from_model:
+        summary_cache.put(db, key, result)
+    return result
+
+async def analyze_journal_async(content: str, db: Optional[Session] = None):
+    """
+    Async summarization that also reports whether the result came from the model
+    (or the cache) rather than a fallback. Returns (result, from_model).
+    """
+    key = _cache_key(content)
+    cached = summary_cache.get_memory(key)
+    if cached is None and db is not None:
+        cached = await run_in_threadpool(summary_cache.get, db, key)
+    if cached is not None:
+        return cached, True
+
+    bot_text, quota_hit = await gemini_wrapper.safe_generate_async(
+        contents=[types.Content(role="user", parts=[types.Part(text=content)])],
+        system_instruction=SUMMARIZE_PROMPT,
+        response_mime_type="application/json"
+    )
+    result, from_model = _parse_summary(bot_text, quota_hit)
+    if from_model:
+        await run_in_threadpool(summary_cache.put, db, key, result)
+    return result, from_model
+
+async def summarize_journal_async(content: str, db: Optional[Session] = None):
+    """
+    Async variant of summarize_journal (awaits Gemini instead of blocking a thread).
+    """
+    result, _ = await analyze_journal_async(content, db)
+    return result
@@ -0,0 +1,229 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.db.database import SessionLocal
+from app.db.models import JournalEntry, JournalJob, utcnow
+from app.services.journal import analyze_journal_async
+
+# Number of concurrent analysis workers in this process
+JOURNAL_WORKERS = int(os.getenv("JOURNAL_WORKERS", "2"))
+# Attempts before a job gives up and keeps the fallback summary
+JOURNAL_JOB_MAX_ATTEMPTS = int(os.getenv("JOURNAL_JOB_MAX_ATTEMPTS", "5"))
+# First retry delay in seconds; doubles with every attempt
+JOURNAL_JOB_BACKOFF_SECONDS = float(os.getenv("JOURNAL_JOB_BACKOFF_SECONDS", "10"))
+# Idle workers re-check the table this often (jobs enqueued by other instances)
+POLL_INTERVAL_SECONDS = 5.0
+# A 'running' job not updated for this long belonged to a crashed worker
+STALE_RUNNING_SECONDS = 300
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+def _now() -> datetime:
+    return utcnow()
+
+def enqueue_analysis(db: Session, entry: JournalEntry) -> JournalJob:
+    """
+    Attaches a pending analysis job to a new entry. Committed together with the entry.
+    """
+    job = JournalJob(entry=entry, status=PENDING, next_run_at=_now())
+    db.add(job)
+    return job
+
+def requeue_stale_jobs() -> int:
+    db = SessionLocal()
+    try:
+        cutoff = _now() - timedelta(seconds=STALE_RUNNING_SECONDS)
+        count = (
+            db.query(JournalJob)
+            .filter(JournalJob.status == RUNNING, JournalJob.updated_at < cutoff)
+            .update({JournalJob.status: PENDING, JournalJob.updated_at: _now()}, synchronize_session=False)
+        )
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+def _claim_next_job() -> Optional[dict]:
+    """
+    Moves the oldest due job from pending to running. The conditional UPDATE makes
+    the claim safe when several workers (or instances) race for the same row.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            now = _now()
+            job = (
+                db.query(JournalJob)
+                .filter(JournalJob.status == PENDING, JournalJob.next_run_at <= now)
+                .order_by(JournalJob.next_run_at.asc(), JournalJob.id.asc())
+                .first()
+            )
+            if job is None:
+                return None
+            job_id, entry_id, attempts = job.id, job.entry_id, job.attempts + 1
+            claimed = (
+                db.query(JournalJob)
+                .filter(JournalJob.id == job_id, JournalJob.status == PENDING)
+                .update({
+                    JournalJob.status: RUNNING,
+                    JournalJob.attempts: JournalJob.attempts + 1,
+                    JournalJob.updated_at: now,
+                }, synchronize_session=False)
+            )
+            db.commit()
+            if claimed:
+                entry = db.get(JournalEntry, entry_id)
+                if entry is None:
+                    db.query(JournalJob).filter(JournalJob.id == job_id).update(
+                        {JournalJob.status: FAILED, JournalJob.last_error: "entry missing"},
+                        synchronize_session=False,
+                    )
+                    db.commit()
+                    continue
+                return {
+                    "job_id": job_id,
+                    "entry_id": entry_id,
+                    "content": entry.content,
+                    "attempts": attempts,
+                }
+            db.expire_all()
+    finally:
+        db.close()
+
+def _complete_job(job_id: int, entry_id: int, result: dict, status: str, error: Optional[str] = None):
+    db = SessionLocal()
+    try:
+        entry = db.get(JournalEntry, entry_id)
+        if entry is not None and result:
+            entry.summary = result.get("summary")
+            entry.advice = result.get("advice")
+        db.query(JournalJob).filter(JournalJob.id == job_id).update({
+            JournalJob.status: status,
+            JournalJob.last_error: error,
+            JournalJob.updated_at: _now(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _schedule_retry(job_id: int, attempts: int, error: str) -> float:
+    delay = JOURNAL_JOB_BACKOFF_SECONDS * (2 ** (attempts - 1))
+    db = SessionLocal()
+    try:
+        db.query(JournalJob).filter(JournalJob.id == job_id).update({
+            JournalJob.status: PENDING,
+            JournalJob.next_run_at: _now() + timedelta(seconds=delay),
+            JournalJob.last_error: error,
+            JournalJob.updated_at: _now(),
+        }, synchronize_session=False)
+        db.commit()
+        return delay
+    finally:
+        db.close()
+
+class JournalWorkerPool:
+    """
+    In-process workers draining the journal_jobs table.
+    The table is the source of truth, so pending work survives restarts.
+    """
+    def __init__(self, size: int = JOURNAL_WORKERS):
+        self.size = size
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._listeners: Dict[int, List[asyncio.Event]] = {}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        requeued = await run_in_threadpool(requeue_stale_jobs)
+        if requeued:
+            print(f"JOURNAL_JOBS: Re-queued {requeued} stale jobs")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_update(self, entry_id: int, timeout: float):
+        """
+        Waits until a worker finishes (or retries) the entry's job, or the timeout passes.
+        """
+        event = asyncio.Event()
+        self._listeners.setdefault(entry_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            listeners = self._listeners.get(entry_id, [])
+            if event in listeners:
+                listeners.remove(event)
+            if not listeners:
+                self._listeners.pop(entry_id, None)
+
+    def _notify(self, entry_id: int):
+        for event in self._listeners.get(entry_id, []):
+            event.set()
+
+    async def _worker(self):
+        while True:
+            # Cleared before looking so a wake() during the claim is not lost
+            self._wakeup.clear()
+            try:
+                job = await run_in_threadpool(_claim_next_job)
+            except Exception as e:
+                print(f"JOURNAL_JOBS: Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _retry_later(self, job: dict, error: str):
+        delay = await run_in_threadpool(_schedule_retry, job["job_id"], job["attempts"], error)
+        # Wake a worker when the retry is due instead of waiting for the next poll
+        asyncio.get_running_loop().call_later(delay, self.wake)
+
+    async def _run(self, job: dict):
+        db = SessionLocal()
+        try:
+            result, from_model = await analyze_journal_async(job["content"], db)
+            if from_model:
+                await run_in_threadpool(_complete_job, job["job_id"], job["entry_id"], result, DONE)
+            elif job["attempts"] >= JOURNAL_JOB_MAX_ATTEMPTS:
+                # Give up but still leave the friendly fallback on the entry
+                await run_in_threadpool(_complete_job, job["job_id"], job["entry_id"], result, FAILED, "model unavailable")
+            else:
+                await self._retry_later(job, "model unavailable")
+        except Exception as e:
+            print(f"JOURNAL_JOBS: Job {job['job_id']} failed: {e}")
+            if job["attempts"] >= JOURNAL_JOB_MAX_ATTEMPTS:
+                await run_in_threadpool(_complete_job, job["job_id"], job["entry_id"], {}, FAILED, str(e))
+            else:
+                await self._retry_later(job, str(e))
+        finally:
+            db.close()
+            self._notify(job["entry_id"])
+
+# Global instance
+journal_workers = JournalWorkerPool()
@@ -0,0 +1,159 @@
+"""
+One precompiled keyword matcher for sentiment, check-in insights and the
+chat fallback reply.
+
+All keyword lists are compiled at import into a single trie-shaped regex, and
+one left-to-right scan over the text reports every keyword at every position
+(overlapping ones included). Each category keeps the matching
+rule its caller always had: "substring" (`word in text`) or "word" (whole-word,
+like `\\bword\\b`).
+"""
+import re
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+SUBSTRING = "substring"
+WORD = "word"
+
+POSITIVE_KEYWORDS = ["happy", "excited", "good", "great", "awesome", "better", "proud", "love", "yay", "bestie"]
+NEGATIVE_KEYWORDS = ["sad", "stressed", "anxious", "angry", "bad", "terrible", "worst", "unhappy", "depressed", "tired", "oouf", "uugh", "broken"]
+
+# Relationship keywords are split into entities and conflict indicators to avoid false positives
+RELATIONSHIP_ENTITIES = ["partner", "wife", "husband", "boyfriend", "girlfriend", "spouse", "fiance"]
+CONFLICT_INDICATORS = ["fight", "argument", "conflict", "clash", "disagreement", "mad", "angry", "annoyed"]
+RELATIONSHIP_CRISES = ["breakup", "ex", "divorce", "separated", "broken up"]
+
+# category -> (match rule, keywords)
+CATEGORIES: Dict[str, Tuple[str, List[str]]] = {
+    # sentiment.py
+    "positive": (SUBSTRING, POSITIVE_KEYWORDS),
+    "negative": (SUBSTRING, NEGATIVE_KEYWORDS),
+    # insights.py
+    "relationship_crisis": (WORD, RELATIONSHIP_CRISES),
+    "relationship_entity": (WORD, RELATIONSHIP_ENTITIES),
+    "conflict": (WORD, CONFLICT_INDICATORS),
+    "work": (WORD, ["work", "job", "project", "boss", "deadline", "career"]),
+    "academic": (WORD, ["exam", "study", "school", "grade", "test", "homework"]),
+    "social": (WORD, ["lonely", "alone", "isolated", "sad", "miss"]),
+    "financial": (WORD, ["money", "debt", "rent", "bill", "expensive", "cost"]),
+    "health": (WORD, ["sick", "pain", "headache", "tired", "body"]),
+    # ChatService.mock_bestie_reply
+    "chat_relationship": (SUBSTRING, ["fight", "partner", "breakup", "relationship"]),
+    "chat_work": (SUBSTRING, ["work", "job", "boss", "deadline"]),
+    "chat_sleep": (SUBSTRING, ["sleep", "tired", "awake"]),
+}
+
+def _is_word_char(ch: str) -> bool:
+    # Same notion of a word character as re's \b on str patterns
+    return ch.isalnum() or ch == "_"
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation factored on shared prefixes ("bo(?:ss|dy)"), so each
+    position is tested against the first characters only once.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        optional = "" in node
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not optional else "(?:" + "|".join(branches) + ")"
+        # Greedy: the longest keyword at a position wins, shorter ones come from _prefixes
+        return body + "?" if optional else body
+
+    return build(trie)
+
+class LexiconHits:
+    """
+    Keywords found in one text, grouped by category.
+    """
+    __slots__ = ("_hits",)
+
+    def __init__(self, hits: Dict[str, FrozenSet[str]]):
+        self._hits = hits
+
+    def __getitem__(self, category: str) -> FrozenSet[str]:
+        return self._hits.get(category, frozenset())
+
+    def has(self, category: str) -> bool:
+        return category in self._hits
+
+    def count(self, category: str) -> int:
+        """
+        Number of distinct keywords of the category present.
+        """
+        return len(self._hits.get(category, ()))
+
+    def categories(self) -> List[str]:
+        return sorted(self._hits)
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        return {category: sorted(words) for category, words in sorted(self._hits.items())}
+
+class Lexicon:
+    """
+    Compiled multi-category keyword matcher. Texts are matched case-insensitively.
+    """
+    def __init__(self, categories: Dict[str, Tuple[str, Sequence[str]]]):
+        # keyword -> ((category, rule), ...)
+        self._owners: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        for category, (rule, words) in categories.items():
+            if rule not in (SUBSTRING, WORD):
+                raise ValueError(f"Unknown match rule {rule!r} for category {category!r}")
+            for word in words:
+                word = word.lower()
+                self._owners[word] = self._owners.get(word, ()) + ((category, rule),)
+
+        keywords = sorted(self._owners)
+        # The regex reports one (the longest) keyword per start position; any other
+        # keyword that is a prefix of it matched at the same position too
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            word: tuple(other for other in keywords if word.startswith(other))
+            for word in keywords
+        }
+        self._pattern = re.compile(_trie_pattern(keywords))
+
+    def _matches(self, text: str):
+        # search() restarted one character after each hit, so overlapping keywords
+        # ("unhappy" / "happy") are all found while the regex engine skips ahead
+        # between hits on its own
+        search = self._pattern.search
+        match = search(text)
+        while match is not None:
+            yield match
+            match = search(text, match.start() + 1)
+
+    def _collect(self, text: str, matches) -> Dict[str, set]:
+        hits: Dict[str, set] = {}
+        size = len(text)
+        for match in matches:
+            start = match.start()
+            left_ok = start == 0 or not _is_word_char(text[start - 1])
+            for word in self._prefixes[match.group()]:
+                end = start + len(word)
+                whole = left_ok and (end == size or not _is_word_char(text[end]))
+                for category, rule in self._owners[word]:
+                    if rule == SUBSTRING or whole:
+                        hits.setdefault(category, set()).add(word)
+        return hits
+
+    def scan(self, text: str) -> LexiconHits:
+        """
+        All category hits in a single pass over the text.
+        """
+        text = (text or "").lower()
+        hits = self._collect(text, self._matches(text))
+        return LexiconHits({category: frozenset(words) for category, words in hits.items()})
+
+    def scan_many(self, texts: Sequence[str]) -> List[LexiconHits]:
+        # Joining the texts into one regex pass measured no faster than this loop
+        return [self.scan(text) for text in texts]
+
+# Global instance
+lexicon = Lexicon(CATEGORIES)
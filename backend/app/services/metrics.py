@@ -0,0 +1,285 @@
+"""
+Per-request timing and Prometheus metrics.
+
+TimingMiddleware opens a RequestTiming for every API request (in a context
+variable, so it follows the request into threadpool endpoints and SQLAlchemy's
+async greenlets). Cursor-execute hooks add query time to it, and the Gemini
+wrapper adds model time. The rest of the wall time is attributed to the app
+(Python compute, serialization, waiting on anything else). The breakdown goes
+out as a Server-Timing header and into the histograms served at /api/metrics.
+"""
+import time
+import inspect
+import functools
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Upper bounds (seconds) for latency histograms; streams can run for a while
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(round(total, 6))}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+REQUEST_SECONDS = Histogram(
+    "serene_http_request_duration_seconds", "API request wall time.", ("method", "route", "status"))
+REQUEST_PHASE_SECONDS = Histogram(
+    "serene_http_request_phase_seconds", "API request wall time split into db / model / app.", ("route", "phase"))
+REQUEST_QUERIES = Counter(
+    "serene_http_request_db_queries_total", "SQL statements executed while serving a route.", ("route",))
+DB_QUERY_SECONDS = Histogram(
+    "serene_db_query_duration_seconds", "SQL statement execution time.", ("engine",))
+UPSTREAM_CALLS = Counter(
+    "serene_upstream_calls_total", "Calls to upstream services by outcome (ok / quota / failed).", ("upstream", "call", "outcome"))
+UPSTREAM_SECONDS = Histogram(
+    "serene_upstream_call_duration_seconds", "Upstream call time, until the last chunk for streams.", ("upstream", "call"))
+
+METRICS = (REQUEST_SECONDS, REQUEST_PHASE_SECONDS, REQUEST_QUERIES, DB_QUERY_SECONDS, UPSTREAM_CALLS, UPSTREAM_SECONDS)
+
+def render(extra: Iterable[str] = ()) -> str:
+    """
+    Prometheus text exposition of every metric above plus `extra` lines.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+# --- per-request attribution ---
+
+class RequestTiming:
+    """
+    Time spent in the DB and in model calls during one request.
+    """
+    __slots__ = ("started", "db_seconds", "db_queries", "model_seconds", "model_calls")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.model_seconds = 0.0
+        self.model_calls = 0
+
+    def phases(self, total: float) -> Dict[str, float]:
+        # Concurrent work inside a request can overlap; app time never goes negative
+        return {
+            "db": self.db_seconds,
+            "model": self.model_seconds,
+            "app": max(total - self.db_seconds - self.model_seconds, 0.0),
+        }
+
+    def server_timing(self, total: float) -> str:
+        phases = self.phases(total)
+        return ", ".join([
+            f'db;dur={phases["db"] * 1000:.1f};desc="{self.db_queries} queries"',
+            f'model;dur={phases["model"] * 1000:.1f};desc="{self.model_calls} calls"',
+            f'app;dur={phases["app"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+# --- SQL ---
+
+_QUERY_STARTS = "serene_query_starts"
+
+def install_query_timing(engine, name: str):
+    """
+    Times every cursor execute on `engine` (sync or async) into the current request
+    and the per-engine query histogram.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_QUERY_STARTS, []).append(time.perf_counter())
+
+    def _finish(conn):
+        starts = conn.info.get(_QUERY_STARTS)
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        DB_QUERY_SECONDS.observe(elapsed, name)
+        timing = _current.get()
+        if timing is not None:
+            timing.db_seconds += elapsed
+            timing.db_queries += 1
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # Failed statements never reach after_cursor_execute
+        if context.connection is not None:
+            _finish(context.connection)
+
+# --- model calls ---
+
+def _outcome(result) -> str:
+    text, quota_hit = result
+    if text is not None:
+        return "ok"
+    return "quota" if quota_hit else "failed"
+
+def _record_model_call(upstream: str, call: str, started: float, outcome: str):
+    elapsed = time.perf_counter() - started
+    UPSTREAM_CALLS.inc(upstream, call, outcome)
+    UPSTREAM_SECONDS.observe(elapsed, upstream, call)
+    timing = _current.get()
+    if timing is not None:
+        timing.model_seconds += elapsed
+        timing.model_calls += 1
+
+def timed_model_call(upstream: str, call: str):
+    """
+    Decorator for the wrapper methods that return / yield (text, is_quota_exceeded):
+    sync functions, coroutines and async generators.
+    """
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def stream(*args, **kwargs):
+                started, outcome = time.perf_counter(), "failed"
+                try:
+                    async for item in fn(*args, **kwargs):
+                        if item[0] is not None:
+                            outcome = "ok"
+                        elif outcome != "ok":
+                            outcome = _outcome(item)
+                        yield item
+                finally:
+                    _record_model_call(upstream, call, started, outcome)
+            return stream
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def call_async(*args, **kwargs):
+                started = time.perf_counter()
+                result = await fn(*args, **kwargs)
+                _record_model_call(upstream, call, started, _outcome(result))
+                return result
+            return call_async
+
+        @functools.wraps(fn)
+        def call_sync(*args, **kwargs):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            _record_model_call(upstream, call, started, _outcome(result))
+            return result
+        return call_sync
+    return decorate
+
+# --- middleware ---
+
+def route_label(scope) -> str:
+    # The matched path template keeps label cardinality bounded (no ids, no 404 paths).
+    # Newer FastAPI keeps the router prefix on the effective route context, not the route
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(effective, "path_format", None) or getattr(scope.get("route"), "path", None)
+    return f"{scope.get('root_path', '')}{path}" if path else "unmatched"
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (streaming responses pass straight through).
+    Server-Timing is sent with the response headers, so for a stream it covers
+    the time to the first byte; the histograms cover the whole response.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timing.server_timing(time.perf_counter() - timing.started)
+                message = dict(message, headers=[*message.get("headers", []), (b"server-timing", header.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - timing.started
+            route = route_label(scope)
+            REQUEST_SECONDS.observe(total, scope["method"], route, str(status))
+            for phase, seconds in timing.phases(total).items():
+                REQUEST_PHASE_SECONDS.observe(seconds, route, phase)
+            if timing.db_queries:
+                REQUEST_QUERIES.inc(route, amount=timing.db_queries)
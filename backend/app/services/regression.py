@@ -1,63 +1,263 @@
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, timezone
-from typing import List
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
 import numpy as np
-from sklearn.linear_model import LinearRegression
 
-from app.db.models import CheckIn
+from app.db.database import dialect_insert
+from app.db.models import DailyRollup, MoodForecastState, utcnow
+from app.services.rollups import get_rollups, get_rollups_async
+
+# The window whose sufficient statistics are kept up to date per user; other
+# `days` values are fitted from the rollups directly
+FORECAST_WINDOW_DAYS = 30
+# Steps (active days) ahead in the multi-horizon forecast
+FORECAST_HORIZON = 7
+MIN_ACTIVE_DAYS = 3
+
+# Two-sided 95% Student t critical values by degrees of freedom (normal beyond 30)
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131,
+    16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074,
+    23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+}
+
+def _cutoff(days: int):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).date()
+
+def _now() -> datetime:
+    return utcnow()
+
+def _day_average(rollup) -> float:
+    return rollup.mood_sum / rollup.count
+
+def fit_from_stats(n: int, sum_y: float, sum_y2: float, sum_xy: float) -> dict:
+    """
+    Closed-form OLS of y on x = 0..n-1 from the running sums.
+    Same slope / intercept / R^2 as sklearn's LinearRegression on that data.
+    """
+    sum_x = n * (n - 1) / 2.0
+    sum_x2 = (n - 1) * n * (2 * n - 1) / 6.0
+    sxx = sum_x2 - sum_x * sum_x / n
+    sxy = sum_xy - sum_x * sum_y / n
+    syy = max(sum_y2 - sum_y * sum_y / n, 0.0)
+
+    slope = sxy / sxx
+    intercept = (sum_y - slope * sum_x) / n
+    sse = max(syy - slope * sxy, 0.0)
+    # sklearn's r2_score reports a perfect fit of constant data as 1.0
+    scale = max(sum_y2, 1.0)
+    if syy <= 1e-12 * scale:
+        r2 = 1.0 if sse <= 1e-12 * scale else 0.0
+    else:
+        r2 = 1.0 - sse / syy
+    return {"n": n, "slope": slope, "intercept": intercept, "r2": r2, "sse": sse, "sxx": sxx, "mean_x": sum_x / n}
+
+def horizon_forecast(fit: dict, steps: int = FORECAST_HORIZON) -> list:
+    """
+    Predictions for the next `steps` active days with 95% prediction intervals.
+    """
+    n = fit["n"]
+    x0 = (n - 1) + np.arange(1, steps + 1, dtype=float)
+    predicted = fit["intercept"] + fit["slope"] * x0
+
+    dof = n - 2
+    residual_sd = np.sqrt(fit["sse"] / dof) if dof > 0 else 0.0
+    t = T_CRITICAL_95.get(dof, 1.96)
+    margin = t * residual_sd * np.sqrt(1.0 + 1.0 / n + (x0 - fit["mean_x"]) ** 2 / fit["sxx"])
+
+    return [
+        {"step": int(step), "prediction": round(float(p), 2), "lower": round(float(lo), 2), "upper": round(float(hi), 2)}
+        for step, p, lo, hi in zip(range(1, steps + 1), predicted, predicted - margin, predicted + margin)
+    ]
+
+def _forecast_response(n: int, num_points: int, sum_y: float, sum_y2: float, sum_xy: float, days: int):
+    if n == 0:
+        raise ValueError(f"No check-ins found in last {days} days.")
+    if n < MIN_ACTIVE_DAYS: # Reduced requirement slightly if using daily averages
+        raise ValueError(f"Not enough active days in last {days} days (need at least 3 distinct days with data).")
+
+    fit = fit_from_stats(n, sum_y, sum_y2, sum_xy)
+    return {
+        "days_used": days,
+        "num_points": num_points,
+        "num_active_days": n,
+        "trend_slope": round(float(fit["slope"]), 3),
+        "r2_score": round(float(fit["r2"]), 3),
+        # Predict next day mood
+        "next_day_prediction": round(float(fit["intercept"] + fit["slope"] * n), 2),
+        "confidence_level": 0.95,
+        "horizon": horizon_forecast(fit),
+    }
+
+def stats_from_rollups(rollups) -> dict:
+    """
+    Sufficient statistics over daily averages (rollups in chronological order).
+    """
+    y = np.array([_day_average(r) for r in rollups], dtype=float)
+    x = np.arange(len(y), dtype=float)
+    return {
+        "n": len(y),
+        "checkins": int(sum(r.count for r in rollups)),
+        "sum_y": float(y.sum()),
+        "sum_y2": float((y * y).sum()),
+        "sum_xy": float((x * y).sum()),
+        "last_day": rollups[-1].day if rollups else None,
+    }
+
+def _forecast_from_rollups(rollups, days: int):
+    stats = stats_from_rollups(rollups)
+    return _forecast_response(stats["n"], stats["checkins"], stats["sum_y"], stats["sum_y2"], stats["sum_xy"], days)
 
 def mood_forecast(db: Session, user_id: int, days: int = 30):
     """
     Predicts mood trends for a specific user.
+    Fits directly from the window's rollups (used by scripts; the API reads the
+    stored statistics via mood_forecast_async).
     """
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    # One pre-aggregated row per active day, already in chronological order
+    return _forecast_from_rollups(get_rollups(db, user_id, since=_cutoff(days)), days)
 
-    rows = (
-        db.query(CheckIn)
-        .filter(CheckIn.user_id == user_id, CheckIn.timestamp >= cutoff)
-        .order_by(CheckIn.timestamp.asc())
-        .all()
+def _drop_update(user_id: int, old_start: date, new_start: date, expiring):
+    """
+    Removes the oldest k days (indices 0..k-1) from the sums and re-indexes the rest:
+    sum_xy' = sum_xy - sum(i * y_i for dropped) - k * (remaining sum_y).
+    SET expressions read the pre-update values, so this is one atomic statement.
+    """
+    ys = [_day_average(r) for r in expiring]
+    k = len(ys)
+    d_y = sum(ys)
+    d_y2 = sum(v * v for v in ys)
+    d_xy = sum(i * v for i, v in enumerate(ys))
+    d_count = sum(r.count for r in expiring)
+    state = MoodForecastState
+    return (
+        update(state)
+        .where(state.user_id == user_id, state.window_start == old_start)
+        .values(
+            n=state.n - k,
+            checkins=state.checkins - d_count,
+            sum_y=state.sum_y - d_y,
+            sum_y2=state.sum_y2 - d_y2,
+            sum_xy=state.sum_xy - d_xy - k * (state.sum_y - d_y),
+            window_start=new_start,
+            updated_at=_now(),
+        )
     )
 
-    if not rows:
-        raise ValueError(f"No check-ins found in last {days} days.")
+async def _build_state(db: AsyncSession, user_id: int, cutoff: date):
+    stats = stats_from_rollups(await get_rollups_async(db, user_id, since=cutoff))
+    stmt = dialect_insert(db)(MoodForecastState).values(
+        user_id=user_id,
+        window_start=cutoff,
+        last_day=stats["last_day"],
+        n=stats["n"],
+        checkins=stats["checkins"],
+        sum_y=stats["sum_y"],
+        sum_y2=stats["sum_y2"],
+        sum_xy=stats["sum_xy"],
+        updated_at=_now(),
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=["user_id"]))
 
-    # Group by date to average multiple entries per day
-    daily_data = {}
-    for r in rows:
-        day = r.timestamp.date() if hasattr(r.timestamp, 'date') else datetime.fromisoformat(str(r.timestamp)).date()
-        if day not in daily_data:
-            daily_data[day] = []
-        daily_data[day].append(r.mood)
-    
-    # Calculate daily averages
-    # Sort dates chronologically
-    sorted_days = sorted(daily_data.keys())
-    daily_averages = [sum(daily_data[d]) / len(daily_data[d]) for d in sorted_days]
-
-    if len(daily_averages) < 3: # Reduced requirement slightly if using daily averages
-        raise ValueError(f"Not enough active days in last {days} days (need at least 3 distinct days with data).")
+async def _load_state(db: AsyncSession, user_id: int) -> Optional[MoodForecastState]:
+    return await db.scalar(
+        select(MoodForecastState)
+        .where(MoodForecastState.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
 
-    # Prepare regression data
-    # X is the day index, y is the average mood
-    X = np.array(range(len(daily_averages))).reshape(-1, 1)
-    y = np.array(daily_averages)
+async def mood_forecast_async(db: AsyncSession, user_id: int, days: int = 30):
+    """
+    Constant-time forecast from the user's stored sufficient statistics.
+    Days that slid out of the window since the last call are subtracted using
+    their rollups (usually zero or one row).
+    """
+    if days != FORECAST_WINDOW_DAYS:
+        return _forecast_from_rollups(await get_rollups_async(db, user_id, since=_cutoff(days)), days)
 
-    model = LinearRegression()
-    model.fit(X, y)
+    cutoff = _cutoff(days)
+    state = await _load_state(db, user_id)
+    if state is None:
+        await _build_state(db, user_id, cutoff)
+        await db.commit()
+        state = await _load_state(db, user_id)
+    elif state.window_start < cutoff:
+        expiring = []
+        if state.last_day is not None:
+            expiring = list((await db.execute(
+                select(DailyRollup)
+                .where(
+                    DailyRollup.user_id == user_id,
+                    DailyRollup.day >= state.window_start,
+                    DailyRollup.day < cutoff,
+                    DailyRollup.day <= state.last_day,
+                )
+                .order_by(DailyRollup.day.asc())
+            )).scalars())
+        # Guarded on window_start, so a concurrent request can't drop the same days twice
+        await db.execute(_drop_update(user_id, state.window_start, cutoff, expiring))
+        await db.commit()
+        state = await _load_state(db, user_id)
 
-    slope = model.coef_[0]
-    r2 = model.score(X, y)
+    return _forecast_response(state.n, state.checkins, state.sum_y, state.sum_y2, state.sum_xy, days)
 
-    # Predict next day mood
-    next_day_idx = np.array([[len(daily_averages)]])
-    next_prediction = model.predict(next_day_idx)[0]
+async def apply_checkin_to_forecast(db: AsyncSession, user_id: int, day: date, mood: float, day_count: int, day_mood_sum: float):
+    """
+    Folds a new check-in into the stored statistics, given its day's rollup totals
+    after the check-in. Does not commit (runs in the check-in's transaction).
+    A check-in that lands before the newest included day invalidates the state,
+    which is then rebuilt from the rollups on the next forecast.
+    """
+    state = MoodForecastState
+    new_y = day_mood_sum / day_count
+    if day_count == 1:
+        # A new active day appended at index n
+        result = await db.execute(
+            update(state)
+            .where(state.user_id == user_id, state.window_start <= day,
+                   or_(state.last_day.is_(None), state.last_day < day))
+            .values(
+                n=state.n + 1,
+                checkins=state.checkins + 1,
+                sum_y=state.sum_y + new_y,
+                sum_y2=state.sum_y2 + new_y * new_y,
+                sum_xy=state.sum_xy + state.n * new_y,
+                last_day=day,
+                updated_at=_now(),
+            )
+        )
+    else:
+        # The newest day's average moved from old_y to new_y (index n - 1)
+        old_y = (day_mood_sum - mood) / (day_count - 1)
+        delta = new_y - old_y
+        result = await db.execute(
+            update(state)
+            .where(state.user_id == user_id, state.window_start <= day, state.last_day == day)
+            .values(
+                checkins=state.checkins + 1,
+                sum_y=state.sum_y + delta,
+                sum_y2=state.sum_y2 + new_y * new_y - old_y * old_y,
+                sum_xy=state.sum_xy + (state.n - 1) * delta,
+                updated_at=_now(),
+            )
+        )
+    if result.rowcount == 0:
+        # Older than the window (nothing to do), no state yet, or a back-dated
+        # day inside the window: drop the state and let the next read rebuild it
+        await db.execute(
+            delete(state).where(state.user_id == user_id, state.window_start <= day)
+        )
 
-    return {
-        "days_used": days,
-        "num_points": len(rows),
-        "num_active_days": len(daily_averages),
-        "trend_slope": round(float(slope), 3),
-        "r2_score": round(float(r2), 3),
-        "next_day_prediction": round(float(next_prediction), 2),
-    }
+def reset_forecast_state(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Drops stored statistics (e.g. after rebuilding rollups); they are rebuilt lazily.
+    """
+    query = db.query(MoodForecastState)
+    if user_id is not None:
+        query = query.filter(MoodForecastState.user_id == user_id)
+    removed = query.delete(synchronize_session=False)
+    db.commit()
+    return removed
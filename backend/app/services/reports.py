@@ -1,17 +1,14 @@
-import os
 import json
+import hashlib
 from datetime import datetime, timedelta, timezone, date
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.models import CheckIn
-from google import genai
+from app.db.models import DailyRollup, WeeklyReport
+from app.services.rollups import get_rollups, get_rollups_async
+from app.services.ai_service import gemini_wrapper
 from google.genai import types
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Configure Gemini
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
 
 REPORT_PROMPT = """
 You are 'Serene', a supportive AI bestie and wellness data scientist. 
@@ -24,81 +21,173 @@ Your job is to:
 Format your response as a JSON object with three keys: "summary", "win", and "focus".
 """
 
-def generate_weekly_report(db: Session, user_id: int):
+EMPTY_REPORT = {
+    "summary": "I don't have enough data yet to write your weekly report, bestie! Keep checking in.",
+    "win": "Starting your journey!",
+    "focus": "Consistent check-ins."
+}
+
+def _one_week_ago() -> date:
+    return (datetime.now(timezone.utc) - timedelta(days=7)).date()
+
+def _weekly_data_summary(db: Session, user_id: int):
     """
-    Aggregates last 7 days of data for a specific user and generates an AI wellness report.
-    Groups multiple check-ins per day into averages.
+    Aggregates last 7 days of data for a specific user.
+    Returns (avg_mood, data_summary, data_version) or None when there is no data.
     """
-    one_week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    
-    # Get last 7 days of check-ins for this user
-    checkins = (
-        db.query(CheckIn)
-        .filter(CheckIn.user_id == user_id, CheckIn.timestamp >= one_week_ago)
-        .order_by(CheckIn.timestamp.asc())
-        .all()
-    )
-    
-    if not checkins:
-        return {
-            "summary": "I don't have enough data yet to write your weekly report, bestie! Keep checking in.",
-            "win": "Starting your journey!",
-            "focus": "Consistent check-ins."
-        }
-    
-    # Group by date
-    daily_data = {}
-    for c in checkins:
-        # Normalize timestamp to date
-        day = c.timestamp.date() if hasattr(c.timestamp, 'date') else datetime.fromisoformat(str(c.timestamp)).date()
-        if day not in daily_data:
-            daily_data[day] = {"moods": [], "sleeps": []}
-        daily_data[day]["moods"].append(c.mood)
-        daily_data[day]["sleeps"].append(c.sleep_hours)
+    # Get last 7 days of per-day rollups for this user
+    return _summarize_rollups(get_rollups(db, user_id, since=_one_week_ago()))
+
+def _summarize_rollups(rollups):
+    if not rollups:
+        return None
     
     # Calculate daily averages
     daily_averages = []
-    for day, vals in daily_data.items():
+    for r in rollups:
         daily_averages.append({
-            "day": day,
-            "avg_mood": sum(vals["moods"]) / len(vals["moods"]),
-            "avg_sleep": sum(vals["sleeps"]) / len(vals["sleeps"])
+            "day": r.day,
+            "avg_mood": r.mood_sum / r.count,
+            "avg_sleep": r.sleep_sum / r.sleep_count if r.sleep_count else None
         })
+    total_checkins = sum(r.count for r in rollups)
     
     # Calculate weekly overall averages from daily averages
+    sleep_days = [d["avg_sleep"] for d in daily_averages if d["avg_sleep"] is not None]
     avg_mood = sum(d["avg_mood"] for d in daily_averages) / len(daily_averages)
-    avg_sleep = sum(d["avg_sleep"] for d in daily_averages) / len(daily_averages)
+    avg_sleep = sum(sleep_days) / len(sleep_days) if sleep_days else 0.0
     
     data_summary = f"""
     Over the last 7 days (Aggregated by Day):
     - Average Mood: {avg_mood:.1f}/10
     - Average Sleep: {avg_sleep:.1f} hours
-    - Total Data Points (Check-ins): {len(checkins)}
+    - Total Data Points (Check-ins): {total_checkins}
     - Active Days: {len(daily_averages)}
     """
-    
+
+    # Any new check-in (or a day leaving the window) changes the fingerprint
+    fingerprint = "|".join(
+        f"{r.day.isoformat()}:{r.count}:{r.mood_sum}:{r.sleep_count}:{r.sleep_sum}" for r in rollups
+    )
+    data_version = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return avg_mood, data_summary, data_version
+
+def current_iso_week(today: Optional[date] = None) -> str:
+    year, week, _ = (today or datetime.now(timezone.utc).date()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _report_payload(row: Optional[WeeklyReport]):
+    if row is None:
+        return None
+    return {"summary": row.summary, "win": row.win, "focus": row.focus}
+
+def _load_stored_report(db: Session, user_id: int, iso_week: str, data_version: str):
+    return _report_payload(db.get(WeeklyReport, (user_id, iso_week, data_version)))
+
+def _new_report_row(user_id: int, iso_week: str, data_version: str, report: dict) -> WeeklyReport:
+    return WeeklyReport(
+        user_id=user_id,
+        iso_week=iso_week,
+        data_version=data_version,
+        summary=report.get("summary"),
+        win=report.get("win"),
+        focus=report.get("focus"),
+    )
+
+def _store_report(db: Session, user_id: int, iso_week: str, data_version: str, report: dict):
+    db.add(_new_report_row(user_id, iso_week, data_version, report))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Built concurrently by another request or the batch job
+        db.rollback()
+
+async def _store_report_async(db: AsyncSession, user_id: int, iso_week: str, data_version: str, report: dict):
+    db.add(_new_report_row(user_id, iso_week, data_version, report))
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
-            contents=[types.Content(role="user", parts=[types.Part(text=data_summary)])],
-            config=types.GenerateContentConfig(
-                system_instruction=REPORT_PROMPT,
-                temperature=0.7,
-                response_mime_type="application/json"
-            )
-        )
-        
-        return json.loads(response.text)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+
+def _parse_report(avg_mood: float, bot_text, quota_hit: bool):
+    """
+    Returns (report, from_model). Fallback reports are never stored.
+    """
+    if quota_hit:
+        return {
+            "summary": "I'm having a little trouble gathering your report right now because I've hit my daily data limit with Google! 📊☕",
+            "win": "Showing up for yourself!",
+            "focus": "Take a rest and check back later."
+        }, False
+    try:
+        return json.loads(bot_text), True
     except Exception as e:
-        print(f"ERROR_REPORT: Gemini error: {e}")
-        if "429" in str(e):
-            return {
-                "summary": "I'm having a little trouble gathering your report right now because I've hit my daily data limit with Google! 📊☕",
-                "win": "Showing up for yourself!",
-                "focus": "Take a rest and check back later."
-            }
+        print(f"ERROR_REPORT: Could not parse report: {e}")
         return {
             "summary": f"Your week had an average mood of {avg_mood:.1f}. You're doing your best!",
             "win": "You showed up for yourself.",
             "focus": "Keep tracking your stats!"
-        }
+        }, False
+
+def generate_weekly_report(db: Session, user_id: int):
+    """
+    Aggregates last 7 days of data for a specific user and generates an AI wellness report.
+    Groups multiple check-ins per day into averages.
+    """
+    aggregated = _weekly_data_summary(db, user_id)
+    if aggregated is None:
+        return dict(EMPTY_REPORT)
+    avg_mood, data_summary, data_version = aggregated
+
+    iso_week = current_iso_week()
+    stored = _load_stored_report(db, user_id, iso_week, data_version)
+    if stored is not None:
+        return stored
+
+    bot_text, quota_hit = gemini_wrapper.safe_generate(
+        contents=[types.Content(role="user", parts=[types.Part(text=data_summary)])],
+        system_instruction=REPORT_PROMPT,
+        response_mime_type="application/json"
+    )
+    report, from_model = _parse_report(avg_mood, bot_text, quota_hit)
+    if from_model:
+        _store_report(db, user_id, iso_week, data_version, report)
+    return report
+
+async def generate_weekly_report_async(db: AsyncSession, user_id: int):
+    """
+    Async variant of generate_weekly_report on an AsyncSession (no threadpool hops).
+    Serves the stored report when the user's data hasn't changed since it was built.
+    """
+    aggregated = _summarize_rollups(await get_rollups_async(db, user_id, since=_one_week_ago()))
+    if aggregated is None:
+        return dict(EMPTY_REPORT)
+    avg_mood, data_summary, data_version = aggregated
+
+    iso_week = current_iso_week()
+    stored = _report_payload(await db.get(WeeklyReport, (user_id, iso_week, data_version)))
+    if stored is not None:
+        return stored
+
+    bot_text, quota_hit = await gemini_wrapper.safe_generate_async(
+        contents=[types.Content(role="user", parts=[types.Part(text=data_summary)])],
+        system_instruction=REPORT_PROMPT,
+        response_mime_type="application/json"
+    )
+    report, from_model = _parse_report(avg_mood, bot_text, quota_hit)
+    if from_model:
+        await _store_report_async(db, user_id, iso_week, data_version, report)
+    return report
+
+def active_user_ids(db: Session, days: int = 7):
+    """
+    Users with at least one check-in in the report window.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+    rows = (
+        db.query(DailyRollup.user_id)
+        .filter(DailyRollup.day >= since)
+        .distinct()
+        .all()
+    )
+    return [r[0] for r in rows]
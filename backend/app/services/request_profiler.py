@@ -0,0 +1,178 @@
+"""
+On-demand cProfile of individual API requests.
+
+Off unless configured, and then the middleware isn't even installed:
+- PROFILE_ADMIN_TOKEN: requests sent with `X-Profile-Token: <token>` are profiled
+- PROFILE_REQUESTS=true: every request is profiled (staging / local only)
+
+Profiles are pstats files in PROFILE_DIR with a JSON sidecar each, kept as a
+ring of the newest PROFILE_RING_SIZE. /api/profiles lists and serves them to
+callers holding the token.
+
+cProfile follows the event-loop thread, so a profile covers the request's async
+code but also anything else the loop ran meanwhile; one request is profiled at
+a time and concurrent ones pass through unprofiled.
+"""
+import io
+import os
+import hmac
+import json
+import time
+import pstats
+import asyncio
+import cProfile
+import itertools
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.services.metrics import route_label
+
+# Secret for the X-Profile-Token header; unset disables header-triggered profiling
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Profile every request (never in production)
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+# Where profiles are kept, and how many of the newest are kept
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+
+PROFILE_HEADER = "x-profile-token"
+
+_sequence = itertools.count()
+
+def token_matches(candidate: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and candidate is not None and hmac.compare_digest(candidate, PROFILE_ADMIN_TOKEN)
+
+class RequestProfiler:
+    """
+    Bounded on-disk ring of request profiles.
+    """
+    def __init__(self, directory: str = PROFILE_DIR, ring_size: int = PROFILE_RING_SIZE):
+        self.directory = directory
+        self.ring_size = ring_size
+        self.enabled = PROFILE_REQUESTS or bool(PROFILE_ADMIN_TOKEN)
+        # cProfile hooks the whole thread; two at once would clobber each other
+        self._busy = threading.Lock()
+        self._files = threading.Lock()
+
+    def wanted(self, scope) -> bool:
+        # Fetching profiles must not push the interesting ones out of the ring
+        if scope["path"][len(scope.get("root_path", "")):].startswith("/profiles"):
+            return False
+        if PROFILE_REQUESTS:
+            return True
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER.encode():
+                return token_matches(value.decode("latin-1"))
+        return False
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    def save(self, profile_id: str, profile: cProfile.Profile, meta: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._files:
+            # pstats first, sidecar last: a listed profile always has its data
+            tmp_path = self._path(profile_id, ".pstats.tmp")
+            profile.dump_stats(tmp_path)
+            os.replace(tmp_path, self._path(profile_id, ".pstats"))
+            tmp_path = self._path(profile_id, ".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self._path(profile_id, ".json"))
+            self._trim()
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        # Ids start with a zero-padded timestamp, so name order is age order
+        return sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def _trim(self):
+        for profile_id in self._ids()[:-self.ring_size or None]:
+            for suffix in (".json", ".pstats"):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[dict]:
+        """
+        Stored profiles, newest first.
+        """
+        entries = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, ".json")) as f:
+                    entries.append(json.load(f))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # trimmed while listing
+        return entries
+
+    def pstats_path(self, profile_id: str) -> Optional[str]:
+        # Only ids we listed ourselves, never a caller-built path
+        if profile_id not in self._ids():
+            return None
+        return self._path(profile_id, ".pstats")
+
+    def summary(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        path = self.pstats_path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+# Global instance
+request_profiler = RequestProfiler()
+
+class RequestProfilerMiddleware:
+    """
+    Wraps a selected request in cProfile and stores the result; the response
+    carries X-Profile-Id so the profile can be fetched afterwards.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        if not request_profiler._busy.acquire(blocking=False):
+            print(f"PROFILER: busy, not profiling {scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.now(timezone.utc)
+        profile_id = f"{int(started_at.timestamp() * 1000):015d}-{os.getpid()}-{next(_sequence)}"
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=[*message.get("headers", []), (b"x-profile-id", profile_id.encode())])
+            await send(message)
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profile.disable()
+                duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                # Failed requests are kept too; they are often the interesting ones
+                await asyncio.to_thread(request_profiler.save, profile_id, profile, {
+                    "id": profile_id,
+                    "created_at": started_at.isoformat(),
+                    "method": scope["method"],
+                    "route": route_label(scope),
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": duration_ms,
+                })
+                print(f"PROFILER: {scope['method']} {scope['path']} -> {profile_id} ({duration_ms} ms)")
+        finally:
+            request_profiler._busy.release()
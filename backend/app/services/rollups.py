@@ -0,0 +1,164 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.database import dialect_insert
+from app.db.models import CheckIn, DailyRollup
+
+def _nullable_min(current, incoming):
+    return case(
+        (incoming.is_(None), current),
+        (current.is_(None), incoming),
+        (incoming < current, incoming),
+        else_=current,
+    )
+
+
+def _nullable_max(current, incoming):
+    return case(
+        (incoming.is_(None), current),
+        (current.is_(None), incoming),
+        (incoming > current, incoming),
+        else_=current,
+    )
+
+
+def checkin_day(timestamp) -> date:
+    """
+    Calendar day a check-in belongs to (same bucketing as the raw timestamps).
+    """
+    if isinstance(timestamp, datetime):
+        return timestamp.date()
+    return datetime.fromisoformat(str(timestamp)).date()
+
+
+def _checkin_upsert(db, checkin: CheckIn):
+    values = {
+        "user_id": checkin.user_id,
+        "day": checkin_day(checkin.timestamp),
+        "count": 1,
+        "mood_sum": checkin.mood,
+        "mood_min": checkin.mood,
+        "mood_max": checkin.mood,
+        "energy_count": 1 if checkin.energy is not None else 0,
+        "energy_sum": checkin.energy or 0,
+        "energy_min": checkin.energy,
+        "energy_max": checkin.energy,
+        "sleep_count": 1 if checkin.sleep_hours is not None else 0,
+        "sleep_sum": checkin.sleep_hours or 0,
+        "sleep_min": checkin.sleep_hours,
+        "sleep_max": checkin.sleep_hours,
+    }
+
+    table = DailyRollup.__table__
+    stmt = dialect_insert(db)(table).values(**values)
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={
+            "count": table.c.count + new.count,
+            "mood_sum": table.c.mood_sum + new.mood_sum,
+            "mood_min": _nullable_min(table.c.mood_min, new.mood_min),
+            "mood_max": _nullable_max(table.c.mood_max, new.mood_max),
+            "energy_count": table.c.energy_count + new.energy_count,
+            "energy_sum": table.c.energy_sum + new.energy_sum,
+            "energy_min": _nullable_min(table.c.energy_min, new.energy_min),
+            "energy_max": _nullable_max(table.c.energy_max, new.energy_max),
+            "sleep_count": table.c.sleep_count + new.sleep_count,
+            "sleep_sum": table.c.sleep_sum + new.sleep_sum,
+            "sleep_min": _nullable_min(table.c.sleep_min, new.sleep_min),
+            "sleep_max": _nullable_max(table.c.sleep_max, new.sleep_max),
+        },
+    )
+    # The day's totals after this check-in, for incremental consumers (the forecast)
+    return stmt.returning(table.c.count, table.c.mood_sum)
+
+
+def apply_checkin(db: Session, checkin: CheckIn):
+    """
+    Folds a single check-in into its day's rollup row.
+    Runs as one upsert statement and does not commit, so the caller can keep it
+    in the same transaction as the check-in insert. Returns the day's (count, mood_sum).
+    """
+    return tuple(db.execute(_checkin_upsert(db, checkin)).one())
+
+
+async def apply_checkin_async(db: AsyncSession, checkin: CheckIn):
+    """
+    AsyncSession variant of apply_checkin (also leaves the commit to the caller).
+    """
+    return tuple((await db.execute(_checkin_upsert(db, checkin))).one())
+
+
+def _rollups_query(user_id: int, since: Optional[date] = None):
+    stmt = select(DailyRollup).where(DailyRollup.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(DailyRollup.day >= since)
+    return stmt.order_by(DailyRollup.day.asc())
+
+
+def get_rollups(db: Session, user_id: int, since: Optional[date] = None) -> List[DailyRollup]:
+    """
+    Returns the user's rollup rows (one per active day) in chronological order.
+    """
+    return list(db.execute(_rollups_query(user_id, since)).scalars())
+
+
+async def get_rollups_async(db: AsyncSession, user_id: int, since: Optional[date] = None) -> List[DailyRollup]:
+    return list((await db.execute(_rollups_query(user_id, since))).scalars())
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recomputes rollups from the raw check-ins (for existing data or repairs).
+    Returns the number of rollup rows written.
+    """
+    day_col = func.date(CheckIn.timestamp)
+    query = db.query(
+        CheckIn.user_id,
+        day_col,
+        func.count(CheckIn.id),
+        func.sum(CheckIn.mood),
+        func.min(CheckIn.mood),
+        func.max(CheckIn.mood),
+        func.count(CheckIn.energy),
+        func.coalesce(func.sum(CheckIn.energy), 0),
+        func.min(CheckIn.energy),
+        func.max(CheckIn.energy),
+        func.count(CheckIn.sleep_hours),
+        func.coalesce(func.sum(CheckIn.sleep_hours), 0),
+        func.min(CheckIn.sleep_hours),
+        func.max(CheckIn.sleep_hours),
+    )
+    delete_query = db.query(DailyRollup)
+    if user_id is not None:
+        query = query.filter(CheckIn.user_id == user_id)
+        delete_query = delete_query.filter(DailyRollup.user_id == user_id)
+
+    delete_query.delete(synchronize_session=False)
+
+    written = 0
+    for row in query.group_by(CheckIn.user_id, day_col):
+        db.add(DailyRollup(
+            user_id=row[0],
+            day=checkin_day(row[1]),
+            count=row[2],
+            mood_sum=row[3],
+            mood_min=row[4],
+            mood_max=row[5],
+            energy_count=row[6],
+            energy_sum=row[7],
+            energy_min=row[8],
+            energy_max=row[9],
+            sleep_count=row[10],
+            sleep_sum=row[11],
+            sleep_min=row[12],
+            sleep_max=row[13],
+        ))
+        written += 1
+
+    db.commit()
+    return written
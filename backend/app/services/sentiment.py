@@ -1,16 +1,29 @@
-POSITIVE_KEYWORDS = ["happy", "excited", "good", "great", "awesome", "better", "proud", "love", "yay", "bestie"]
-NEGATIVE_KEYWORDS = ["sad", "stressed", "anxious", "angry", "bad", "terrible", "worst", "unhappy", "depressed", "tired", "oouf", "uugh", "broken"]
+from typing import List, Sequence
+
+from app.services.lexicon import LexiconHits, NEGATIVE_KEYWORDS, POSITIVE_KEYWORDS
+
+def _sentiment(pos_count: int, neg_count: int) -> str:
+    if pos_count > neg_count:
+        return "positive"
+    elif neg_count > pos_count:
+        return "negative"
+    return "neutral"
+
+def sentiment_from_hits(hits: LexiconHits) -> str:
+    """
+    Sentiment from a lexicon scan the caller already made for other categories.
+    """
+    return _sentiment(hits.count("positive"), hits.count("negative"))
 
 def analyze_sentiment_lite(text: str) -> str:
     """
     Returns 'positive', 'negative', or 'neutral' based on simple keyword matching.
+    On its own, 23 substring tests are cheaper than a full lexicon scan.
     """
     text = (text or "").lower()
     pos_count = sum(1 for word in POSITIVE_KEYWORDS if word in text)
     neg_count = sum(1 for word in NEGATIVE_KEYWORDS if word in text)
-    
-    if pos_count > neg_count:
-        return "positive"
-    elif neg_count > pos_count:
-        return "negative"
-    return "neutral"
+    return _sentiment(pos_count, neg_count)
+
+def analyze_sentiment_batch(texts: Sequence[str]) -> List[str]:
+    return [analyze_sentiment_lite(text) for text in texts]
@@ -0,0 +1,257 @@
+"""
+Opt-in SQL profiler (SQL_PROFILER=true).
+
+While a profile is active, every statement's shape (whitespace collapsed,
+literals and IN lists folded) and duration are recorded. Per API request that
+gives the query count, total DB time, the slowest statements, and the shapes
+repeated often enough to look like an N+1. Statements slower than
+SQL_SLOW_QUERY_MS and requests with a likely N+1 go to a rotating log file.
+
+profile_queries() / assert_query_budget() work the same way around any block of
+code (scripts, check_query_budgets.py). Profiles nest, and an outer profile
+sees its inner ones' queries.
+"""
+import os
+import re
+import json
+import time
+import heapq
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import List
+
+from sqlalchemy import event
+
+from app.services.metrics import route_label
+
+# Off by default: no listeners, no middleware, no overhead
+SQL_PROFILER = os.getenv("SQL_PROFILER", "false").lower() == "true"
+# Statements at least this slow are written to the slow-query log
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Same statement shape this many times in one request -> likely N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Rotating slow-query log (JSON lines): path, size per file, rotated files kept
+SQL_SLOW_QUERY_LOG = os.getenv("SQL_SLOW_QUERY_LOG", "./slow_queries.log")
+SQL_SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SQL_SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SQL_SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SQL_SLOW_QUERY_LOG_BACKUPS", "3"))
+# Slowest statements kept per profile, and request profiles kept for /api/health/sql
+SLOWEST_PER_PROFILE = 5
+RECENT_PROFILES = 100
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Expanded IN lists differ in length per call: (?, ?, ?) / ($1, $2) / (%(id_1_1)s, ...)
+_IN_LIST = re.compile(r"\bIN \([^()]*\)", re.IGNORECASE)
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("IN (...)", shape)
+
+class QueryProfile:
+    """
+    Statements seen while the profile was active.
+    """
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes = Counter()
+        self._slowest = []  # min-heap of (seconds, seq, shape)
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            self.shapes[shape] += 1
+            entry = (seconds, self.queries, shape)
+            if len(self._slowest) < SLOWEST_PER_PROFILE:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    def slowest(self) -> List[dict]:
+        with self._lock:
+            ordered = sorted(self._slowest, reverse=True)
+        return [{"ms": round(seconds * 1000, 2), "statement": shape} for seconds, _, shape in ordered]
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> List[dict]:
+        """
+        Shapes executed at least `threshold` times: likely N+1.
+        """
+        with self._lock:
+            return [{"count": count, "statement": shape} for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def report(self) -> dict:
+        return {
+            "label": self.label,
+            "queries": self.queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "slowest": self.slowest(),
+            "n_plus_one": self.repeated(),
+        }
+
+# Every profile currently open in this context, outermost first
+_active: ContextVar[tuple] = ContextVar("sql_profiles", default=())
+
+@contextmanager
+def profile_queries(label: str = ""):
+    """
+    with profile_queries("backfill") as profile: ...; profile.report()
+    Needs install_sql_profiler() on the engines being used.
+    """
+    profile = QueryProfile(label)
+    token = _active.set(_active.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+@contextmanager
+def assert_query_budget(max_queries: int, label: str = "", allow_repeats: bool = False):
+    """
+    Fails with the statement breakdown when the block runs more than max_queries
+    statements, or (unless allow_repeats) repeats a statement shape N+1 style.
+    """
+    with profile_queries(label) as profile:
+        yield profile
+    problems = []
+    if profile.queries > max_queries:
+        problems.append(f"{profile.queries} queries > budget {max_queries}")
+    if not allow_repeats and profile.repeated():
+        problems.append("likely N+1")
+    if problems:
+        shapes = "\n".join(f"  {count:4}x {shape}" for shape, count in profile.shapes.most_common())
+        raise AssertionError(f"{label or 'block'}: {'; '.join(problems)}\n{shapes}")
+
+# --- slow-query log ---
+
+_slow_log = None
+_slow_log_lock = threading.Lock()
+
+def _slow_logger() -> logging.Logger:
+    global _slow_log
+    with _slow_log_lock:
+        if _slow_log is None:
+            logger = logging.getLogger("serene.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(
+                SQL_SLOW_QUERY_LOG, maxBytes=SQL_SLOW_QUERY_LOG_MAX_BYTES, backupCount=SQL_SLOW_QUERY_LOG_BACKUPS,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _slow_log = logger
+    return _slow_log
+
+def log_slow(kind: str, **fields):
+    # Statement shapes only: bound parameters can hold user text
+    entry = {"at": datetime.now(timezone.utc).isoformat(), "kind": kind, **fields}
+    _slow_logger().info(json.dumps(entry))
+
+# --- engine hooks ---
+
+_QUERY_STARTS = "serene_profiler_starts"
+_installed = set()
+
+def install_sql_profiler(engine, name: str):
+    """
+    Records every statement on `engine` (sync or async) into the active profiles
+    and logs the slow ones. Safe to call more than once.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _installed:
+        return
+    _installed.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_QUERY_STARTS, []).append(time.perf_counter())
+
+    def _finish(conn, statement: str):
+        starts = conn.info.get(_QUERY_STARTS)
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        profiles = _active.get()
+        if not profiles and seconds * 1000 < SQL_SLOW_QUERY_MS:
+            return
+        shape = statement_shape(statement)
+        for profile in profiles:
+            profile.record(shape, seconds)
+        if seconds * 1000 >= SQL_SLOW_QUERY_MS:
+            log_slow("statement", engine=name, ms=round(seconds * 1000, 2),
+                     request=profiles[0].label if profiles else None, statement=shape)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn, statement)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            _finish(context.connection, context.statement or "")
+
+# --- per request ---
+
+class SQLProfiler:
+    """
+    Recent request profiles, for /api/health/sql.
+    """
+    def __init__(self):
+        self.enabled = SQL_PROFILER
+        self._recent = deque(maxlen=RECENT_PROFILES)
+        self.requests = 0
+        self.flagged = 0
+
+    def finish(self, profile: QueryProfile):
+        report = profile.report()
+        self._recent.append(report)
+        self.requests += 1
+        if report["n_plus_one"]:
+            self.flagged += 1
+            print(f"SQL_PROFILER: likely N+1 in {profile.label}: "
+                  + "; ".join(f"{r['count']}x {r['statement'][:80]}" for r in report["n_plus_one"]))
+            log_slow("n_plus_one", request=profile.label, queries=report["queries"], repeated=report["n_plus_one"])
+
+    def snapshot(self) -> dict:
+        recent = list(self._recent)
+        return {
+            "enabled": self.enabled,
+            "requests_profiled": self.requests,
+            "requests_flagged": self.flagged,
+            "slow_query_ms": SQL_SLOW_QUERY_MS,
+            "slow_query_log": SQL_SLOW_QUERY_LOG,
+            "recent": recent[::-1],
+        }
+
+# Global instance
+sql_profiler = SQLProfiler()
+
+class SQLProfilerMiddleware:
+    """
+    One QueryProfile per API request, labelled with method and route template.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with profile_queries(f"{scope['method']} {scope['path']}") as profile:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profile.label = f"{scope['method']} {route_label(scope)}"
+                sql_profiler.finish(profile)
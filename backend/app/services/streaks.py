@@ -1,45 +1,252 @@
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import Date, Integer, case, cast, delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.db.models import CheckIn
+
+from app.db.database import dialect_insert
+from app.db.models import ActiveDay, CheckIn, StreakState, User, utcnow
+
+DEFAULT_TIMEZONE = "UTC"
+# Rows per INSERT when rebuilding a user's active days
+INSERT_BATCH = 500
+
+def normalize_timezone(name: Optional[str]) -> Optional[str]:
+    """
+    The IANA name if it is one zoneinfo knows, else None.
+    """
+    if not name:
+        return None
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return name
+
+def local_day(timestamp: datetime, tz_name: Optional[str]) -> date:
+    """
+    Calendar day of a (UTC) check-in timestamp in the user's timezone.
+    """
+    if timestamp.tzinfo is None:
+        # Stored timestamps are naive UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(ZoneInfo(tz_name or DEFAULT_TIMEZONE)).date()
+
+def local_today(tz_name: Optional[str]) -> date:
+    return datetime.now(ZoneInfo(tz_name or DEFAULT_TIMEZONE)).date()
+
+def _day_number(dialect_name: str):
+    # Consecutive days must map to consecutive integers
+    if dialect_name == "postgresql":
+        return ActiveDay.day - cast(literal("1970-01-01"), Date)
+    return cast(func.julianday(ActiveDay.day), Integer)
+
+def _islands_query(dialect_name: str, user_id: int):
+    """
+    Gaps-and-islands over the user's active days: day_number - row_number() is
+    constant within a run of consecutive days. Returns one row for the latest
+    island, with the longest island's length and end day alongside.
+    """
+    days = (
+        select(
+            ActiveDay.day.label("day"),
+            (_day_number(dialect_name) - func.row_number().over(order_by=ActiveDay.day)).label("grp"),
+        )
+        .where(ActiveDay.user_id == user_id)
+        .subquery()
+    )
+    islands = (
+        select(
+            func.min(days.c.day).label("start"),
+            func.max(days.c.day).label("end"),
+            func.count().label("length"),
+        )
+        .group_by(days.c.grp)
+        .subquery()
+    )
+    return (
+        select(
+            islands.c.start,
+            islands.c.end,
+            islands.c.length,
+            func.max(islands.c.length).over().label("longest"),
+            func.first_value(islands.c.end).over(
+                order_by=(islands.c.length.desc(), islands.c.end.desc())
+            ).label("longest_end"),
+        )
+        .order_by(islands.c.end.desc())
+        .limit(1)
+    )
+
+def _as_date(value) -> Optional[date]:
+    # SQLite hands back aggregates/window results over dates as ISO strings
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _state_values(row, tz_name: str) -> dict:
+    if row is None:
+        return {
+            "timezone": tz_name, "current_start": None, "current_end": None,
+            "current_length": 0, "longest_length": 0, "longest_end": None,
+        }
+    return {
+        "timezone": tz_name,
+        "current_start": _as_date(row.start),
+        "current_end": _as_date(row.end),
+        "current_length": row.length,
+        "longest_length": row.longest,
+        "longest_end": _as_date(row.longest_end),
+    }
+
+def _upsert_state(db, user_id: int, values: dict):
+    values = dict(values, updated_at=utcnow())
+    stmt = dialect_insert(db)(StreakState).values(user_id=user_id, **values)
+    return stmt.on_conflict_do_update(index_elements=["user_id"], set_=values)
+
+def _active_day_rows(user_id: int, timestamps: Iterable[datetime], tz_name: str):
+    days = {local_day(ts, tz_name) for ts in timestamps}
+    return [{"user_id": user_id, "day": d} for d in sorted(days)]
+
+def _checkin_timestamps(user_id: int):
+    return select(CheckIn.timestamp).where(CheckIn.user_id == user_id)
+
+def _extend_update(user_id: int, state: StreakState, day: date):
+    """
+    Guarded single-row update for a check-in on a day after the current streak's end:
+    either extends the streak (the next day) or starts a new one.
+    """
+    if state.current_end is not None and day == state.current_end + timedelta(days=1):
+        new_start, new_length = state.current_start, StreakState.current_length + 1
+    else:
+        new_start, new_length = day, literal(1)
+    guard = StreakState.current_end.is_(None) if state.current_end is None else StreakState.current_end == state.current_end
+    return (
+        update(StreakState)
+        .where(StreakState.user_id == user_id, StreakState.timezone == state.timezone, guard)
+        .values(
+            current_start=new_start,
+            current_end=day,
+            current_length=new_length,
+            longest_end=case((new_length >= StreakState.longest_length, day), else_=StreakState.longest_end),
+            longest_length=case((new_length > StreakState.longest_length, new_length), else_=StreakState.longest_length),
+            updated_at=utcnow(),
+        )
+    )
+
+def streak_payload(state: Optional[StreakState], tz_name: Optional[str]) -> dict:
+    """
+    The current streak counts only while its last day is today or yesterday
+    (in the user's timezone).
+    """
+    if state is None or state.current_end is None:
+        return {"streak": 0, "longest": 0}
+    yesterday = local_today(tz_name) - timedelta(days=1)
+    current = state.current_length if state.current_end >= yesterday else 0
+    return {"streak": current, "longest": state.longest_length}
+
+# --- sync (CLIs, batch recompute) ---
+
+def recompute_streak(db: Session, user_id: int, tz_name: Optional[str] = None) -> dict:
+    """
+    Rebuilds the user's active days from their check-ins and recomputes the
+    streak state. Commits.
+    """
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    rows = _active_day_rows(user_id, db.execute(_checkin_timestamps(user_id)).scalars(), tz_name)
+    db.execute(delete(ActiveDay).where(ActiveDay.user_id == user_id))
+    for i in range(0, len(rows), INSERT_BATCH):
+        db.execute(ActiveDay.__table__.insert(), rows[i:i + INSERT_BATCH])
+    island = db.execute(_islands_query(db.get_bind().dialect.name, user_id)).first()
+    values = _state_values(island, tz_name)
+    db.execute(_upsert_state(db, user_id, values))
+    db.commit()
+    return values
+
+def recompute_all_streaks(db: Session) -> int:
+    """
+    Batch mode: recompute every user's streak (e.g. after backfilling check-ins).
+    """
+    users = db.execute(select(User.id, User.timezone)).all()
+    for user_id, tz_name in users:
+        recompute_streak(db, user_id, normalize_timezone(tz_name))
+    return len(users)
 
 def get_current_streak(db: Session, user_id: int) -> int:
     """
     Calculates the current consecutive check-in streak for a user.
     """
-    # Get unique dates of check-ins for this user, ordered descending
-    checkin_dates = (
-        db.query(func.date(CheckIn.timestamp))
-        .filter(CheckIn.user_id == user_id)
-        .group_by(func.date(CheckIn.timestamp))
-        .order_by(func.date(CheckIn.timestamp).desc())
-        .all()
+    tz_name = normalize_timezone(db.scalar(select(User.timezone).where(User.id == user_id))) or DEFAULT_TIMEZONE
+    state = db.get(StreakState, user_id)
+    if state is None or state.timezone != tz_name:
+        recompute_streak(db, user_id, tz_name)
+        state = db.get(StreakState, user_id, populate_existing=True)
+    return streak_payload(state, tz_name)["streak"]
+
+# --- async (API) ---
+
+async def _load_state(db: AsyncSession, user_id: int) -> Optional[StreakState]:
+    return await db.scalar(
+        select(StreakState).where(StreakState.user_id == user_id).execution_options(populate_existing=True)
     )
-    
-    # Convert from Row objects to date objects
-    dates = [d[0] for d in checkin_dates]
-    if isinstance(dates[0], str):
-        dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in dates]
-
-    if not dates:
-        return 0
-
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-    
-    # If the last check-in was more than 1 day ago, the streak is broken
-    if dates[0] < yesterday:
-        return 0
-        
-    streak = 0
-    current_expected_date = dates[0]
-    
-    for d in dates:
-        if d == current_expected_date:
-            streak += 1
-            current_expected_date -= timedelta(days=1)
-        else:
-            # Streak broken
-            break
-            
-    return streak
+
+async def _refresh_state_async(db: AsyncSession, user_id: int, tz_name: str):
+    island = (await db.execute(_islands_query(db.get_bind().dialect.name, user_id))).first()
+    await db.execute(_upsert_state(db, user_id, _state_values(island, tz_name)))
+
+async def recompute_streak_async(db: AsyncSession, user_id: int, tz_name: Optional[str] = None):
+    """
+    Async version of recompute_streak. Does not commit.
+    """
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    timestamps = (await db.execute(_checkin_timestamps(user_id))).scalars()
+    rows = _active_day_rows(user_id, timestamps, tz_name)
+    await db.execute(delete(ActiveDay).where(ActiveDay.user_id == user_id))
+    for i in range(0, len(rows), INSERT_BATCH):
+        await db.execute(ActiveDay.__table__.insert(), rows[i:i + INSERT_BATCH])
+    await _refresh_state_async(db, user_id, tz_name)
+
+async def record_checkin_streak(db: AsyncSession, user_id: int, tz_name: Optional[str], timestamp: datetime):
+    """
+    Updates the streak state for a new check-in (runs in the check-in's transaction).
+    Usually one insert plus one single-row update; a back-dated day re-runs the
+    islands query, and a missing or other-timezone state is rebuilt.
+    """
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    state = await _load_state(db, user_id)
+    if state is None or state.timezone != tz_name:
+        # Also covers the check-in being inserted in this transaction
+        await recompute_streak_async(db, user_id, tz_name)
+        return
+
+    day = local_day(timestamp, tz_name)
+    inserted = await db.execute(
+        dialect_insert(db)(ActiveDay)
+        .values(user_id=user_id, day=day)
+        .on_conflict_do_nothing(index_elements=["user_id", "day"])
+        .returning(ActiveDay.day)
+    )
+    if inserted.first() is None:
+        # Day already counted
+        return
+
+    if state.current_end is None or day > state.current_end:
+        result = await db.execute(_extend_update(user_id, state, day))
+        if result.rowcount:
+            return
+    # A back-dated day (may join islands) or a concurrent update
+    await _refresh_state_async(db, user_id, tz_name)
+
+async def get_streak_async(db: AsyncSession, user_id: int, tz_name: Optional[str]) -> dict:
+    """
+    Current and longest streak from the stored state (a single-row read).
+    """
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    state = await _load_state(db, user_id)
+    if state is None or state.timezone != tz_name:
+        await recompute_streak_async(db, user_id, tz_name)
+        await db.commit()
+        state = await _load_state(db, user_id)
+    return streak_payload(state, tz_name)
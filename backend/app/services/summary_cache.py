@@ -0,0 +1,152 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import JournalSummaryCache, utcnow
+
+# Entries older than this are treated as misses and dropped
+JOURNAL_CACHE_TTL_SECONDS = int(os.getenv("JOURNAL_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Size of the in-process LRU in front of the DB table
+JOURNAL_CACHE_MEMORY_ENTRIES = int(os.getenv("JOURNAL_CACHE_MEMORY_ENTRIES", "1024"))
+# Rows kept in the DB table; the oldest are pruned past this
+JOURNAL_CACHE_MAX_ROWS = int(os.getenv("JOURNAL_CACHE_MAX_ROWS", "50000"))
+# How many writes between DB prunes
+PRUNE_EVERY = 100
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def cache_key(content: str, prompt_version: str, model_id: str) -> str:
+    normalized = _WHITESPACE.sub(" ", content).strip()
+    raw = "\x1f".join([normalized, prompt_version, model_id])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """
+    Journal summaries keyed by content hash: an in-process LRU backed by a DB table.
+    """
+    def __init__(self, ttl_seconds=JOURNAL_CACHE_TTL_SECONDS, memory_entries=JOURNAL_CACHE_MEMORY_ENTRIES, max_rows=JOURNAL_CACHE_MAX_ROWS):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (created_at, result)
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _expired(self, created_at: datetime) -> bool:
+        return datetime.now(timezone.utc) - _as_utc(created_at) > self.ttl
+
+    def _remember(self, key: str, created_at: datetime, result: dict):
+        with self._lock:
+            self._memory[key] = (created_at, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_memory(self, key: str) -> Optional[dict]:
+        """
+        In-process lookup only (no I/O), safe to call on the event loop.
+        """
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            created_at, result = item
+            if self._expired(created_at):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return dict(result)
+
+    def get(self, db: Optional[Session], key: str) -> Optional[dict]:
+        result = self.get_memory(key)
+        if result is not None:
+            return result
+        if db is not None:
+            row = db.get(JournalSummaryCache, key)
+            if row is not None:
+                if self._expired(row.created_at):
+                    db.delete(row)
+                    db.commit()
+                else:
+                    result = {"summary": row.summary, "advice": row.advice}
+                    self._remember(key, row.created_at, result)
+                    with self._lock:
+                        self.db_hits += 1
+                    return dict(result)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, db: Optional[Session], key: str, result: dict):
+        now = utcnow()
+        result = {"summary": result.get("summary"), "advice": result.get("advice")}
+        self._remember(key, now, result)
+        if db is None:
+            return
+        try:
+            db.merge(JournalSummaryCache(key=key, summary=result["summary"], advice=result["advice"], created_at=now))
+            db.commit()
+        except IntegrityError:
+            # Another request cached the same content first
+            db.rollback()
+            return
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % PRUNE_EVERY == 0
+        if should_prune:
+            self.prune(db)
+
+    def prune(self, db: Session) -> int:
+        """
+        Drops expired rows, then the oldest rows beyond max_rows.
+        """
+        cutoff = utcnow() - self.ttl
+        removed = (
+            db.query(JournalSummaryCache)
+            .filter(JournalSummaryCache.created_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        overflow = db.query(JournalSummaryCache).count() - self.max_rows
+        if overflow > 0:
+            oldest = (
+                select(JournalSummaryCache.key)
+                .order_by(JournalSummaryCache.created_at.asc())
+                .limit(overflow)
+            )
+            removed += (
+                db.query(JournalSummaryCache)
+                .filter(JournalSummaryCache.key.in_(oldest))
+                .delete(synchronize_session=False)
+            )
+        db.commit()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+# Global instance
+summary_cache = SummaryCache()
@@ -0,0 +1,103 @@
+"""
+Backfills sentiment_score / topics on existing check-ins, journal entries and
+user chat messages.
+
+Rows still missing an annotation are streamed through a server-side cursor in
+chunks. Each chunk is scored in a worker process and written back with one
+bulk UPDATE, committed per chunk, so an interrupted run picks up where it
+stopped: only rows with a NULL sentiment_score are read again.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import func, select, update
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.annotations import SOURCES, annotate_many
+
+def score_chunk(chunk):
+    """
+    Worker: [(id, text), ...] -> bulk-update parameter rows.
+    """
+    annotations = annotate_many([text for _, text in chunk])
+    return [dict(values, id=row_id) for (row_id, _), values in zip(chunk, annotations)]
+
+def _pending(name: str):
+    model, text, extra = SOURCES[name]
+    stmt = select(model.id, text).where(model.sentiment_score.is_(None))
+    if extra is not None:
+        stmt = stmt.where(extra)
+    return stmt
+
+def backfill_source(name: str, pool: ProcessPoolExecutor, chunk_size: int, max_in_flight: int) -> int:
+    model = SOURCES[name][0]
+    writer = SessionLocal()
+    done = 0
+    started = time.perf_counter()
+
+    def write(future):
+        nonlocal done
+        rows = future.result()
+        writer.execute(update(model), rows)
+        writer.commit()
+        done += len(rows)
+        print(f"   {name}: {done} rows annotated ({done / (time.perf_counter() - started):.0f}/s)")
+
+    try:
+        with engine.connect() as reader:
+            count_stmt = select(func.count()).select_from(_pending(name).subquery())
+            print(f"📝 {name}: {reader.scalar(count_stmt)} rows to annotate")
+            result = reader.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                _pending(name).order_by(model.id)
+            )
+            in_flight = deque()
+            for partition in result.partitions():
+                in_flight.append(pool.submit(score_chunk, [tuple(row) for row in partition]))
+                # Bounded so memory stays flat however large the table is
+                while len(in_flight) >= max_in_flight:
+                    write(in_flight.popleft())
+            while in_flight:
+                write(in_flight.popleft())
+    finally:
+        writer.close()
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", choices=["all", *SOURCES], default="all")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--reset", action="store_true", help="Clear existing annotations first (e.g. after changing the lexicon)")
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    sources = list(SOURCES) if args.source == "all" else [args.source]
+
+    if args.reset:
+        db = SessionLocal()
+        try:
+            for name in sources:
+                model = SOURCES[name][0]
+                db.execute(update(model).values(sentiment_score=None, topics=None))
+            db.commit()
+        finally:
+            db.close()
+        print("🧹 Cleared existing annotations.")
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for name in sources:
+            total += backfill_source(name, pool, args.chunk_size, max_in_flight=args.workers * 2)
+    print(f"✅ Annotated {total} rows.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.rollups import rebuild_rollups
+from app.services.regression import reset_forecast_state
+
+def backfill():
+    print("Applying pending migrations...")
+    run_migrations(engine, verbose=True)
+
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db)
+        print(f"✅ Rebuilt {written} daily rollups from raw check-ins.")
+        # Forecast statistics are derived from the rollups; rebuilt on next read
+        reset_forecast_state(db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,222 @@
+"""
+In-process endpoint benchmark.
+
+Drives the FastAPI app through httpx's ASGI transport (no network, no server)
+with a fixed number of concurrent clients per endpoint, spread over many
+users. Gemini is the synthetic backend with configurable latency. Reports
+p50/p95/p99 latency and throughput per endpoint and saves them as JSON
+(bench_results/<commit>.json by default) so runs can be compared.
+
+    python bench_api.py --seed-users 200 --seed-days 120     # fresh temp DB
+    python bench_api.py --endpoints forecast,streak --concurrency 32
+    python bench_api.py --compare bench_results/abc1234.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+BENCH_USER_HEADER = "X-Bench-User"
+
+# name -> (method, path, json body or None)
+SCENARIOS = {
+    "checkin_post": ("POST", "/api/checkins/", lambda rng: {
+        "mood": rng.randint(1, 10), "energy": rng.randint(1, 10), "sleep_hours": round(rng.uniform(4, 9), 1),
+        "text": rng.choice(["so stressed about work", "great day with my partner", "tired", None]),
+    }),
+    "forecast": ("GET", "/api/analytics/mood-forecast", None),
+    "streak": ("GET", "/api/analytics/streak", None),
+    "insights_latest": ("GET", "/api/analytics/insights/latest", None),
+    "insights_history": ("GET", "/api/analytics/insights/history?limit=20", None),
+    "patterns": ("GET", "/api/analytics/patterns", None),
+    "topics_weekly": ("GET", "/api/analytics/topics/weekly", None),
+    "sentiment_weekly": ("GET", "/api/analytics/sentiment/weekly", None),
+    "weekly_report": ("GET", "/api/analytics/reports/weekly", None),
+    "journal_history": ("GET", "/api/journal/?limit=50&fields=list", None),
+    "journal_post": ("POST", "/api/journal/", lambda rng: {"content": "Long day. " * rng.randint(5, 40)}),
+    "chat_message": ("POST", "/api/chat/message", lambda rng: {"message": rng.choice(["I need advice about my boss", "feeling lonely", "can't sleep"])}),
+    "health_db": ("GET", "/api/health/db", None),
+}
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Linear interpolation between closest ranks (numpy's default)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+async def run_scenario(client, name: str, users: list, requests: int, concurrency: int, rng: random.Random) -> dict:
+    method, path, body = SCENARIOS[name]
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(users[i % len(users)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                clerk_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            response = await client.request(
+                method, path,
+                json=body(rng) if body else None,
+                headers={BENCH_USER_HEADER: clerk_id, "Authorization": "Bearer bench"},
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+async def bench(args) -> dict:
+    import httpx
+    from fastapi import Header
+    from sqlalchemy import select
+
+    from app.main import app, api_app
+    from app.db.database import SessionLocal
+    from app.db.models import User
+    from app.services.ai_service import gemini_wrapper
+    from app.services.clerk_auth import get_current_user, resolve_user
+    from app.services.clustering import pattern_model
+    from app.services.gemini_backends import SyntheticClient
+
+    gemini_wrapper.client = SyntheticClient(
+        latency_ms=args.gemini_latency, jitter_ms=args.gemini_jitter, chunk_ms=args.gemini_chunk_ms,
+        quota_rate=args.gemini_quota_rate, seed=args.seed,
+    )
+
+    async def bench_current_user(x_bench_user: str = Header(...)):
+        # Any user by clerk id, without Clerk tokens
+        return await resolve_user(x_bench_user)
+
+    api_app.dependency_overrides[get_current_user] = bench_current_user
+
+    db = SessionLocal()
+    try:
+        users = list(db.execute(select(User.clerk_id).order_by(User.id).limit(args.users)).scalars())
+    finally:
+        db.close()
+    if not users:
+        raise SystemExit("❌ No users in the database; run seed_db.py or pass --seed-users")
+
+    rng = random.Random(args.seed)
+    rng.shuffle(users)
+    results = {}
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    async with app.router.lifespan_context(app):
+        if pattern_model._refit_task is not None:
+            # Don't measure while the first pattern fit is running
+            await pattern_model._refit_task
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.endpoints:
+                # Warm-up (caches, lazily built state) is not measured
+                with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+                    await run_scenario(client, name, users, min(len(users), args.concurrency), args.concurrency, rng)
+                    results[name] = await run_scenario(client, name, users, args.requests, args.concurrency, rng)
+                r = results[name]
+                print(f"  {name:18} p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  p99 {r['p99_ms']:8.1f} ms  "
+                      f"{r['throughput_rps']:8.1f} req/s  errors {r['errors']}")
+    api_app.dependency_overrides.pop(get_current_user, None)
+    return results
+
+def git_commit() -> dict:
+    def git(*cmd):
+        return subprocess.run(["git", *cmd], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nvs {previous.get('commit')} ({previous_path}):")
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        def delta(key):
+            return (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        print(f"  {name:18} p50 {delta('p50_ms'):+6.1f}%  p95 {delta('p95_ms'):+6.1f}%  p99 {delta('p99_ms'):+6.1f}%  "
+              f"throughput {delta('throughput_rps'):+6.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=200, help="Distinct users the requests are spread over")
+    parser.add_argument("--gemini-latency", type=float, default=300, help="Synthetic Gemini latency (ms)")
+    parser.add_argument("--gemini-jitter", type=float, default=100, help="± uniform jitter on the synthetic latency (ms)")
+    parser.add_argument("--gemini-chunk-ms", type=float, default=40, help="Delay between streamed chunks (ms)")
+    parser.add_argument("--gemini-quota-rate", type=float, default=0.0, help="Share of Gemini calls answered with a 429")
+    parser.add_argument("--seed-users", type=int, default=0, help="Benchmark a fresh temp DB seeded with this many users")
+    parser.add_argument("--seed-days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Results file (default bench_results/<commit>.json)")
+    parser.add_argument("--compare", help="Previous results file to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's own request logging")
+    args = parser.parse_args()
+    args.endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in args.endpoints if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(unknown)}")
+
+    if args.seed_users:
+        # Must happen before anything imports app.db
+        workdir = tempfile.mkdtemp(prefix="serene-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        os.environ["CLUSTER_MODEL_PATH"] = os.path.join(workdir, "pattern_model.joblib")
+        print(f"🌱 Seeding {args.seed_users} users x {args.seed_days} days into {workdir}...")
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_db.py"),
+                        "--users", str(args.seed_users), "--days", str(args.seed_days), "--seed", str(args.seed)],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    print(f"⏱️  {args.requests} requests x {len(args.endpoints)} endpoints, concurrency {args.concurrency}, "
+          f"synthetic Gemini {args.gemini_latency:.0f}±{args.gemini_jitter:.0f} ms")
+    results = asyncio.run(bench(args))
+
+    report = {
+        **git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "results": results,
+    }
+    output = args.output or os.path.join("bench_results", f"{report['commit']}{'-dirty' if report['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
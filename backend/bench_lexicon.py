@@ -0,0 +1,149 @@
+"""
+Micro-benchmark for the compiled lexicon matcher.
+
+Compares the previous keyword scans (one substring test per sentiment keyword,
+a regex per insights topic, the chat fallback's `any(word in text ...)` loops)
+with the single-pass matcher on a generated corpus, after checking that both
+produce the same results for every text.
+"""
+import os
+import re
+import sys
+import random
+import argparse
+import timeit
+from types import SimpleNamespace
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.services import lexicon as lex
+from app.services.insights import analyze_checkin, analyze_checkins
+from app.services.sentiment import analyze_sentiment_batch, analyze_sentiment_lite, sentiment_from_hits
+
+TOPICS = {
+    "work": ["work", "job", "project", "boss", "deadline", "career"],
+    "academic": ["exam", "study", "school", "grade", "test", "homework"],
+    "social": ["lonely", "alone", "isolated", "sad", "miss"],
+    "financial": ["money", "debt", "rent", "bill", "expensive", "cost"],
+    "health": ["sick", "pain", "headache", "tired", "body"],
+}
+CHAT_TOPICS = {
+    "chat_relationship": ["fight", "partner", "breakup", "relationship"],
+    "chat_work": ["work", "job", "boss", "deadline"],
+    "chat_sleep": ["sleep", "tired", "awake"],
+}
+FILLER = ("today was a long day and i felt kind of off, then we went out for dinner "
+          "and talked about everything that happened this week with the family").split()
+
+# --- previous implementations (reference) ---
+
+def legacy_sentiment(text):
+    text = (text or "").lower()
+    pos_count = sum(1 for word in lex.POSITIVE_KEYWORDS if word in text)
+    neg_count = sum(1 for word in lex.NEGATIVE_KEYWORDS if word in text)
+    if pos_count > neg_count:
+        return "positive"
+    elif neg_count > pos_count:
+        return "negative"
+    return "neutral"
+
+def legacy_contains_word(text, words):
+    pattern = r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b'
+    return bool(re.search(pattern, text))
+
+def legacy_topics(text, mood):
+    """
+    The branch analyze_checkin used to pick (its regex calls, in order).
+    """
+    text = (text or "").lower()
+    if legacy_contains_word(text, lex.RELATIONSHIP_CRISES):
+        return "relationship"
+    if legacy_contains_word(text, lex.RELATIONSHIP_ENTITIES):
+        if legacy_contains_word(text, lex.CONFLICT_INDICATORS) or mood <= 4:
+            return "relationship"
+    for topic, words in TOPICS.items():
+        if legacy_contains_word(text, words):
+            return topic
+    return None
+
+def legacy_chat_topic(text):
+    text = text.lower()
+    for topic, words in CHAT_TOPICS.items():
+        if any(word in text for word in words):
+            return topic
+    return legacy_sentiment(text)
+
+# --- equivalents on top of the matcher ---
+
+def new_topics(hits, mood):
+    if hits.has("relationship_crisis"):
+        return "relationship"
+    if hits.has("relationship_entity") and (hits.has("conflict") or mood <= 4):
+        return "relationship"
+    for topic in TOPICS:
+        if hits.has(topic):
+            return topic
+    return None
+
+def new_chat_topic(text):
+    hits = lex.lexicon.scan(text)
+    for topic in CHAT_TOPICS:
+        if hits.has(topic):
+            return topic
+    return analyze_sentiment_lite(text)
+
+def corpus(size, seed):
+    rng = random.Random(seed)
+    vocabulary = sorted({w for _, words in lex.CATEGORIES.values() for w in words})
+    # Near misses for the whole-word topics: "next", "bodyguard", "Work!", "unhappy"...
+    tricky = ["next", "bodyguard", "texture", "Work!", "WORKING", "unhappy", "sadness", "ex-boyfriend", "broken-up", "(rent)"]
+    texts = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(5, 60))]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randint(0, len(words)), rng.choice(vocabulary + tricky))
+        texts.append(" ".join(words))
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = corpus(args.texts, args.seed)
+    moods = [random.Random(args.seed + i).randint(1, 10) for i in range(len(texts))]
+    checkins = [SimpleNamespace(text=t, mood=m, sleep_hours=None, energy=None) for t, m in zip(texts, moods)]
+
+    # Same answers first
+    mismatches = 0
+    batch_sentiment = analyze_sentiment_batch(texts)
+    batch_insights = analyze_checkins(checkins)
+    for text, mood, checkin, sentiment, insight in zip(texts, moods, checkins, batch_sentiment, batch_insights):
+        hits = lex.lexicon.scan(text)
+        if legacy_sentiment(text) != analyze_sentiment_lite(text) or sentiment != sentiment_from_hits(hits):
+            mismatches += 1
+        elif legacy_topics(text, mood) != new_topics(hits, mood) or insight != analyze_checkin(checkin):
+            mismatches += 1
+        elif legacy_chat_topic(text) != new_chat_topic(text):
+            mismatches += 1
+    if mismatches:
+        print(f"❌ {mismatches} text(s) classified differently")
+        return 1
+    print(f"✅ {len(texts)} texts: identical sentiment, insight topics and chat topics")
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=1, repeat=args.repeat))
+
+    legacy_all = best(lambda: [(legacy_sentiment(t), legacy_topics(t, m), legacy_chat_topic(t)) for t, m in zip(texts, moods)])
+    single_all = best(lambda: [lex.lexicon.scan(t) for t in texts])
+
+    print(f"\nPer text (sentiment + insights + chat topics), {len(texts)} texts, best of {args.repeat}:")
+    print(f"  previous scans        {legacy_all * 1e6 / len(texts):8.1f} µs")
+    print(f"  lexicon.scan          {single_all * 1e6 / len(texts):8.1f} µs  ({legacy_all / single_all:.1f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Checks that the incremental mood forecast matches the previous scikit-learn fit.
+
+Replays a randomized history (several check-ins a day, gaps, back-dated entries)
+through the real /api/checkins endpoint against a throwaway SQLite database,
+sliding the 30-day window one day at a time. After every day it compares the
+stored sufficient statistics and the /api/analytics/mood-forecast response with
+sklearn's LinearRegression fitted on the same daily averages.
+"""
+import os
+import sys
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Use a scratch database; must be set before the app is imported
+_tmpdir = tempfile.mkdtemp(prefix="serene-forecast-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'forecast.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LinearRegression
+
+from app.main import app
+from app.db.database import SessionLocal
+from app.db.models import MoodForecastState, User
+from app.services import regression
+from app.services.rollups import get_rollups
+
+HEADERS = {"Authorization": "Bearer mock_bestie_token"}
+SIM_DAYS = 75
+TOLERANCE = 1e-9
+
+def sklearn_reference(daily_averages):
+    X = np.arange(len(daily_averages)).reshape(-1, 1)
+    y = np.array(daily_averages)
+    model = LinearRegression().fit(X, y)
+    return {
+        "slope": float(model.coef_[0]),
+        "r2": float(model.score(X, y)),
+        "next": float(model.predict(np.array([[len(daily_averages)]]))[0]),
+    }
+
+def main(seed: int = 7) -> int:
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).date() - timedelta(days=SIM_DAYS)
+    failures = 0
+    compared = 0
+
+    with TestClient(app) as client:
+        for offset in range(SIM_DAYS):
+            today = start + timedelta(days=offset)
+            # Pretend "now" is `today` for the forecast window
+            regression._cutoff = lambda days, today=today: today - timedelta(days=days)
+
+            posts = []
+            if rng.random() > 0.25:  # leave some days empty
+                posts += [today] * rng.randint(1, 3)
+            if offset > 5 and rng.random() < 0.15:  # back-dated entry
+                posts.append(today - timedelta(days=rng.randint(1, 5)))
+            for day in posts:
+                ts = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(6, 22))
+                response = client.post("/api/checkins/", json={"mood": rng.randint(1, 10), "timestamp": ts.isoformat()}, headers=HEADERS)
+                assert response.status_code == 200, response.text
+
+            response = client.get("/api/analytics/mood-forecast", headers=HEADERS)
+
+            db = SessionLocal()
+            try:
+                user = db.query(User).filter(User.clerk_id == "user_2test_bestie_mock").one()
+                rollups = get_rollups(db, user.id, since=regression._cutoff(regression.FORECAST_WINDOW_DAYS))
+                daily = [r.mood_sum / r.count for r in rollups]
+                state = db.get(MoodForecastState, user.id)
+            finally:
+                db.close()
+
+            if len(daily) < regression.MIN_ACTIVE_DAYS:
+                if response.status_code != 400:
+                    print(f"❌ {today}: expected 400 with {len(daily)} active days, got {response.status_code}")
+                    failures += 1
+                continue
+
+            expected = sklearn_reference(daily)
+            fit = regression.fit_from_stats(state.n, state.sum_y, state.sum_y2, state.sum_xy)
+            body = response.json()
+            problems = []
+            if state.n != len(daily):
+                problems.append(f"n {state.n} != {len(daily)}")
+            if abs(fit["slope"] - expected["slope"]) > TOLERANCE:
+                problems.append(f"slope {fit['slope']} != {expected['slope']}")
+            if abs(fit["r2"] - expected["r2"]) > TOLERANCE:
+                problems.append(f"r2 {fit['r2']} != {expected['r2']}")
+            if abs(fit["intercept"] + fit["slope"] * state.n - expected["next"]) > TOLERANCE:
+                problems.append("next-day prediction differs")
+            if body["trend_slope"] != round(expected["slope"], 3) or body["num_active_days"] != len(daily):
+                problems.append(f"response {body['trend_slope']} / {body['num_active_days']} differs")
+            if body["num_points"] != sum(r.count for r in rollups):
+                problems.append("num_points differs")
+
+            compared += 1
+            if problems:
+                failures += 1
+                print(f"❌ {today}: " + "; ".join(problems))
+
+    print(f"\nCompared {compared} days against sklearn: {failures} mismatch(es).")
+    print("✅ Incremental forecast matches sklearn." if not failures else "❌ Forecast mismatch.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
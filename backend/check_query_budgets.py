@@ -0,0 +1,126 @@
+"""
+Checks that each API endpoint stays within its SQL query budget and doesn't
+repeat a statement N+1 style.
+
+Every scenario from bench_api.py is sent once to warm up and once measured,
+in-process, as the mock user, with the synthetic Gemini backend. Exits 1 if any
+endpoint is over budget, so it can run in CI next to the app:
+
+    python check_query_budgets.py                   # DATABASE_URL
+    python check_query_budgets.py --seed-users 20   # fresh temp DB
+    python check_query_budgets.py --show            # print the counts, don't enforce
+
+Run it against a seeded Postgres DATABASE_URL too: only asyncpg rejects
+tz-aware datetimes bound to the TIMESTAMP WITHOUT TIME ZONE columns.
+"""
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from bench_api import BENCH_USER_HEADER, SCENARIOS
+
+# Statements allowed per request. Raise a budget only together with the change
+# that needs the extra query.
+QUERY_BUDGETS = {
+    "checkin_post": 7,
+    "forecast": 1,
+    "streak": 1,
+    "insights_latest": 1,
+    "insights_history": 1,
+    "patterns": 2,
+    "topics_weekly": 1,
+    "sentiment_weekly": 1,
+    "weekly_report": 2,
+    "journal_history": 1,
+    "journal_post": 3,
+    "chat_message": 4,
+    "health_db": 0,
+}
+
+async def check(args) -> list:
+    import random
+    import httpx
+    from fastapi import Header
+
+    from app.main import app, api_app
+    from app.db.async_database import async_engine
+    from app.db.database import engine
+    from app.services.ai_service import gemini_wrapper
+    from app.services.clerk_auth import get_current_user, resolve_user
+    from app.services.gemini_backends import SyntheticClient
+    from app.services.sql_profiler import assert_query_budget, install_sql_profiler
+    from seed_db import MOCK_CLERK_ID
+
+    install_sql_profiler(async_engine, "api")
+    install_sql_profiler(engine, "sync")
+    gemini_wrapper.client = SyntheticClient(latency_ms=0, jitter_ms=0, chunk_ms=0)
+
+    async def budget_user(x_bench_user: str = Header(MOCK_CLERK_ID)):
+        return await resolve_user(x_bench_user)
+
+    api_app.dependency_overrides[get_current_user] = budget_user
+    rng = random.Random(0)
+    failures = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+            for name in args.endpoints:
+                method, path, body = SCENARIOS[name]
+
+                async def send():
+                    return await client.request(method, path, json=body(rng) if body else None,
+                                                headers={BENCH_USER_HEADER: MOCK_CLERK_ID})
+
+                # Lazily created state (user row, caches) is not part of the budget
+                await send()
+                budget = QUERY_BUDGETS.get(name, 0)
+                try:
+                    with assert_query_budget(budget, name) as profile:
+                        response = await send()
+                except AssertionError as e:
+                    if args.show:
+                        print(f"  {name:18} {profile.queries:3} queries (budget {budget})  ⚠️")
+                    else:
+                        failures.append(str(e))
+                        print(f"❌ {e}")
+                    continue
+                status = "" if response.status_code < 400 else f"  (HTTP {response.status_code})"
+                print(f"  {name:18} {profile.queries:3} queries (budget {budget}){status}")
+    api_app.dependency_overrides.pop(get_current_user, None)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed-users", type=int, default=0, help="Check against a fresh temp DB seeded with this many users")
+    parser.add_argument("--seed-days", type=int, default=60)
+    parser.add_argument("--show", action="store_true", help="Only report query counts")
+    args = parser.parse_args()
+    args.endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+
+    if args.seed_users:
+        # Must happen before anything imports app.db
+        workdir = tempfile.mkdtemp(prefix="serene-budget-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'budget.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        os.environ["CLUSTER_MODEL_PATH"] = os.path.join(workdir, "pattern_model.joblib")
+        print(f"🌱 Seeding {args.seed_users} users x {args.seed_days} days into {workdir}...")
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_db.py"),
+                        "--users", str(args.seed_users), "--days", str(args.seed_days)],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    failures = asyncio.run(check(args))
+    if failures:
+        print(f"❌ {len(failures)} endpoint(s) over their query budget")
+        return 1
+    print("✅ All endpoints within their query budgets")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
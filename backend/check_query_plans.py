@@ -0,0 +1,91 @@
+"""
+Asserts that every hot per-user query is served by an index.
+
+Runs EXPLAIN (Postgres) / EXPLAIN QUERY PLAN (SQLite) against DATABASE_URL and
+exits non-zero if any query falls back to a full table scan or an extra sort.
+"""
+import os
+import sys
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import select, text
+
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.db.models import ActiveDay, ChatMessage, CheckIn, DailyRollup, JournalEntry, JournalJob
+
+USER_ID = 1
+
+def hot_queries():
+    """
+    (name, table, statement) for the per-request queries that must stay indexed.
+    """
+    return [
+        ("chat history (ChatService)", "chat_messages",
+            select(ChatMessage).where(ChatMessage.user_id == USER_ID)
+            .order_by(ChatMessage.timestamp.desc()).limit(10)),
+        ("journal context (ChatService)", "journal_entries",
+            select(JournalEntry).where(JournalEntry.user_id == USER_ID)
+            .order_by(JournalEntry.timestamp.desc()).limit(3)),
+        ("latest check-in (/insights/latest)", "checkins",
+            select(CheckIn).where(CheckIn.user_id == USER_ID)
+            .order_by(CheckIn.timestamp.desc()).limit(1)),
+        ("forecast/report window (daily_rollups)", "daily_rollups",
+            select(DailyRollup).where(DailyRollup.user_id == USER_ID)
+            .order_by(DailyRollup.day.asc())),
+        ("streak islands (user_active_days)", "user_active_days",
+            select(ActiveDay.day).where(ActiveDay.user_id == USER_ID)
+            .order_by(ActiveDay.day.asc())),
+        ("history page: journal branch", "journal_entries",
+            select(JournalEntry.id, JournalEntry.timestamp).where(JournalEntry.user_id == USER_ID)
+            .order_by(JournalEntry.timestamp.desc(), JournalEntry.id.desc()).limit(51)),
+        ("history page: chat branch", "chat_messages",
+            select(ChatMessage.id, ChatMessage.timestamp).where(ChatMessage.user_id == USER_ID)
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(51)),
+        ("journal job claim", "journal_jobs",
+            select(JournalJob).where(JournalJob.status == "pending")
+            .order_by(JournalJob.next_run_at.asc()).limit(1)),
+    ]
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+def check_sqlite(conn, name, table, stmt):
+    plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + _sql(stmt)))]
+    problems = []
+    for line in plan:
+        # 'SCAN <table>' without USING means a full table scan
+        if line.startswith(f"SCAN {table}") and "USING" not in line:
+            problems.append(line)
+    # An ORDER BY the index can't serve shows up as a temp b-tree sort
+    if any("TEMP B-TREE FOR ORDER BY" in line for line in plan):
+        problems.append("sort not served by an index")
+    return plan, problems
+
+def check_postgres(conn, name, table, stmt):
+    # Force the planner to show whether an index *can* serve the query on small tables
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = [row[0] for row in conn.execute(text("EXPLAIN " + _sql(stmt)))]
+    problems = [line for line in plan if f"Seq Scan on {table}" in line]
+    return plan, problems
+
+def main() -> int:
+    run_migrations(engine)
+    check = check_postgres if engine.dialect.name == "postgresql" else check_sqlite
+    failures = 0
+    with engine.begin() as conn:
+        for name, table, stmt in hot_queries():
+            plan, problems = check(conn, name, table, stmt)
+            status = "✅" if not problems else "❌"
+            print(f"{status} {name}")
+            for line in plan:
+                print(f"     {line}")
+            if problems:
+                failures += 1
+    print(f"\n{failures} query plan(s) without index support." if failures else "\nAll hot queries use an index.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
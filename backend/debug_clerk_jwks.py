@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import asyncio
+import httpx
+from jose import jwt, jwk
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Add the app directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.services.clerk_auth import JwksCache, VerifiedTokenCache, verify_clerk_token
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_jwk = jwk.construct(pem, "RS256").public_key().to_dict()
+    public_jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return pem, public_jwk
+
+async def debug_jwks():
+    old_pem, old_jwk = make_key("key-1")
+    new_pem, new_jwk = make_key("key-2")
+    served = {"keys": [old_jwk]}
+    fetches = {"n": 0}
+
+    # Local stand-in for Clerk's /.well-known/jwks.json
+    def handler(request):
+        fetches["n"] += 1
+        return httpx.Response(200, json=served)
+
+    jwks = JwksCache("https://clerk.local/.well-known/jwks.json", min_refetch_seconds=0, transport=httpx.MockTransport(handler))
+    cache = VerifiedTokenCache()
+    claims = {"sub": "user_local_test", "exp": int(time.time()) + 60}
+
+    token = jwt.encode(claims, old_pem, algorithm="RS256", headers={"kid": "key-1"})
+    print("Valid token:", await verify_clerk_token(token, jwks, cache))
+    print("Repeat (cached):", await verify_clerk_token(token, jwks, cache), f"| fetches={fetches['n']} hits={cache.hits}")
+
+    forged = jwt.encode(claims, new_pem, algorithm="RS256", headers={"kid": "key-1"})
+    print("Wrong signature:", await verify_clerk_token(forged, jwks, cache))
+
+    # Key rotation: unknown kid triggers a refetch
+    served["keys"].append(new_jwk)
+    rotated = jwt.encode(claims, new_pem, algorithm="RS256", headers={"kid": "key-2"})
+    print("Rotated key:", await verify_clerk_token(rotated, jwks, cache), f"| fetches={fetches['n']}")
+
+    expired = jwt.encode({"sub": "user_local_test", "exp": int(time.time()) - 5}, old_pem, algorithm="RS256", headers={"kid": "key-1"})
+    print("Expired token:", await verify_clerk_token(expired, jwks, cache))
+
+if __name__ == "__main__":
+    asyncio.run(debug_jwks())
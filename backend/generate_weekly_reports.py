@@ -0,0 +1,40 @@
+import os
+import sys
+import asyncio
+import argparse
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.db.async_database import AsyncSessionLocal, async_engine
+from app.db.database import SessionLocal
+from app.services.reports import active_user_ids, generate_weekly_report_async
+
+async def generate_for_user(user_id: int, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        async with AsyncSessionLocal() as db:
+            try:
+                await generate_weekly_report_async(db, user_id)
+                return True
+            except Exception as e:
+                print(f"❌ Report for user {user_id} failed: {e}")
+                return False
+
+async def generate_all(concurrency: int):
+    db = SessionLocal()
+    try:
+        user_ids = active_user_ids(db)
+    finally:
+        db.close()
+
+    print(f"📊 Building weekly reports for {len(user_ids)} active users (concurrency={concurrency})...")
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(generate_for_user(uid, semaphore) for uid in user_ids))
+    await async_engine.dispose()
+    print(f"✅ Done: {sum(results)} ok, {len(results) - sum(results)} failed.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute this week's reports for all active users.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Users processed at the same time")
+    args = parser.parse_args()
+    asyncio.run(generate_all(args.concurrency))
@@ -1,80 +1,208 @@
+"""
+Copies the local SQLite database into the cloud (Postgres) database.
+
+Every table is streamed from the source in primary-key order (server-side
+cursor, yield_per) and written in chunked multi-row INSERT ... ON CONFLICT DO
+NOTHING statements, one commit per chunk. Tables run in parallel workers,
+level by level in foreign-key order. After each commit the last copied key is
+saved to a checkpoint file, so a rerun resumes where it stopped. Postgres id
+sequences are resynced at the end (formerly fix_sequences.py).
+
+    python migrate_to_cloud.py                 # SQLite ./serene.db -> DATABASE_URL
+    python migrate_to_cloud.py --restart       # ignore the checkpoint
+    python migrate_to_cloud.py --resync-only   # only fix the id sequences
+"""
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import json
+import time
+import argparse
+import threading
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Integer, create_engine, func, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 
 # Add app to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
 from app.db.database import Base, SQLALCHEMY_DATABASE_URL as CLOUD_URL
-from app.db.models import User, CheckIn, ChatMessage, JournalEntry
+from app.db.migrations import run_migrations
+from app.db import models  # noqa: F401  (registers every table on Base.metadata)
 
-# Hardcoded SQLite source
+# Default SQLite source
 SQLITE_URL = "sqlite:///./serene.db"
+# Rows per INSERT / commit
+CHUNK_SIZE = int(os.getenv("MIGRATE_CHUNK_SIZE", "5000"))
+CHECKPOINT_PATH = os.getenv("MIGRATE_CHECKPOINT_PATH", "./.migrate_checkpoint.json")
 
-def migrate():
-    if "sqlite" in CLOUD_URL:
-        print("❌ Error: DATABASE_URL is still set to SQLite. Please provide a Neon PostgreSQL URL in .env")
-        return
+def _display(url: str) -> str:
+    return url.split("@")[-1]
+
+class Checkpoint:
+    """
+    Last committed primary key per table, persisted as JSON after every chunk.
+    """
+    def __init__(self, path: str, source: str, target: str, restart: bool = False):
+        self.path = path
+        self.pair = f"{source} -> {_display(target)}"
+        self._lock = threading.Lock()
+        self.state = {"pair": self.pair, "tables": {}}
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            # A checkpoint from another source/target pair does not apply
+            if saved.get("pair") == self.pair:
+                self.state = saved
+
+    def table(self, name: str) -> dict:
+        return self.state["tables"].get(name, {"last_key": None, "rows": 0, "done": False})
+
+    def save(self, name: str, **values):
+        with self._lock:
+            self.state["tables"][name] = dict(self.table(name), **values)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+
+def fk_levels(tables):
+    """
+    Groups tables so each one's foreign-key targets are in an earlier group.
+    """
+    level = {}
+    for table in tables:  # sorted_tables is already dependency ordered
+        parents = {fk.column.table for fk in table.foreign_keys if fk.column.table is not table}
+        level[table] = 1 + max((level[p] for p in parents), default=-1)
+    groups = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for table, depth in level.items():
+        groups[depth].append(table)
+    return groups
+
+def _insert(dialect_name: str, table):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    # Rows already copied by an interrupted run are skipped, never duplicated
+    return insert(table).on_conflict_do_nothing()
+
+def _key_values(table, row) -> list:
+    return [row._mapping[column.name] for column in table.primary_key.columns]
+
+def _restore_key(column, value):
+    # Dates come back from the JSON checkpoint as ISO strings
+    if isinstance(value, str) and column.type.python_type is datetime:
+        return datetime.fromisoformat(value)
+    if isinstance(value, str) and column.type.python_type is date:
+        return date.fromisoformat(value)
+    return value
 
-    print(f"🚀 Starting Migration: SQLite -> {CLOUD_URL.split('@')[-1]}")
+def copy_table(table, src_engine, dst_engine, checkpoint: Checkpoint, chunk_size: int) -> int:
+    state = checkpoint.table(table.name)
+    if state["done"]:
+        print(f"⏭️  {table.name}: already copied ({state['rows']} rows)")
+        return 0
 
-    # Engines
-    src_engine = create_engine(SQLITE_URL)
-    dst_engine = create_engine(CLOUD_URL)
+    pk = list(table.primary_key.columns)
+    stmt = select(table).order_by(*pk)
+    if state["last_key"] is not None:
+        last_key = [_restore_key(column, value) for column, value in zip(pk, state["last_key"])]
+        stmt = stmt.where(tuple_(*pk) > tuple_(*last_key) if len(pk) > 1 else pk[0] > last_key[0])
 
-    # Create tables in Cloud
+    insert = _insert(dst_engine.dialect.name, table)
+    copied, total = 0, state["rows"]
+    started = time.perf_counter()
+    with src_engine.connect() as src, dst_engine.connect() as dst:
+        result = src.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for rows in result.partitions():
+            # One multi-row INSERT per chunk (insertmanyvalues batching)
+            dst.execute(insert, [dict(row._mapping) for row in rows])
+            dst.commit()
+            copied += len(rows)
+            total += len(rows)
+            checkpoint.save(table.name, last_key=_key_values(table, rows[-1]), rows=total)
+            elapsed = time.perf_counter() - started
+            print(f"   {table.name}: {total} rows ({copied / elapsed:.0f} rows/s)")
+    checkpoint.save(table.name, done=True)
+    print(f"✅ {table.name}: {copied} rows copied")
+    return copied
+
+def resync_sequences(engine) -> list:
+    """
+    Points every serial id sequence past the table's max(id) (Postgres only),
+    so new rows don't collide with copied ids.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    synced = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            pk = list(table.primary_key.columns)
+            if len(pk) != 1 or not isinstance(pk[0].type, Integer):
+                continue
+            sequence = conn.scalar(text("SELECT pg_get_serial_sequence(:table, :column)"),
+                                   {"table": table.name, "column": pk[0].name})
+            if sequence is None:
+                continue
+            next_id = conn.scalar(select(func.coalesce(func.max(pk[0]), 0) + 1).select_from(table))
+            conn.execute(text("SELECT setval(:sequence, :next_id, false)"), {"sequence": sequence, "next_id": next_id})
+            synced.append((table.name, next_id))
+            print(f"🔢 {table.name}: sequence set to {next_id}")
+    return synced
+
+def migrate(source_url: str, target_url: str, workers: int, chunk_size: int, restart: bool, checkpoint_path: str):
+    print(f"🚀 Starting Migration: {source_url} -> {_display(target_url)}")
+
+    src_engine = create_engine(source_url)
+    # One source and one target connection per worker
+    dst_engine = create_engine(target_url, pool_size=workers, max_overflow=workers)
+
+    # Both sides on the current schema (the source may predate newer columns)
+    run_migrations(src_engine)
     print("📡 Creating tables in Cloud...")
-    Base.metadata.create_all(bind=dst_engine)
+    run_migrations(dst_engine, verbose=True)
 
-    # Sessions
-    SrcSession = sessionmaker(bind=src_engine)
-    DstSession = sessionmaker(bind=dst_engine)
-    
-    src_db = SrcSession()
-    dst_db = DstSession()
+    checkpoint = Checkpoint(checkpoint_path, source_url, target_url, restart=restart)
+    started = time.perf_counter()
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for group in fk_levels(Base.metadata.sorted_tables):
+            # Tables in a group don't reference each other; the next group waits for all of them
+            futures = [pool.submit(copy_table, table, src_engine, dst_engine, checkpoint, chunk_size) for table in group]
+            total += sum(future.result() for future in futures)
 
-    try:
-        # 1. Users
-        users = src_db.query(User).all()
-        print(f"👤 Migrating {len(users)} users...")
-        for u in users:
-            new_u = User(id=u.id, clerk_id=u.clerk_id, username=u.username, email=u.email, created_at=u.created_at)
-            dst_db.merge(new_u)
-        dst_db.commit()
-
-        # 2. CheckIns
-        checkins = src_db.query(CheckIn).all()
-        print(f"📊 Migrating {len(checkins)} check-ins...")
-        for c in checkins:
-            new_c = CheckIn(id=c.id, user_id=c.user_id, mood=c.mood, text=c.text, energy=c.energy, sleep_hours=c.sleep_hours, timestamp=c.timestamp)
-            dst_db.merge(new_c)
-        dst_db.commit()
-
-        # 3. Chat
-        chats = src_db.query(ChatMessage).all()
-        print(f"💬 Migrating {len(chats)} chat messages...")
-        for m in chats:
-            new_m = ChatMessage(id=m.id, user_id=m.user_id, role=m.role, content=m.content, timestamp=m.timestamp)
-            dst_db.merge(new_m)
-        dst_db.commit()
-
-        # 4. Journal
-        journals = src_db.query(JournalEntry).all()
-        print(f"📜 Migrating {len(journals)} journals...")
-        for j in journals:
-            new_j = JournalEntry(id=j.id, user_id=j.user_id, content=j.content, summary=j.summary, advice=j.advice, timestamp=j.timestamp)
-            dst_db.merge(new_j)
-        dst_db.commit()
-
-        print("✅ Migration Complete! Serene is now Cloud-Powered. ☁️✨")
+    resync_sequences(dst_engine)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Migration Complete! {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s). Serene is now Cloud-Powered. ☁️✨")
+    # Finished: a later run starts over instead of skipping every table
+    os.remove(checkpoint_path)
 
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=SQLITE_URL, help="SQLite database to copy from")
+    parser.add_argument("--target", default=CLOUD_URL, help="Database to copy into (default: DATABASE_URL)")
+    parser.add_argument("--workers", type=int, default=4, help="Tables copied in parallel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--resync-only", action="store_true", help="Only resync the target's id sequences")
+    args = parser.parse_args()
+
+    if args.resync_only:
+        resync_sequences(create_engine(args.target))
+        print("Done! Sequences synchronized.")
+        return 0
+
+    if args.target == args.source or (args.target == CLOUD_URL and "sqlite" in CLOUD_URL):
+        print("❌ Error: DATABASE_URL is still set to SQLite. Please provide a Neon PostgreSQL URL in .env")
+        return 1
+
+    try:
+        migrate(args.source, args.target, args.workers, args.chunk_size, args.restart, args.checkpoint)
     except Exception as e:
         print(f"❌ Migration Failed: {e}")
-        dst_db.rollback()
-    finally:
-        src_db.close()
-        dst_db.close()
+        print(f"   Progress is saved in {args.checkpoint}; rerun to resume.")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    migrate()
+    sys.exit(main())
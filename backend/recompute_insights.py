@@ -0,0 +1,32 @@
+"""
+Recomputes stored check-in insights after a rules change (INSIGHTS_RULES_VERSION
+bump). Only rows stored with another version are touched unless --all is given.
+"""
+import os
+import sys
+import argparse
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.insights import INSIGHTS_RULES_VERSION, recompute_insights
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--all", action="store_true", help="Recompute every check-in, not just stale ones")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    print(f"🔄 Recomputing insights with rules version {INSIGHTS_RULES_VERSION}...")
+    db = SessionLocal()
+    try:
+        done = recompute_insights(db, batch_size=args.batch_size, everything=args.all)
+    finally:
+        db.close()
+    print(f"✅ {done} check-ins updated.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import argparse
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.db.models import User
+from app.services.streaks import normalize_timezone, recompute_all_streaks, recompute_streak
+
+def recompute(user_id=None):
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        if user_id is None:
+            count = recompute_all_streaks(db)
+            print(f"✅ Recomputed streaks for {count} users.")
+        else:
+            user = db.get(User, user_id)
+            if user is None:
+                print(f"❌ No user with id {user_id}")
+                return
+            state = recompute_streak(db, user_id, normalize_timezone(user.timezone))
+            print(f"✅ User {user_id}: current {state['current_length']} (ending {state['current_end']}), longest {state['longest_length']}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild active days and streak state from raw check-ins (e.g. after a backfill).")
+    parser.add_argument("--user", type=int, default=None, help="Only this user id")
+    args = parser.parse_args()
+    recompute(args.user)
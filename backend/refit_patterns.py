@@ -0,0 +1,35 @@
+"""
+Refits the weekly mood-pattern clusters and reassigns every user.
+
+By default continues training the persisted model on the complete weeks
+since its last fit; --full refits from scratch over all history.
+"""
+import os
+import sys
+import argparse
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.services.clustering import CLUSTER_MODEL_PATH, refit_job
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--full", action="store_true", help="Refit from scratch instead of continuing the saved model")
+    parser.add_argument("--path", default=CLUSTER_MODEL_PATH, help="Model file")
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    print(f"🔄 {'Full' if args.full else 'Incremental'} refit -> {args.path}")
+    result = refit_job(full=args.full, path=args.path)
+    if result["status"] != "ok":
+        print("⚠️ Not enough weekly data to fit the clusters yet.")
+        return 1
+    print(f"✅ {result['mode']} fit over {result['samples']} user-weeks, "
+          f"{result['assigned']} users assigned ({result['seconds']}s, version {result['version']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
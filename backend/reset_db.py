@@ -1,6 +1,6 @@
 import os
-from app.db.database import Base, engine, SQLALCHEMY_DATABASE_URL
-from app.db.models import CheckIn, ChatMessage, JournalEntry
+from app.db.database import engine, SQLALCHEMY_DATABASE_URL
+from app.db.migrations import run_migrations
 
 # Extract path from URL (e.g. sqlite:///./serene.db -> ./serene.db)
 db_path = SQLALCHEMY_DATABASE_URL.replace("sqlite:///", "")
@@ -12,5 +12,5 @@ else:
     print(f"Database {db_path} not found.")
 
 print("Creating new database tables...")
-Base.metadata.create_all(bind=engine)
+run_migrations(engine, verbose=True)
 print("Database reset successfully.")
@@ -1,31 +1,229 @@
-from datetime import datetime, timedelta, timezone
-from app.db.database import SessionLocal
-from app.db.models import CheckIn
+"""
+Synthetic data generator: N users with months of check-ins, journal entries
+and chat turns, written with chunked bulk inserts.
+
+Each user gets a baseline mood, a weekly rhythm and day-to-day (AR(1)) noise;
+energy and sleep follow the mood. Check-ins, journals and chat turns per day
+are drawn from the configured rates. Texts are built from topic and feeling
+phrases, so annotations, insights and patterns have something to find. The
+first user is the dev "mock_bestie_token" user, so the app's dev login sees
+the data too.
+
+    python seed_db.py --users 1000 --days 180     # ~200k check-ins
+"""
+import os
+import sys
+import math
+import time
 import random
+import argparse
+from datetime import datetime, timedelta
+
+# Add app to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import select
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.db.models import ChatMessage, CheckIn, JournalEntry, User, utcnow
+from app.services.annotations import annotate_many
+from app.services.insights import INSIGHTS_RULES_VERSION, analyze_checkins
+from app.services.rollups import rebuild_rollups
+from app.services.streaks import recompute_all_streaks
+
+MOCK_CLERK_ID = "user_2test_bestie_mock"
+
+TOPIC_PHRASES = [
+    "my boss moved the deadline again", "work has been a lot", "the project is finally shipping",
+    "exam tomorrow and I barely studied", "homework all evening", "school was fine",
+    "had a fight with my partner", "my girlfriend and I talked it out", "thinking about the breakup",
+    "rent is due and money is tight", "paid off some debt", "everything is so expensive",
+    "feeling lonely tonight", "spent the day alone", "I miss my friends",
+    "headache since the morning", "my body is sore from the gym", "still a bit sick",
+]
+FEELING_PHRASES = {
+    "positive": ["feeling happy", "such a good day", "proud of myself", "great vibes", "I love this", "excited for the weekend"],
+    "neutral": ["just a normal day", "nothing special", "went for a walk", "cooked dinner", "watched a show"],
+    "negative": ["so stressed", "really tired", "feeling anxious", "sad and drained", "worst day in a while", "a bit angry"],
+}
+CHAT_OPENERS = ["hi", "hey", "can we talk?", "I need some advice", "quick question"]
+
+def poisson(rng: random.Random, lam: float) -> int:
+    # Knuth; fine for the small per-day rates used here
+    limit, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+def clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+def make_text(rng: random.Random, mood: int, topic_rate: float) -> str:
+    feeling = "positive" if mood >= 7 else "negative" if mood <= 4 else "neutral"
+    parts = [rng.choice(FEELING_PHRASES[feeling])]
+    if rng.random() < topic_rate:
+        parts.append(rng.choice(TOPIC_PHRASES))
+    if rng.random() < 0.3:
+        parts.append(rng.choice(FEELING_PHRASES["neutral"]))
+    rng.shuffle(parts)
+    return ", ".join(parts)
+
+class Writer:
+    """
+    Buffers rows per table and flushes them as one executemany per batch.
+    """
+    def __init__(self, conn, batch_size: int):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.buffers = {CheckIn: [], JournalEntry: [], ChatMessage: []}
+        self.counts = {model: 0 for model in self.buffers}
+        self.started = time.perf_counter()
+
+    def add(self, model, row: dict):
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        rows = self.buffers[model]
+        if not rows:
+            return
+        # Write-time columns, as the API would have stored them
+        texts = [row.get("text", row.get("content")) for row in rows]
+        for row, annotation in zip(rows, annotate_many(texts)):
+            if model is not ChatMessage or row["role"] == "user":
+                row.update(annotation)
+            else:
+                row.update(sentiment_score=None, topics=None)
+        if model is CheckIn:
+            for row, insights in zip(rows, analyze_checkins([_CheckInView(row) for row in rows])):
+                row.update(insights=insights, insights_version=INSIGHTS_RULES_VERSION)
+        self.conn.execute(model.__table__.insert(), rows)
+        self.conn.commit()
+        self.counts[model] += len(rows)
+        self.buffers[model] = []
+        total = sum(self.counts.values())
+        print(f"   {total} rows written ({total / (time.perf_counter() - self.started):.0f} rows/s)")
+
+    def close(self):
+        for model in self.buffers:
+            self.flush(model)
+
+class _CheckInView:
+    # analyze_checkin reads attributes; the generator has plain dicts
+    def __init__(self, row: dict):
+        self.__dict__.update(row)
+
+def create_users(conn, count: int, seed: int, chunk: int = 5000) -> list:
+    """
+    Inserts the users that don't exist yet; returns all their ids in order.
+    """
+    clerk_ids = [MOCK_CLERK_ID if i == 0 else f"synthetic_{seed}_{i}" for i in range(count)]
+    ids = {}
+    for i in range(0, count, chunk):
+        batch = clerk_ids[i:i + chunk]
+        existing = set(conn.execute(select(User.clerk_id).where(User.clerk_id.in_(batch))).scalars())
+        new_rows = [
+            {"clerk_id": clerk_id, "username": "MockBestie" if clerk_id == MOCK_CLERK_ID else clerk_id, "created_at": utcnow()}
+            for clerk_id in batch if clerk_id not in existing
+        ]
+        if new_rows:
+            conn.execute(User.__table__.insert(), new_rows)
+            conn.commit()
+        ids.update(conn.execute(select(User.clerk_id, User.id).where(User.clerk_id.in_(batch))).all())
+    return [ids[clerk_id] for clerk_id in clerk_ids]
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = utcnow()
+    start = (now - timedelta(days=args.days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def at(day_start, hours: float) -> datetime:
+        # Today's rows never land in the future
+        return min(now, day_start + timedelta(hours=hours))
+
+    with engine.connect() as conn:
+        user_ids = create_users(conn, args.users, args.seed)
+        print(f"👤 {len(user_ids)} users")
+        writer = Writer(conn, args.batch_size)
+
+        for user_id in user_ids:
+            baseline = clamp(rng.gauss(6.0, 1.5), 2.0, 9.0)
+            swing = rng.uniform(0.0, 1.5)
+            noise = 0.0
+            activity = rng.uniform(0.5, 1.5)  # some users check in more than others
+
+            for day in range(args.days):
+                if rng.random() < args.skip_rate:
+                    continue
+                date_start = start + timedelta(days=day)
+                noise = 0.6 * noise + rng.gauss(0, 1.0)
+                day_mood = baseline + swing * math.sin(2 * math.pi * date_start.weekday() / 7) + noise
+
+                for _ in range(max(1, poisson(rng, args.checkins_per_day * activity))):
+                    mood = int(round(clamp(day_mood + rng.gauss(0, 0.7), 1, 10)))
+                    ts = at(date_start, rng.uniform(6, 23))
+                    writer.add(CheckIn, {
+                        "user_id": user_id,
+                        "mood": mood,
+                        "text": make_text(rng, mood, args.topic_rate) if rng.random() < args.text_rate else None,
+                        "energy": int(round(clamp(mood + rng.gauss(0, 1.5), 1, 10))) if rng.random() < 0.8 else None,
+                        "sleep_hours": round(clamp(rng.gauss(7.0 + 0.15 * (mood - 5), 1.0), 3.0, 11.0), 1) if rng.random() < 0.7 else None,
+                        "timestamp": ts,
+                    })
+
+                if rng.random() < args.journal_rate:
+                    mood = int(round(clamp(day_mood, 1, 10)))
+                    writer.add(JournalEntry, {
+                        "user_id": user_id,
+                        "content": ". ".join(make_text(rng, mood, args.topic_rate) for _ in range(rng.randint(3, 12))),
+                        "summary": None,
+                        "advice": None,
+                        "timestamp": at(date_start, rng.uniform(18, 23.9)),
+                    })
+
+                for turn in range(poisson(rng, args.chat_turns)):
+                    ts = at(date_start, rng.uniform(8, 23) + turn / 3600)
+                    message = rng.choice(CHAT_OPENERS) if turn == 0 else make_text(rng, int(round(clamp(day_mood, 1, 10))), args.topic_rate)
+                    writer.add(ChatMessage, {"user_id": user_id, "role": "user", "content": message, "timestamp": ts})
+                    writer.add(ChatMessage, {"user_id": user_id, "role": "model", "content": "I hear you, bestie! Tell me more ✨", "timestamp": ts + timedelta(seconds=2)})
+        writer.close()
+
+    print(f"📊 {writer.counts[CheckIn]} check-ins, 📜 {writer.counts[JournalEntry]} journals, 💬 {writer.counts[ChatMessage]} chat messages")
+    return writer.counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--checkins-per-day", type=float, default=1.3, help="Mean check-ins on an active day")
+    parser.add_argument("--skip-rate", type=float, default=0.25, help="Chance a user skips a day entirely")
+    parser.add_argument("--text-rate", type=float, default=0.6, help="Chance a check-in has a note")
+    parser.add_argument("--topic-rate", type=float, default=0.5, help="Chance a text mentions a topic")
+    parser.add_argument("--journal-rate", type=float, default=0.15, help="Chance of a journal entry per active day")
+    parser.add_argument("--chat-turns", type=float, default=0.8, help="Mean chat turns per active day")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per bulk insert")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-derived", action="store_true", help="Don't rebuild rollups and streaks afterwards")
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    print(f"Seeding database: {args.users} users x {args.days} days...")
+    started = time.perf_counter()
+    generate(args)
+
+    if not args.skip_derived:
+        db = SessionLocal()
+        try:
+            print(f"🧮 Rebuilt {rebuild_rollups(db)} daily rollups")
+            print(f"🔥 Recomputed {recompute_all_streaks(db)} streaks")
+        finally:
+            db.close()
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
 
-db = SessionLocal()
-
-print("Seeding database...")
-
-# Create 10 check-ins over the last 10 days
-for i in range(10):
-    day_offset = 10 - i
-    ts = datetime.now(timezone.utc) - timedelta(days=day_offset)
-    
-    # Random mood between 1 and 10
-    mood = random.randint(3, 9)
-    energy = random.randint(1, 10)
-    sleep = random.uniform(5.0, 9.0)
-    
-    checkin = CheckIn(
-        mood=mood,
-        text=f"Seeded entry {i+1}",
-        energy=energy,
-        sleep_hours=sleep,
-        timestamp=ts
-    )
-    db.add(checkin)
-
-db.commit()
-print("Successfully added 10 check-ins.")
-db.close()
+if __name__ == "__main__":
+    main()
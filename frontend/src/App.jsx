@@ -36,6 +36,9 @@ function App() {
   useEffect(() => {
     const interceptor = axios.interceptors.request.use(
       async (config) => {
+        // Lets the backend count streaks and daily stats in the user's own days
+        config.headers['X-Timezone'] = Intl.DateTimeFormat().resolvedOptions().timeZone;
+
         // Use Mock Token if in bypass mode
         if (localStorage.getItem('serene_mock_auth') === 'true') {
           config.headers['Authorization'] = `Bearer mock_bestie_token`;
@@ -293,7 +296,7 @@ function App() {
                     </div>
                     <div className="chart-wrapper">
                       <ResponsiveContainer width="100%" height={100}>
-                        <LineChart data={[{ val: 5 }, { val: forecast.next_day_prediction - forecast.trend_slope }, { val: forecast.next_day_prediction }]}><Line type="monotone" dataKey="val" stroke="#8b5cf6" strokeWidth={3} dot={{ r: 4 }} /><Tooltip /></LineChart>
+                        <LineChart data={forecast.horizon ? forecast.horizon.map(h => ({ val: h.prediction, lower: h.lower, upper: h.upper })) : [{ val: 5 }, { val: forecast.next_day_prediction - forecast.trend_slope }, { val: forecast.next_day_prediction }]}><Line type="monotone" dataKey="upper" stroke="#c4b5fd" strokeDasharray="4 4" dot={false} /><Line type="monotone" dataKey="lower" stroke="#c4b5fd" strokeDasharray="4 4" dot={false} /><Line type="monotone" dataKey="val" stroke="#8b5cf6" strokeWidth={3} dot={{ r: 4 }} /><Tooltip /></LineChart>
                       </ResponsiveContainer>
                     </div>
                   </div>
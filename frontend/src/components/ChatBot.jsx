@@ -23,13 +23,50 @@ const ChatBot = ({ isOpen, onToggle }) => {
         setIsTyping(true);
 
         try {
-            const res = await axios.post('/api/chat/message', { message: userMsg.text });
+            // Stream the reply over SSE; axios' fetch adapter keeps the auth interceptor
+            const res = await axios.post('/api/chat/stream', { message: userMsg.text }, {
+                adapter: 'fetch',
+                responseType: 'stream',
+            });
 
-            setTimeout(() => {
-                const botMsg = { sender: 'bot', text: res.data.response };
-                setMessages(prev => [...prev, botMsg]);
+            const reader = res.data.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            let started = false;
+
+            const appendBotText = (text, replace = false) => {
+                if (!started) {
+                    started = true;
+                    setIsTyping(false);
+                    setMessages(prev => [...prev, { sender: 'bot', text }]);
+                    return;
+                }
+                setMessages(prev => {
+                    const last = prev[prev.length - 1];
+                    const updated = { ...last, text: replace ? text : last.text + text };
+                    return [...prev.slice(0, -1), updated];
+                });
+            };
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += value;
+
+                // SSE events are separated by a blank line
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const event = raw.match(/^event: (.*)$/m)?.[1];
+                    const data = raw.match(/^data: (.*)$/m)?.[1];
+                    if (!data || event === 'done') continue;
+                    const { text } = JSON.parse(data);
+                    appendBotText(text, event === 'fallback');
+                }
+            }
+
+            if (!started) {
                 setIsTyping(false);
-            }, 800);
+            }
         } catch (err) {
             console.error(err);
             setIsTyping(false);
@@ -13,31 +13,82 @@ export default function Journal({ onOpenChat }) {
     // Removed 'mode' state - Strictly Journal now
     const chatContainerRef = useRef(null);
 
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    // scrollHeight before older entries were prepended, so the view doesn't jump
+    const prependHeightRef = useRef(null);
+
+    const PAGE_SIZE = 20;
+
     const fetchHistory = async () => {
         try {
-            const res = await axios.get(`${API_URL}/journal/`);
-            // Reverse history to show oldest first (chronological) 
-            // Also filter locally just in case backend returns chat messages:
-            const journalOnly = res.data.reverse().filter(item => item.type === 'journal');
-            setHistory(journalOnly);
+            const res = await axios.get(`${API_URL}/journal/`, { params: { type: 'journal', limit: PAGE_SIZE } });
+            // Pages come newest first; reverse to show oldest first (chronological)
+            setHistory([...res.data.items].reverse());
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             console.error("Failed to fetch history", err);
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const res = await axios.get(`${API_URL}/journal/`, {
+                params: { type: 'journal', limit: PAGE_SIZE, before: nextCursor }
+            });
+            prependHeightRef.current = chatContainerRef.current?.scrollHeight ?? null;
+            setHistory(prev => [...[...res.data.items].reverse(), ...prev]);
+            setNextCursor(res.data.next_cursor);
+        } catch (err) {
+            console.error("Failed to load older entries", err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const handleScroll = (e) => {
+        // Older entries sit at the top, so load them when the user scrolls up
+        if (e.currentTarget.scrollTop < 60) {
+            loadMore();
+        }
+    };
+
     useEffect(() => {
         fetchHistory();
     }, []);
 
     useEffect(() => {
-        if (chatContainerRef.current && showHistory) {
-            chatContainerRef.current.scrollTo({
-                top: chatContainerRef.current.scrollHeight,
-                behavior: 'smooth'
-            });
+        if (!chatContainerRef.current || !showHistory) return;
+
+        if (prependHeightRef.current !== null) {
+            const container = chatContainerRef.current;
+            container.scrollTop += container.scrollHeight - prependHeightRef.current;
+            prependHeightRef.current = null;
+            return;
         }
+
+        chatContainerRef.current.scrollTo({
+            top: chatContainerRef.current.scrollHeight,
+            behavior: 'smooth'
+        });
     }, [history, status, showHistory]);
 
+    const waitForAnalysis = async (entryId) => {
+        // Poll until the background worker has filled in the summary (~2 min max)
+        for (let attempt = 0; attempt < 60; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            try {
+                const res = await axios.get(`${API_URL}/journal/${entryId}`);
+                if (!['pending', 'running'].includes(res.data.analysis_status)) return;
+            } catch (err) {
+                // Deleted or unreachable: stop waiting
+                return;
+            }
+        }
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         if (!content.trim()) return;
@@ -64,9 +115,17 @@ export default function Journal({ onOpenChat }) {
             // After a new entry, we show the history so they can see the analysis
             setShowHistory(true);
 
+            // The entry is saved right away; the AI analysis arrives in the background
+            setHistory(prev => prev.map(h => h.id === tempId
+                ? { ...h, id: `journal_${res.data.id}`, db_id: res.data.id, isOptimistic: false, isAnalyzing: true }
+                : h
+            ));
+            setStatus('success');
+
+            await waitForAnalysis(res.data.id);
+
             // Re-fetch history to get the full entry with summary
             fetchHistory();
-            setStatus('success');
 
             // Note: We do NOT switch to chat automatically anymore. 
             // The user stays in Journal view.
@@ -141,12 +200,19 @@ export default function Journal({ onOpenChat }) {
                     <motion.div
                         className="chat-container"
                         ref={chatContainerRef}
+                        onScroll={handleScroll}
                         style={{ background: 'rgba(0,0,0,0.2)', flex: 1 }}
                         initial={{ height: 0, opacity: 0 }}
                         animate={{ height: 'auto', opacity: 1 }}
                         exit={{ height: 0, opacity: 0 }}
                         transition={{ duration: 0.3 }}
                     >
+                        {loadingMore && (
+                            <div style={{ textAlign: 'center', opacity: 0.5, fontSize: '0.8rem', padding: '0.5rem' }}>
+                                Loading older dives...
+                            </div>
+                        )}
+
                         {history.length === 0 && (
                             <div className="empty-history" style={{ marginTop: 'auto', marginBottom: 'auto', opacity: 0.6 }}>
                                 <Sparkles size={40} style={{ marginBottom: '1rem', opacity: 0.5 }} />
@@ -186,6 +252,12 @@ export default function Journal({ onOpenChat }) {
                                         {entry.content}
                                     </div>
 
+                                    {entry.isAnalyzing && !entry.summary && (
+                                        <div className="journal-analysis-pending" style={{ display: 'flex', alignItems: 'center', gap: '0.5rem', opacity: 0.6, fontSize: '0.9rem' }}>
+                                            <Sparkles size={16} /> Serene is reading your entry...
+                                        </div>
+                                    )}
+
                                     {/* Analysis Section */}
                                     {entry.summary && (
                                         <div className="journal-analysis" style={{